@@ -18,8 +18,71 @@
 
 """
 
+import heapq
 import time
 
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+
+class CacheStatistics:
+    """
+    Cache counters for fixed time windows.
+
+    Counters are collected for the current window, the summary reports the last completed window.
+    """
+
+    def __init__(self, window_seconds=60, start_time=None):
+        self.window_seconds = window_seconds
+        self.window_start = time.time() if start_time is None else start_time
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.fill_count = 0
+        self.fill_seconds = 0.0
+        self.fill_seconds_max = 0.0
+        self.summary = self.__create_summary(0)
+
+    def roll(self, current_time):
+        if current_time >= self.window_start + self.window_seconds:
+            elapsed_windows = int((current_time - self.window_start) // self.window_seconds)
+            self.summary = self.__create_summary(self.window_seconds) if elapsed_windows == 1 \
+                else self.__create_summary(0)
+            self.window_start += elapsed_windows * self.window_seconds
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.fill_count = 0
+            self.fill_seconds = 0.0
+            self.fill_seconds_max = 0.0
+
+    def add_fill_time(self, seconds):
+        self.fill_count += 1
+        self.fill_seconds += seconds
+        self.fill_seconds_max = max(self.fill_seconds_max, seconds)
+
+    def __create_summary(self, window_seconds):
+        if window_seconds == 0:
+            return {'window': 0, 'hits': 0, 'misses': 0, 'ratio': 0.0, 'evictions': 0, 'expirations': 0,
+                    'fill_ms_avg': 0.0, 'fill_ms_max': 0.0}
+        requests = self.hits + self.misses
+        return {
+            'window': window_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'ratio': self.hits / requests if requests else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'fill_ms_avg': self.fill_seconds * 1000 / self.fill_count if self.fill_count else 0.0,
+            'fill_ms_max': self.fill_seconds_max * 1000,
+        }
+
+    def get_summary(self, current_time=None):
+        self.roll(time.time() if current_time is None else current_time)
+        return self.summary
+
 
 class CacheEntry:
     def __init__(self, payload, expiry_time):
@@ -34,9 +97,15 @@ class CacheEntry:
         self.__hit_count += 1
         return self.__payload
 
+    def peek_payload(self):
+        return self.__payload
+
     def get_hit_count(self):
         return self.__hit_count
 
+    def get_expiry_time(self):
+        return self.__expiry_time
+
     def __repr__(self):
         valid = "+" if self.is_valid(self.__hit_count) else "-"
 
@@ -46,11 +115,16 @@ class CacheEntry:
 class ObjectCache:
     kwargs_separator = object()
 
-    def __init__(self, ttl_seconds=30, size=None, cleanup_period=None):
+    def __init__(self, ttl_seconds=30, size=None, cleanup_period=None, statistics_window=60, clock=time.time):
         self.__ttl_seconds = int(ttl_seconds)
         self.total_count = 0
         self.total_hit_count = 0
         self.size = size
+        self.clock = clock
+        self.statistics = CacheStatistics(statistics_window, clock())
+        self.access_listener = None
+        # counts the cache entries holding pending payloads, released entries no longer need their payload
+        self.demand = None
 
         self.cache = {}
         self.keys = {}
@@ -59,7 +133,7 @@ class ObjectCache:
 
     def get(self, cached_object_creator, *args, **kwargs):
         if self.cleanup_period is not None:
-            now = time.time()
+            now = self.clock()
             if now > self.last_cleanup + self.cleanup_period:
                 before = self.get_size()
                 self.clean_expired()
@@ -70,8 +144,12 @@ class ObjectCache:
         self.total_count += 1
 
         cache_key = self.generate_cache_key(cached_object_creator, args, kwargs)
+        if self.access_listener is not None:
+            self.access_listener(self, cache_key)
 
-        current_time = int(time.time())
+        current_time = self.clock()
+        self.statistics.roll(current_time)
+        current_time = int(current_time)
 
         if cache_key in self.cache:
             entry = self.cache[cache_key]
@@ -79,14 +157,48 @@ class ObjectCache:
                 if self.size is not None:
                     self.track_usage(cache_key)
                 self.total_hit_count += 1
+                self.statistics.hits += 1
                 return entry.get_payload()
         elif self.size is not None and len(self.keys) >= self.size:
             self.remove_oldest_entry()
+            self.statistics.evictions += 1
 
+        self.statistics.misses += 1
         expires = current_time + self.__ttl_seconds
-        payload = cached_object_creator(*args, **kwargs)
-
-        entry = CacheEntry(payload, expires)
+        fill_start = time.time()
+        payload = self.create_payload(cached_object_creator, args, kwargs)
+        if isinstance(payload, Deferred):
+            payload.addBoth(self.__record_fill_time, fill_start)
+        else:
+            self.statistics.add_fill_time(time.time() - fill_start)
+
+        payload = self.put(cache_key, payload, expires)
+        if isinstance(payload, Deferred):
+            # passes the result through, failed payloads are removed so that they are not served from the cache
+            payload.addBoth(self.__remove_failed, cache_key, payload)
+        return payload
+
+    def __record_fill_time(self, result, fill_start):
+        self.statistics.add_fill_time(time.time() - fill_start)
+        return result
+
+    def __remove_failed(self, result, cache_key, payload):
+        if isinstance(result, Failure):
+            entry = self.cache.get(cache_key)
+            if entry is not None and entry.peek_payload() is payload:
+                del self.cache[cache_key]
+                self.keys.pop(cache_key, None)
+        return result
+
+    def create_payload(self, cached_object_creator, args, kwargs):
+        return cached_object_creator(*args, **kwargs)
+
+    def put(self, cache_key, payload, expiry_time):
+        if self.demand is not None:
+            self.demand.hold(payload)
+            if cache_key in self.cache:
+                self.release_entry(self.cache[cache_key])
+        entry = CacheEntry(payload, expiry_time)
         self.cache[cache_key] = entry
         self.keys[cache_key] = 0
 
@@ -95,7 +207,7 @@ class ObjectCache:
     def remove_oldest_entry(self):
         expired_key = next(iter(self.keys))
         del self.keys[expired_key]
-        del self.cache[expired_key]
+        self.release_entry(self.cache.pop(expired_key))
 
     def track_usage(self, cache_key):
         count = self.keys[cache_key]
@@ -105,14 +217,22 @@ class ObjectCache:
     def clear(self):
         self.total_count = 0
         self.total_hit_count = 0
+        self.statistics = CacheStatistics(self.statistics.window_seconds, self.clock())
+        for entry in self.cache.values():
+            self.release_entry(entry)
         self.cache.clear()
 
     def clean_expired(self):
-        now = time.time()
+        now = self.clock()
         expired_keys = {key for key, entry in self.cache.items() if not entry.is_valid(now)}
         for expired_key in expired_keys:
             del self.keys[expired_key]
-            del self.cache[expired_key]
+            self.release_entry(self.cache.pop(expired_key))
+        self.statistics.expirations += len(expired_keys)
+
+    def release_entry(self, entry):
+        if self.demand is not None:
+            self.demand.release(entry.peek_payload())
 
     def get_time_to_live(self):
         return self.__ttl_seconds
@@ -122,9 +242,33 @@ class ObjectCache:
             return 0.0
         return self.total_hit_count / self.total_count
 
+    def get_window_ratio(self) -> float:
+        return self.statistics.get_summary(self.clock())['ratio']
+
     def get_size(self):
         return len(self.cache)
 
+    def get_top_keys(self, count=10):
+        """
+        Returns the cache keys of the valid entries with the most hits together with their hit counts.
+        """
+        now = self.clock()
+        return heapq.nlargest(count, ((key, entry.get_hit_count()) for key, entry in self.cache.items()
+                                      if entry.is_valid(now)), key=lambda item: item[1])
+
+    def split_cache_key(self, cache_key):
+        """
+        Splits a cache key into the cached object creator, the positional and the keyword arguments.
+        """
+        separator_index = cache_key.index(self.kwargs_separator)
+        return cache_key[0], cache_key[1:separator_index], dict(cache_key[separator_index + 1:])
+
+    def format_cache_key(self, cache_key):
+        cached_object_creator = cache_key[0]
+        separator_index = cache_key.index(self.kwargs_separator)
+        arguments = [repr(arg) for arg in cache_key[1:separator_index]] + \
+                    [f"{name}={value!r}" for name, value in cache_key[separator_index + 1:]]
+        return f"{getattr(cached_object_creator, '__name__', cached_object_creator)}({', '.join(arguments)})"
 
     def generate_cache_key(self, cached_object_creator, args, kwargs):
         """
@@ -0,0 +1,275 @@
+"""
+
+Replays recorded webservice requests through cache configurations in simulated time
+
+"""
+
+import glob
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from optparse import OptionParser
+from typing import Optional
+
+from blitzortung.cache import ObjectCache
+from blitzortung.service.base import Blitzortung
+from blitzortung.service.cache import ServiceCache
+from blitzortung.service.general import canonical_grid_base_length, canonical_count_threshold
+from blitzortung.util import TimeConstraint, force_range
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler(sys.stdout))
+logger.setLevel(logging.INFO)
+
+GLOBAL_REGION = 0
+LOCAL_REGION = -1
+
+
+@dataclass(frozen=True)
+class RecordedRequest:
+    timestamp: float
+    minute_length: int
+    grid_baselength: int
+    minute_offset: int
+    region: int
+    count_threshold: int
+    x: Optional[int] = None
+    y: Optional[int] = None
+    data_area: Optional[int] = None
+
+
+def read_minute_log(file_name) -> list[RecordedRequest]:
+    """Read the per-minute JSON request log written by the webservice."""
+    with open(file_name, 'r') as json_file:
+        data = json.load(json_file)
+
+    requests = []
+    for entry in data.get('get_strikes_grid', []):
+        local_parameters = entry[8:11] if len(entry) > 8 else (None, None, None)
+        requests.append(RecordedRequest(entry[0] / 1000000, entry[1], entry[2], entry[3], entry[4], entry[5],
+                                        *local_parameters))
+    return requests
+
+
+def read_service_log(file_name) -> list[RecordedRequest]:
+    """Read a servicelog file written by bo-webservice-insertlog."""
+
+    def optional_int(value):
+        return None if value == '-' else int(value)
+
+    requests = []
+    with open(file_name, 'r') as service_log:
+        for line in service_log:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 13:
+                continue
+            requests.append(RecordedRequest(float(fields[0]), int(fields[4]), int(float(fields[2])),
+                                            int(fields[3]), int(fields[1]), int(fields[5]),
+                                            optional_int(fields[10]), optional_int(fields[11]),
+                                            optional_int(fields[12])))
+    return requests
+
+
+class SimulationClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+class FifoObjectCache(ObjectCache):
+    """Size limited cache which evicts the oldest entries regardless of their usage."""
+
+    def track_usage(self, cache_key):
+        pass
+
+
+class CacheSimulator:
+    """
+    Replays recorded requests through the caches of the webservice using a simulated clock.
+
+    Every miss costs one database query, as a grid and its histogram are fetched together. Like in the service, the
+    memory caches are keyed by the request parameters only. With a disk store, history results are additionally
+    kept by the end of their query interval, which is aligned to the history cache TTL, so that a later request hits
+    the disk tier only while its aligned interval is unchanged.
+    """
+
+    EVICTION_POLICIES = {'lru': ObjectCache, 'fifo': FifoObjectCache}
+
+    def __init__(self, ttl_current=ServiceCache.CACHE_TTL_SHORT, ttl_history=ServiceCache.CACHE_TTL_LONG,
+                 local_size_current=ServiceCache.LOCAL_CACHE_SIZE_CURRENT,
+                 local_size_history=ServiceCache.LOCAL_CACHE_SIZE_HISTORY, eviction='lru',
+                 base_lengths: Optional[list[int]] = None, entry_bytes=20000, disk_store=False):
+        self.clock = SimulationClock()
+        self.disk_store = disk_store
+        self.disk_entries: dict[tuple, float] = {}
+        self.base_lengths = sorted(base_lengths) if base_lengths else None
+        self.entry_bytes = entry_bytes
+        self.minute_constraints = TimeConstraint(Blitzortung.DEFAULT_MINUTE_LENGTH, Blitzortung.MAX_MINUTES_PER_DAY)
+        self.last_cleanup = None
+
+        cache_class = self.EVICTION_POLICIES[eviction]
+        self.caches = {
+            'strikes_grid': cache_class(ttl_seconds=ttl_current, clock=self.clock),
+            'strikes_history_grid': cache_class(ttl_seconds=ttl_history, clock=self.clock),
+            'global_strikes_grid': cache_class(ttl_seconds=ttl_current, clock=self.clock),
+            'global_strikes_history_grid': cache_class(ttl_seconds=ttl_history, clock=self.clock),
+            'local_strikes_grid': cache_class(ttl_seconds=ttl_current, size=local_size_current, clock=self.clock),
+            'local_strikes_history_grid': cache_class(ttl_seconds=ttl_history, size=local_size_history,
+                                                      clock=self.clock),
+        }
+        self.results = {name: {'requests': 0, 'hits': 0, 'disk_hits': 0, 'db_queries': 0, 'db_queries_saved': 0,
+                               'peak_size': 0} for name in self.caches}
+
+    def simulate(self, requests: list[RecordedRequest]) -> None:
+        for request in sorted(requests, key=lambda recorded_request: recorded_request.timestamp):
+            self.clock.time = request.timestamp
+            self.cleanup()
+            self.replay(request)
+
+    def cleanup(self):
+        if self.last_cleanup is None:
+            self.last_cleanup = self.clock.time
+        elif self.clock.time > self.last_cleanup + ServiceCache.CACHE_CLEANUP_PERIOD:
+            for cache in self.caches.values():
+                cache.clean_expired()
+            self.disk_entries = {key: expiry_time for key, expiry_time in self.disk_entries.items()
+                                 if expiry_time > self.clock.time}
+            self.last_cleanup = self.clock.time
+
+    def replay(self, request: RecordedRequest) -> None:
+        minute_length, minute_offset = self.minute_constraints.enforce(request.minute_length, request.minute_offset)
+        count_threshold = canonical_count_threshold(request.count_threshold)
+        suffix = '_grid' if minute_offset == 0 else '_history_grid'
+
+        if request.region == GLOBAL_REGION:
+            name = 'global_strikes' + suffix
+            grid_baselength = self.normalize_base_length(
+                canonical_grid_base_length(request.grid_baselength, Blitzortung.GLOBAL_MIN_GRID_BASE_LENGTH))
+            parameters = dict(minute_length=minute_length, grid_baselength=grid_baselength,
+                              minute_offset=minute_offset, count_threshold=count_threshold)
+        elif request.region == LOCAL_REGION:
+            name = 'local_strikes' + suffix
+            grid_baselength = self.normalize_base_length(
+                canonical_grid_base_length(request.grid_baselength, Blitzortung.MIN_GRID_BASE_LENGTH))
+            parameters = dict(x=request.x, y=request.y, grid_baselength=grid_baselength,
+                              minute_length=minute_length, minute_offset=minute_offset,
+                              count_threshold=count_threshold, data_area=round(max(5, request.data_area or 5)))
+        else:
+            name = 'strikes' + suffix
+            grid_baselength = self.normalize_base_length(
+                canonical_grid_base_length(request.grid_baselength, Blitzortung.MIN_GRID_BASE_LENGTH))
+            parameters = dict(minute_length=minute_length, grid_baselength=grid_baselength,
+                              minute_offset=minute_offset,
+                              region=force_range(1, request.region, Blitzortung.MAX_REGION),
+                              count_threshold=count_threshold)
+
+        cache = self.caches[name]
+        result = self.results[name]
+
+        hit_count = cache.total_hit_count
+        cache.get(self.create_result, **parameters)
+        result['requests'] += 1
+        if cache.total_hit_count > hit_count:
+            result['hits'] += 1
+            result['db_queries_saved'] += 1
+        elif self.disk_store and minute_offset != 0 and self.is_disk_hit(name, parameters, minute_offset):
+            result['disk_hits'] += 1
+            result['db_queries_saved'] += 1
+        else:
+            result['db_queries'] += 1
+        result['peak_size'] = max(result['peak_size'], cache.get_size())
+
+    def is_disk_hit(self, name: str, parameters: dict, minute_offset: int) -> bool:
+        """Look up the result of the aligned interval in the disk tier, a missing result is stored."""
+        alignment = ServiceCache.time_alignment(minute_offset)
+        end_time = int(self.clock.time) // alignment * alignment + minute_offset * 60
+        disk_key = (name, tuple(sorted(parameters.items())), end_time)
+        if self.disk_entries.get(disk_key, 0) > self.clock.time:
+            return True
+        self.disk_entries[disk_key] = self.clock.time + ServiceCache.CACHE_TTL_DISK
+        return False
+
+    def normalize_base_length(self, grid_baselength: int) -> int:
+        if self.base_lengths is None:
+            return grid_baselength
+        for base_length in self.base_lengths:
+            if grid_baselength <= base_length:
+                return base_length
+        return self.base_lengths[-1]
+
+    @staticmethod
+    def create_result(**kwargs):
+        return kwargs
+
+    def report(self) -> dict[str, dict]:
+        report = {}
+        totals = {'requests': 0, 'hits': 0, 'disk_hits': 0, 'db_queries': 0, 'db_queries_saved': 0, 'peak_size': 0}
+        for name, result in self.results.items():
+            report[name] = self.__summarize(result)
+            for key in totals:
+                totals[key] += result[key]
+        report['total'] = self.__summarize(totals)
+        return report
+
+    def __summarize(self, result):
+        return {
+            **result,
+            'ratio': (result['hits'] + result['disk_hits']) / result['requests'] if result['requests'] else 0.0,
+            'peak_bytes': result['peak_size'] * self.entry_bytes,
+        }
+
+
+def main():
+    parser = OptionParser(usage="%prog [options] <minute json or servicelog files>")
+
+    parser.add_option("--ttl-current", dest="ttl_current", type="int", default=ServiceCache.CACHE_TTL_SHORT,
+                      help="TTL of current grid results in seconds")
+    parser.add_option("--ttl-history", dest="ttl_history", type="int", default=ServiceCache.CACHE_TTL_LONG,
+                      help="TTL of history grid results in seconds")
+    parser.add_option("--local-size-current", dest="local_size_current", type="int",
+                      default=ServiceCache.LOCAL_CACHE_SIZE_CURRENT, help="size of the current local grid cache")
+    parser.add_option("--local-size-history", dest="local_size_history", type="int",
+                      default=ServiceCache.LOCAL_CACHE_SIZE_HISTORY, help="size of the history local grid cache")
+    parser.add_option("--eviction", dest="eviction", default='lru', choices=list(CacheSimulator.EVICTION_POLICIES),
+                      help="eviction policy of size limited caches (lru, fifo)")
+    parser.add_option("--base-lengths", dest="base_lengths", default=None,
+                      help="comma separated grid base lengths requests are snapped to")
+    parser.add_option("--entry-bytes", dest="entry_bytes", type="int", default=20000,
+                      help="estimated size of a cache entry in bytes")
+    parser.add_option("--disk-store", dest="disk_store", action="store_true", default=False,
+                      help="keep history results in a disk tier like a configured cache directory")
+
+    (options, args) = parser.parse_args()
+
+    file_names = []
+    for arg in args:
+        if os.path.isdir(arg):
+            file_names += sorted(glob.glob(os.path.join(arg, '*.json')) + glob.glob(os.path.join(arg, 'servicelog_*')))
+        else:
+            file_names.append(arg)
+
+    requests: list[RecordedRequest] = []
+    for file_name in file_names:
+        requests += read_minute_log(file_name) if file_name.endswith('.json') else read_service_log(file_name)
+
+    base_lengths = [int(value) for value in options.base_lengths.split(',')] if options.base_lengths else None
+    simulator = CacheSimulator(options.ttl_current, options.ttl_history, options.local_size_current,
+                               options.local_size_history, options.eviction, base_lengths, options.entry_bytes,
+                               options.disk_store)
+    simulator.simulate(requests)
+
+    logger.info(f"{'cache':<28} {'requests':>9} {'hits':>9} {'disk':>9} {'ratio':>6} {'queries':>9} {'saved':>9} "
+                f"{'peak':>6} {'peak kB':>9}")
+    for name, result in simulator.report().items():
+        logger.info(f"{name:<28} {result['requests']:>9} {result['hits']:>9} {result['disk_hits']:>9} "
+                    f"{result['ratio'] * 100:>5.1f}% "
+                    f"{result['db_queries']:>9} {result['db_queries_saved']:>9} {result['peak_size']:>6} "
+                    f"{result['peak_bytes'] // 1024:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+
+Replays recorded or synthetic grid requests through the JSON-RPC rendering of a local webservice resource backed by
+a stand-in database
+
+"""
+
+import datetime
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import time
+from io import BytesIO
+from optparse import OptionParser
+from typing import Optional
+
+from twisted.internet.address import IPv4Address
+from twisted.internet.defer import Deferred, succeed
+from twisted.web import http
+from twisted.web.test.requesthelper import DummyRequest
+
+from blitzortung.cli.cache_simulator import GLOBAL_REGION, LOCAL_REGION, RecordedRequest, read_minute_log, \
+    read_service_log
+from blitzortung.service.admission import AdmissionControl
+from blitzortung.service.base import Blitzortung
+from blitzortung.service.cache import ServiceCache
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler(sys.stdout))
+logger.setLevel(logging.INFO)
+
+USER_AGENT = 'bo-android-200'
+
+
+class FakeConnectionPool:
+    """
+    Stand-in for the database connection pool, answers grid queries with synthetic rows after a fixed latency.
+    """
+
+    def __init__(self, latency: float = 0.0, cell_count: int = 1000, x_count: int = 300, y_count: int = 300,
+                 seed=None, clock=None):
+        if clock is None and latency > 0:
+            from twisted.internet import reactor as clock
+        self.latency = latency
+        self.cell_count = cell_count
+        self.x_count = x_count
+        self.y_count = y_count
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.query_count = 0
+
+    def runQuery(self, query: str, parameters: dict) -> Deferred:
+        self.query_count += 1
+        rows = self.create_rows(query, parameters)
+        if not self.latency:
+            return succeed(rows)
+        result = Deferred()
+        self.clock.callLater(self.latency, result.callback, rows)
+        return result
+
+    def create_rows(self, query: str, parameters: dict) -> list[dict]:
+        end_time = parameters.get('end_time') or datetime.datetime.now(datetime.UTC)
+        seconds = int((end_time - parameters['start_time']).total_seconds()) if 'start_time' in parameters else 3600
+        rows = [{'rx': self.random.randrange(self.x_count), 'ry': self.random.randrange(1, self.y_count),
+                 'interval': None, 'strike_count': self.random.randint(1, 20),
+                 'timestamp': end_time - datetime.timedelta(seconds=self.random.randrange(seconds))}
+                for _ in range(self.cell_count)]
+        if 'GROUPING SETS' in query:
+            bin_count = seconds // 60 // parameters['binsize']
+            rows += [{'rx': None, 'ry': None, 'interval': -index, 'strike_count': self.random.randint(0, 1000),
+                      'timestamp': end_time} for index in range(bin_count)]
+        return rows
+
+
+class ReplayRequest(DummyRequest):
+    """In-memory HTTP request, answers the client address like a request received by the server."""
+
+    def getClientIP(self):
+        return self.client.host
+
+
+def create_replay_request(request: RecordedRequest, client: str, id: int = 1,
+                          user_agent: str = USER_AGENT) -> ReplayRequest:
+    """HTTP request with the JSON-RPC call and the headers the app sends for the recorded grid request."""
+    if request.region == GLOBAL_REGION:
+        method = 'get_global_strikes_grid'
+        params = [request.minute_length, request.grid_baselength, request.minute_offset, request.count_threshold]
+    elif request.region == LOCAL_REGION:
+        method = 'get_local_strikes_grid'
+        params = [request.x, request.y, request.grid_baselength, request.minute_length, request.minute_offset,
+                  request.count_threshold, request.data_area or 5]
+    else:
+        method = 'get_strikes_grid'
+        params = [request.minute_length, request.grid_baselength, request.minute_offset, request.region,
+                  request.count_threshold]
+    replay_request = ReplayRequest([b''])
+    replay_request.method = b'POST'
+    replay_request.client = IPv4Address('TCP', client, 0)
+    replay_request.content = BytesIO(json.dumps({'id': id, 'method': method, 'params': params}).encode())
+    replay_request.requestHeaders.setRawHeaders('User-Agent', [user_agent])
+    replay_request.requestHeaders.setRawHeaders('content-type', ['text/json'])
+    replay_request.requestHeaders.setRawHeaders('Accept-Encoding', ['gzip'])
+    return replay_request
+
+
+def is_fault(replay_request: ReplayRequest) -> bool:
+    """Grid results are rendered with an ETag, faults are rendered by the plain JSON-RPC path."""
+    if replay_request.responseCode not in (None, http.OK, http.NOT_MODIFIED):
+        return True
+    if replay_request.responseHeaders.hasHeader('etag'):
+        return False
+    response = json.loads(b''.join(replay_request.written) or b'null')
+    return not isinstance(response, dict) or response.get('error') is not None
+
+
+def synthetic_requests(count: int, rate: float, local_share: float = 0.3, history_share: float = 0.1,
+                       client_count: int = 1000, seed=None) -> list[tuple[RecordedRequest, str]]:
+    """Traffic profile similar to the app: mostly current region grids, some local and history grids."""
+    generator = random.Random(seed)
+    requests = []
+    for index in range(count):
+        timestamp = index / rate
+        minute_length = generator.choice((60, 60, 60, 120, 180))
+        minute_offset = -generator.choice((30, 60, 90)) if generator.random() < history_share else 0
+        grid_baselength = generator.choice((10000, 10000, 25000, 50000))
+        if generator.random() < local_share:
+            request = RecordedRequest(timestamp, minute_length, grid_baselength, minute_offset, LOCAL_REGION, 0,
+                                      generator.randrange(-2, 9), generator.randrange(8, 12), 5)
+        else:
+            request = RecordedRequest(timestamp, minute_length, grid_baselength, minute_offset,
+                                      generator.randint(1, 7), 0)
+        client = generator.randrange(client_count)
+        requests.append((request, f"10.0.{client // 256}.{client % 256}"))
+    return requests
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class LoadReplay:
+    """
+    Sends requests to the webservice resource at their recorded time scaled by the speed factor, or as fast as
+    possible with a limited number of outstanding requests if the speed factor is 0.
+    """
+
+    def __init__(self, service: Blitzortung, speed: float = 0.0, concurrency: int = 10, clock=None):
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self.service = service
+        self.speed = speed
+        self.concurrency = concurrency
+        self.clock = clock
+        self.latencies: list[float] = []
+        self.failures = 0
+        self.pending: list = []
+        self.outstanding = 0
+        self.sending = False
+        self.finished: Optional[Deferred] = None
+        self.start_time = 0.0
+        self.start_cpu_time = 0.0
+        self.end_time = 0.0
+        self.end_cpu_time = 0.0
+
+    def run(self, requests) -> Deferred:
+        """Replay requests given as RecordedRequest or (RecordedRequest, client) tuples."""
+        self.pending = [request if isinstance(request, tuple) else (request, '10.0.0.1') for request in requests]
+        self.pending.reverse()
+        self.finished = Deferred()
+        self.start_time = time.perf_counter()
+        self.start_cpu_time = time.process_time()
+        if not self.pending:
+            self.finish()
+        elif self.speed > 0:
+            first_timestamp = self.pending[-1][0].timestamp
+            for request, client in reversed(self.pending):
+                self.outstanding += 1
+                self.clock.callLater((request.timestamp - first_timestamp) / self.speed, self.send, request, client)
+            self.pending = []
+        else:
+            self.send_next()
+        return self.finished
+
+    def send_next(self):
+        # requests answered from the cache complete synchronously, loop instead of recursing
+        if self.sending:
+            return
+        self.sending = True
+        while self.pending and self.outstanding < self.concurrency:
+            self.outstanding += 1
+            self.send(*self.pending.pop())
+        self.sending = False
+
+    def send(self, request: RecordedRequest, client: str):
+        start_time = time.perf_counter()
+        replay_request = create_replay_request(request, client)
+        finished = replay_request.notifyFinish()
+        finished.addCallbacks(self.completed, self.failed, callbackArgs=(replay_request, start_time))
+        self.service.render(replay_request)
+
+    def completed(self, _, replay_request: ReplayRequest, start_time: float):
+        if is_fault(replay_request):
+            self.failures += 1
+            logger.debug(f"request failed: {b''.join(replay_request.written)[:200]!r}")
+        else:
+            self.latencies.append(time.perf_counter() - start_time)
+        self.request_done()
+
+    def failed(self, failure):
+        self.failures += 1
+        logger.debug(f"request failed: {failure.getErrorMessage()}")
+        self.request_done()
+
+    def request_done(self):
+        self.outstanding -= 1
+        self.send_next()
+        if not self.outstanding and not self.pending:
+            self.finish()
+
+    def finish(self):
+        self.end_time = time.perf_counter()
+        self.end_cpu_time = time.process_time()
+        self.finished.callback(self.report())
+
+    def report(self) -> dict:
+        count = len(self.latencies) + self.failures
+        duration = self.end_time - self.start_time
+        cache_statistics = {}
+        for name, cache in self.service.cache.caches().items():
+            if cache.total_count:
+                cache_statistics[name] = cache.total_hit_count / cache.total_count
+        return {
+            'requests': count,
+            'failures': self.failures,
+            'duration': duration,
+            'throughput': count / duration if duration > 0 else 0.0,
+            'p50': percentile(self.latencies, 0.50),
+            'p95': percentile(self.latencies, 0.95),
+            'p99': percentile(self.latencies, 0.99),
+            'cpu_per_request': (self.end_cpu_time - self.start_cpu_time) / count if count else 0.0,
+            'cache_ratios': cache_statistics,
+            'stages': self.service.tracer.get_statistics(),
+        }
+
+
+def create_service(connection_pool) -> Blitzortung:
+    admission = AdmissionControl(rate=1e9, burst=1e9)
+    return Blitzortung(connection_pool, None, cache=ServiceCache(), forbidden_ips=set(), admission=admission)
+
+
+def log_report(report: dict) -> None:
+    logger.info(f"requests {report['requests']} failures {report['failures']} in {report['duration']:.2f}s, "
+                f"{report['throughput']:.1f} requests/s")
+    logger.info(f"latency p50 {report['p50'] * 1000:.1f}ms p95 {report['p95'] * 1000:.1f}ms "
+                f"p99 {report['p99'] * 1000:.1f}ms, cpu {report['cpu_per_request'] * 1000:.2f}ms per request")
+    for name, ratio in sorted(report['cache_ratios'].items()):
+        logger.info(f"{name:<28} {ratio * 100:>5.1f}%")
+    for name, stages in sorted(report['stages'].items()):
+        for stage, statistics in sorted(stages.items()):
+            logger.info(f"{name:<24} {stage:<14} #{statistics['count']:<7} p50 {statistics['p50']}ms "
+                        f"p99 {statistics['p99']}ms max {statistics['max']}ms")
+
+
+def main():
+    parser = OptionParser(usage="%prog [options] [<minute json or servicelog files>]")
+
+    parser.add_option("--speed", dest="speed", type="float", default=0.0,
+                      help="replay speed factor relative to the recorded time, 0 replays as fast as possible")
+    parser.add_option("--concurrency", dest="concurrency", type="int", default=10,
+                      help="outstanding requests when replaying as fast as possible")
+    parser.add_option("--synthetic", dest="synthetic", type="int", default=0,
+                      help="number of synthetic requests to send instead of recorded ones")
+    parser.add_option("--rate", dest="rate", type="float", default=100.0,
+                      help="request rate of synthetic traffic per second")
+    parser.add_option("--db-latency", dest="db_latency", type="float", default=0.05,
+                      help="latency of the stand-in database in seconds")
+    parser.add_option("--cells", dest="cells", type="int", default=1000,
+                      help="number of grid cells returned by the stand-in database")
+    parser.add_option("--seed", dest="seed", type="int", default=None, help="random seed")
+
+    (options, args) = parser.parse_args()
+
+    if options.synthetic:
+        requests = synthetic_requests(options.synthetic, options.rate, seed=options.seed)
+    else:
+        file_names = []
+        for arg in args:
+            if os.path.isdir(arg):
+                file_names += sorted(
+                    glob.glob(os.path.join(arg, '*.json')) + glob.glob(os.path.join(arg, 'servicelog_*')))
+            else:
+                file_names.append(arg)
+        requests = []
+        for file_name in file_names:
+            requests += read_minute_log(file_name) if file_name.endswith('.json') else read_service_log(file_name)
+        requests.sort(key=lambda request: request.timestamp)
+
+    from twisted.internet import reactor
+
+    connection_pool = FakeConnectionPool(options.db_latency, options.cells, seed=options.seed)
+    replay = LoadReplay(create_service(connection_pool), options.speed, options.concurrency)
+
+    def finished(report):
+        log_report(report)
+        logger.info(f"database queries {connection_pool.query_count}")
+        reactor.stop()
+
+    reactor.callWhenRunning(lambda: replay.run(requests).addCallback(finished))
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main()
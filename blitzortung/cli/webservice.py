@@ -3,6 +3,7 @@
 import os
 
 from twisted.application import internet, service
+from twisted.internet.task import LoopingCall
 from twisted.internet.error import ReactorAlreadyInstalledError
 from twisted.python import log
 from twisted.python.log import ILogObserver
@@ -20,15 +21,29 @@ except (ImportError, ReactorAlreadyInstalledError):
     except (ImportError, ReactorAlreadyInstalledError):
         pass
 
+from twisted.internet import reactor
+from blitzortung.service.admission import AdmissionControl
 from blitzortung.service.base import Blitzortung, LogObserver
+from blitzortung.service.cache import ServiceCache
+from blitzortung.service.disk_cache import DiskStore
+from blitzortung.service.json_encoder import create_json_encoder
+from blitzortung.service.metrics import StatsDMetrics
+from blitzortung.service.precompute import GridPrecomputer
+from blitzortung.service.push import GridFeed, PushPublisher, PushResource
+from blitzortung.service.supervisor import AdoptedPortService, get_listening_fd, get_worker_index
+from blitzortung.service.warming import CacheWarmer
 import blitzortung.config
+import blitzortung.service
 
 application = service.Application("Blitzortung.org JSON-RPC Server")
 
+worker_index = get_worker_index()
+worker_suffix = f"-{worker_index}" if worker_index is not None else ""
+
 log_directory = "/var/log/blitzortung"
 try:
     if log_directory and os.path.exists(log_directory):
-        logfile = DailyLogFile("webservice.log", log_directory)
+        logfile = DailyLogFile(f"webservice{worker_suffix}.log", log_directory)
         application.setComponent(ILogObserver, LogObserver(logfile).emit)
     else:
         log_directory = None
@@ -42,14 +57,144 @@ def start_server(connection_pool):
     print("Connection pool is ready")
     config = blitzortung.config.config()
     port = config.get_webservice_port()
-    root = Blitzortung(connection_pool, log_directory)
+    root = Blitzortung(connection_pool, log_directory, cache=create_cache(config),
+                       metrics=StatsDMetrics(worker=worker_index), log_file_suffix=worker_suffix,
+                       admission=create_admission_control(config),
+                       json_encoder=create_json_encoder(config.get_webservice_json_encoder()))
+    reactor.addSystemEventTrigger('before', 'shutdown', root.access_log.stop)
+    restore_cache(root, config)
+    cache_metrics = LoopingCall(report_cache_statistics, root)
+    cache_metrics.start(CACHE_METRICS_INTERVAL, now=False)
+    trace_metrics = LoopingCall(report_trace_statistics, root)
+    trace_metrics.start(CACHE_METRICS_INTERVAL, now=False)
+    query_metrics = LoopingCall(report_query_statistics, root)
+    query_metrics.start(CACHE_METRICS_INTERVAL, now=False)
+    start_push(root, config)
+    start_strike_buffer(root, config)
+    start_result_offload()
+    grid_precomputer = start_grid_precompute(root, config)
+    start_cache_warming(root, config, grid_precomputer)
     site = server.Site(root)
     site.displayTracebacks = False
-    jsonrpc_server = internet.TCPServer(port, site, interface='127.0.0.1')
+    listening_fd = get_listening_fd()
+    if listening_fd is not None:
+        jsonrpc_server = AdoptedPortService(listening_fd, site, reactor)
+    else:
+        jsonrpc_server = internet.TCPServer(port, site, interface='127.0.0.1')
     jsonrpc_server.setServiceParent(application)
     return jsonrpc_server
 
 
+CACHE_METRICS_INTERVAL = 60  # seconds
+
+
+def report_cache_statistics(root):
+    """Export the cache statistics of the service as metrics."""
+    root.metrics.for_cache_statistics(root.cache.get_statistics(top_key_count=0))
+
+
+def report_trace_statistics(root):
+    """Export the latency percentiles per stage of the last interval as metrics."""
+    root.metrics.for_trace_statistics(root.tracer.get_statistics(reset=True))
+
+
+def report_query_statistics(root):
+    """Export the queue depths and wait time percentiles per query class of the last interval as metrics."""
+    root.metrics.for_query_statistics(root.connection_pool.scheduler.get_statistics(reset=True))
+
+
+def create_admission_control(config):
+    """Create the per client rate limiting with the configured blocklist."""
+    return AdmissionControl(rate=config.get_webservice_rate_limit(), burst=config.get_webservice_rate_burst(),
+                            blocklist=config.get_webservice_blocklist())
+
+
+def get_cache_directory(config):
+    """Cache files are kept per worker process."""
+    cache_directory = config.get_webservice_cache_directory()
+    if cache_directory and worker_index is not None:
+        return os.path.join(cache_directory, f"worker{worker_suffix}")
+    return cache_directory
+
+
+def create_cache(config):
+    """Create the service cache, backed by a disk store if a cache directory is configured."""
+    cache_directory = get_cache_directory(config)
+    if not cache_directory:
+        return ServiceCache()
+    os.makedirs(cache_directory, exist_ok=True)
+    disk_store = DiskStore(os.path.join(cache_directory, "history.store"))
+    disk_store.start()
+    reactor.addSystemEventTrigger('after', 'shutdown', disk_store.close)
+    return ServiceCache(disk_store)
+
+
+def restore_cache(root, config):
+    """Restore the cache snapshot of the previous run and save a new one on shutdown."""
+    cache_directory = get_cache_directory(config)
+    if not cache_directory:
+        return
+    snapshot_path = os.path.join(cache_directory, "snapshot.json")
+    root.cache.load_snapshot(snapshot_path, root.cache_creators())
+    reactor.addSystemEventTrigger('before', 'shutdown', root.cache.save_snapshot, snapshot_path)
+
+
+def start_cache_warming(root, config, grid_precomputer=None):
+    """Refresh the most popular current grid results, except the precomputed ones, before they expire, if enabled."""
+    top_key_count = config.get_webservice_warming_top_keys()
+    if top_key_count <= 0:
+        return None
+    cache_warmer = CacheWarmer(root.cache.current_caches(), top_key_count=top_key_count,
+                               max_concurrency=config.get_webservice_warming_concurrency(),
+                               alignment=ServiceCache.time_alignment(0),
+                               ignored_keys=grid_precomputer.cache_keys() if grid_precomputer else frozenset())
+    cache_warmer.start()
+    reactor.addSystemEventTrigger('before', 'shutdown', cache_warmer.stop)
+    return cache_warmer
+
+
+def start_push(root, config):
+    """Serve grid updates as server-sent events below /push, if enabled."""
+    if not config.get_webservice_push_enabled():
+        return None
+    publisher = PushPublisher(GridFeed(root))
+    root.putChild(b'push', PushResource(publisher, root))
+    publisher.start()
+    reactor.addSystemEventTrigger('before', 'shutdown', publisher.stop)
+    return publisher
+
+
+def start_strike_buffer(root, config):
+    """Keep the strikes of the last minutes in memory for get_strikes, recent grids and histograms, if enabled."""
+    if not config.get_webservice_strike_buffer_enabled():
+        return None
+    strike_buffer_feed = blitzortung.service.strike_buffer_feed()
+    strike_buffer_feed.start(root.strike_buffer, root.connection_pool)
+    reactor.addSystemEventTrigger('before', 'shutdown', strike_buffer_feed.stop)
+    return strike_buffer_feed
+
+
+def start_result_offload():
+    """Build the results of large queries on a thread pool."""
+    result_offload = blitzortung.service.result_offload()
+    result_offload.start()
+    reactor.addSystemEventTrigger('after', 'shutdown', result_offload.stop)
+    return result_offload
+
+
+def start_grid_precompute(root, config):
+    """Compute the current grids of the standard views every interval and publish them into the cache, if enabled."""
+    interval = config.get_webservice_precompute_interval()
+    if interval <= 0:
+        return None
+    grid_precomputer = GridPrecomputer(root, minute_lengths=config.get_webservice_precompute_minute_lengths(),
+                                       base_lengths=config.get_webservice_precompute_base_lengths(),
+                                       interval=interval)
+    grid_precomputer.start()
+    reactor.addSystemEventTrigger('before', 'shutdown', grid_precomputer.stop)
+    return grid_precomputer
+
+
 def on_error(failure):
     """Error handler for connection pool failures."""
     log.err(failure, "Failed to create connection pool")
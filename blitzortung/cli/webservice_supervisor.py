@@ -0,0 +1,49 @@
+"""Blitzortung webservice supervisor running multiple worker processes on a shared socket."""
+
+import os.path
+import sys
+from optparse import OptionParser
+
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+
+import blitzortung.config
+from blitzortung.service.metrics import StatsDMetrics
+from blitzortung.service.supervisor import WorkerSupervisor, create_listening_socket
+
+METRICS_INTERVAL = 60  # seconds
+
+
+def worker_command():
+    """Command running a single webservice worker in the foreground."""
+    webservice_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "webservice.py")
+    return [sys.executable, "-c", "from twisted.scripts.twistd import run; run()",
+            "--nodaemon", "--pidfile=", "-oy", webservice_path]
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-w", "--workers", dest="workers", type="int", default=None,
+                      help="number of worker processes (default from config)")
+    (options, _) = parser.parse_args()
+
+    from twisted.internet import reactor
+
+    config = blitzortung.config.config()
+    worker_count = options.workers if options.workers is not None else config.get_webservice_workers()
+
+    listening_socket = create_listening_socket(config.get_webservice_port())
+    log.startLogging(sys.stdout)
+
+    supervisor = WorkerSupervisor(max(1, worker_count), listening_socket.fileno(), worker_command(),
+                                  reactor=reactor, metrics=StatsDMetrics())
+    reactor.callWhenRunning(supervisor.start)
+    reactor.callWhenRunning(supervisor.install_signal_handlers)
+    LoopingCall(supervisor.report_metrics).start(METRICS_INTERVAL, now=False)
+    reactor.addSystemEventTrigger('before', 'shutdown', supervisor.stop)
+    reactor.run()
+    listening_socket.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,8 @@ from typing import Optional
 
 from injector import Module, singleton, inject, provider
 
+TRUE_VALUES = ('1', 'yes', 'true', 'on')
+
 
 @singleton
 class Config:
@@ -53,6 +55,61 @@ class Config:
     def get_webservice_port(self) -> int:
         return int(self.config_parser.get('webservice', 'port'))
 
+    def get_webservice_cache_directory(self) -> Optional[str]:
+        return self.config_parser.get('webservice', 'cache_directory', fallback=None)
+
+    def get_webservice_push_enabled(self) -> bool:
+        return self.config_parser.get('webservice', 'push', fallback='false').strip().lower() in TRUE_VALUES
+
+    def get_webservice_strike_buffer_enabled(self) -> bool:
+        return self.config_parser.get('webservice', 'strike_buffer', fallback='false').strip().lower() in TRUE_VALUES
+
+    def get_webservice_warming_top_keys(self) -> int:
+        return int(self.config_parser.get('webservice', 'warming_top_keys', fallback='0'))
+
+    def get_webservice_warming_concurrency(self) -> int:
+        return int(self.config_parser.get('webservice', 'warming_concurrency', fallback='2'))
+
+    def get_webservice_precompute_interval(self) -> int:
+        return int(self.config_parser.get('webservice', 'precompute_interval', fallback='0'))
+
+    def get_webservice_precompute_minute_lengths(self) -> tuple[int, ...]:
+        minute_lengths = self.config_parser.get('webservice', 'precompute_minute_lengths', fallback='60, 120, 180')
+        return tuple(int(minute_length) for minute_length in minute_lengths.split(',') if minute_length.strip())
+
+    def get_webservice_precompute_base_lengths(self) -> tuple[int, ...]:
+        base_lengths = self.config_parser.get('webservice', 'precompute_base_lengths', fallback='10000, 25000, 50000')
+        return tuple(int(base_length) for base_length in base_lengths.split(',') if base_length.strip())
+
+    def get_webservice_workers(self) -> int:
+        return int(self.config_parser.get('webservice', 'workers', fallback='1'))
+
+    def get_webservice_rate_limit(self) -> float:
+        return float(self.config_parser.get('webservice', 'rate_limit', fallback='0'))
+
+    def get_webservice_rate_burst(self) -> float:
+        return float(self.config_parser.get('webservice', 'rate_burst', fallback='30'))
+
+    def get_webservice_blocklist(self) -> list[str]:
+        blocklist = self.config_parser.get('webservice', 'blocklist', fallback='')
+        return [network.strip() for network in blocklist.split(',') if network.strip()]
+
+    def get_webservice_db_pool_size(self) -> int:
+        return int(self.config_parser.get('webservice', 'db_pool_size', fallback='3'))
+
+    def get_webservice_db_query_limits(self) -> dict[str, int]:
+        query_limits = self.config_parser.get('webservice', 'db_query_limits', fallback='')
+        return {query_class.strip(): int(limit) for query_class, limit in
+                (entry.split(':') for entry in query_limits.split(',') if entry.strip())}
+
+    def get_webservice_db_query_timeouts(self) -> dict[str, str]:
+        query_timeouts = self.config_parser.get('webservice', 'db_query_timeouts', fallback='')
+        return {query_class.strip(): timeout.strip() for query_class, timeout in
+                (entry.split(':') for entry in query_timeouts.split(',') if entry.strip())}
+
+    def get_webservice_json_encoder(self) -> str:
+        return self.config_parser.get('webservice', 'json_encoder', fallback='grid')
+
     def __str__(self) -> str:
         return "Config(user: %s, pass: %s)" % (self.get_username(), len(self.get_password()) * '*')
 
@@ -245,13 +245,72 @@ class SelectQuery(Query):
         return sql.strip()
 
 
-class GridQuery(SelectQuery):
-    __slots__ = ['grid']
+class BaseGridQuery(SelectQuery):
+    """
+    Counts the strikes per grid cell.
+
+    If a histogram bin size is given, the strike count histogram of the same rows is computed in the same table scan
+    using grouping sets. Grid cells are returned with a NULL interval, histogram bins with NULL cell coordinates.
+    """
+    __slots__ = ['grid', 'cell_columns', 'histogram_binsize']
 
-    def __init__(self, grid, count_threshold=0):
+    def __init__(self, grid, x_column, y_column, count_threshold=0, histogram_binsize=None):
         super().__init__()
 
         self.grid = grid
+        self.histogram_binsize = histogram_binsize
+
+        if histogram_binsize:
+            self.cell_columns = [
+                x_column + ' AS rx',
+                y_column + ' AS ry',
+                '-extract(epoch from %(end_time)s - "timestamp")::int/60/%(binsize)s AS "interval"',
+                '"timestamp"',
+            ]
+            self.set_columns('rx', 'ry', '"interval"', 'count(*) AS strike_count', 'max("timestamp") as "timestamp"')
+            self.add_parameters(binsize=histogram_binsize)
+            self.add_group_by('GROUPING SETS ((rx, ry), ("interval"))')
+            if count_threshold > 0:
+                self.add_group_having("(GROUPING(rx, ry) <> 0 OR count(*) > %(count_threshold)s)",
+                                      count_threshold=count_threshold)
+        else:
+            self.cell_columns = []
+            self.set_columns(
+                x_column + ' AS rx',
+                y_column + ' AS ry',
+                'count(*) AS strike_count',
+                'max("timestamp") as "timestamp"'
+            )
+            self.add_group_by('rx')
+            self.add_group_by('ry')
+            if count_threshold > 0:
+                self.add_group_having("count(*) > %(count_threshold)s", count_threshold=count_threshold)
+
+    def __str__(self):
+        if not self.histogram_binsize:
+            return super().__str__()
+
+        cells = SelectQuery() \
+            .set_table_name(self.table_name) \
+            .set_columns(*self.cell_columns)
+        cells.conditions = self.conditions
+
+        query = SelectQuery() \
+            .set_table_name('(' + str(cells) + ') AS cells') \
+            .set_columns(*self.columns)
+        query.groups = self.groups
+        query.groups_having = self.groups_having
+        return str(query)
+
+
+class GridQuery(BaseGridQuery):
+    __slots__ = []
+
+    def __init__(self, grid, count_threshold=0, histogram_binsize=None):
+        super().__init__(grid,
+                         'TRUNC((ST_X(ST_Transform(geog::geometry, %(srid)s)) - %(xmin)s) / %(xdiv)s)::integer',
+                         'TRUNC((ST_Y(ST_Transform(geog::geometry, %(srid)s)) - %(ymin)s) / %(ydiv)s)::integer',
+                         count_threshold, histogram_binsize)
 
         self.add_parameters(
             srid=grid.srid,
@@ -261,13 +320,6 @@ class GridQuery(SelectQuery):
             ydiv=grid.y_div,
         )
 
-        self.set_columns(
-            'TRUNC((ST_X(ST_Transform(geog::geometry, %(srid)s)) - %(xmin)s) / %(xdiv)s)::integer AS rx',
-            'TRUNC((ST_Y(ST_Transform(geog::geometry, %(srid)s)) - %(ymin)s) / %(ydiv)s)::integer AS ry',
-            'count(*) AS strike_count',
-            'max("timestamp") as "timestamp"'
-        )
-
         env = self.grid.env
 
         if env.is_valid:
@@ -277,20 +329,15 @@ class GridQuery(SelectQuery):
         else:
             raise ValueError("invalid Raster geometry in db.query.GridQuery.__init__()")
 
-        self.add_group_by('rx')
-        self.add_group_by('ry')
-
-        if count_threshold > 0:
-            self.add_group_having("count(*) > %(count_threshold)s", count_threshold=count_threshold)
 
+class GlobalGridQuery(BaseGridQuery):
+    __slots__ = []
 
-class GlobalGridQuery(SelectQuery):
-    __slots__ = ['grid']
-
-    def __init__(self, grid, count_threshold=0):
-        super().__init__()
-
-        self.grid = grid
+    def __init__(self, grid, count_threshold=0, histogram_binsize=None):
+        super().__init__(grid,
+                         'ROUND((ST_X(ST_Transform(geog::geometry, %(srid)s)) - %(xdiv)s * 0.5) / %(xdiv)s)::integer',
+                         'ROUND((ST_Y(ST_Transform(geog::geometry, %(srid)s)) - %(ydiv)s * 0.5) / %(ydiv)s)::integer',
+                         count_threshold, histogram_binsize)
 
         self.add_parameters(
             srid=grid.srid,
@@ -298,19 +345,6 @@ class GlobalGridQuery(SelectQuery):
             ydiv=grid.y_div,
         )
 
-        self.set_columns(
-            'ROUND((ST_X(ST_Transform(geog::geometry, %(srid)s)) - %(xdiv)s * 0.5) / %(xdiv)s)::integer AS rx',
-            'ROUND((ST_Y(ST_Transform(geog::geometry, %(srid)s)) - %(ydiv)s * 0.5) / %(ydiv)s)::integer AS ry',
-            'count(*) AS strike_count',
-            'max("timestamp") as "timestamp"'
-        )
-
-        self.add_group_by('rx')
-        self.add_group_by('ry')
-
-        if count_threshold > 0:
-            self.add_group_having("count(*) > %(count_threshold)s", count_threshold=count_threshold)
-
 
 class Order:
     """
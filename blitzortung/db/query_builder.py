@@ -43,14 +43,14 @@ class Strike:
         return query
 
     @staticmethod
-    def grid_query(table_name, grid, count_threshold=0, **kwargs):
-        return GridQuery(grid, count_threshold) \
+    def grid_query(table_name, grid, count_threshold=0, histogram_binsize=None, **kwargs):
+        return GridQuery(grid, count_threshold, histogram_binsize) \
             .set_table_name(table_name) \
             .set_default_conditions(**kwargs)
 
     @staticmethod
-    def global_grid_query(table_name, grid, count_threshold=0, **kwargs):
-        return GlobalGridQuery(grid, count_threshold) \
+    def global_grid_query(table_name, grid, count_threshold=0, histogram_binsize=None, **kwargs):
+        return GlobalGridQuery(grid, count_threshold, histogram_binsize) \
             .set_table_name(table_name) \
             .set_default_conditions(**kwargs)
 
@@ -30,6 +30,9 @@ class LocalGrid:
     def longitude_extension(self):
         return abs(self.center_latitude) / 15.0
 
+    def is_on_globe(self) -> bool:
+        return -180 <= self.reference_longitude < 180 and -90 <= self.reference_latitude < 90
+
 
     def get_grid_factory(self) -> blitzortung.geom.GridFactory:
         return blitzortung.geom.GridFactory(
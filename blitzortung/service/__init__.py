@@ -18,9 +18,11 @@
 
 """
 
-from . import histogram, strike, strike_grid
+from . import histogram, offload, strike, strike_buffer, strike_grid
 from .histogram import HistogramQuery
+from .offload import ResultOffload
 from .strike import StrikeQuery
+from .strike_buffer import StrikeBufferFeed
 from .strike_grid import GlobalStrikeGridQuery, StrikeGridQuery
 
 
@@ -50,3 +52,17 @@ def histogram_query() -> HistogramQuery:
 
     result : HistogramQuery =  blitzortung.INJECTOR.get(histogram.HistogramQuery)
     return result
+
+
+def strike_buffer_feed() -> StrikeBufferFeed:
+    import blitzortung
+
+    result: StrikeBufferFeed = blitzortung.INJECTOR.get(strike_buffer.StrikeBufferFeed)
+    return result
+
+
+def result_offload() -> ResultOffload:
+    import blitzortung
+
+    result: ResultOffload = blitzortung.INJECTOR.get(offload.ResultOffload)
+    return result
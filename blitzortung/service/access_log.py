@@ -0,0 +1,132 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import collections
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+from twisted.python import log
+
+PERIOD_SECONDS = 60
+
+
+class AccessLog:
+    """
+    Collects request log entries per minute and writes them to one file per minute from a background thread.
+
+    The number of entries per minute and the number of minutes waiting to be written are bounded. Entries beyond
+    the limit are only counted, the counts are written with the next file under the 'dropped' key.
+    """
+
+    MAX_ENTRIES_PER_PERIOD = 100000
+    MAX_PENDING_PERIODS = 5
+
+    def __init__(self, log_directory: Optional[str], file_suffix: str = '',
+                 max_entries: int = MAX_ENTRIES_PER_PERIOD, max_pending: int = MAX_PENDING_PERIODS,
+                 clock=time.time):
+        self.log_directory = log_directory
+        self.file_suffix = file_suffix
+        self.max_entries = max_entries
+        self.clock = clock
+        self.current_period = self.period_of(clock())
+        self.current_data: dict[str, list] = collections.defaultdict(list)
+        self.dropped: collections.Counter = collections.Counter()
+        self.pending: queue.Queue = queue.Queue(max_pending)
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def period_of(timestamp: float) -> int:
+        return int(timestamp // PERIOD_SECONDS) * PERIOD_SECONDS
+
+    def append(self, method: str, *entry) -> bool:
+        """Add an entry with the current time in microseconds, returns False if the entry was dropped."""
+        now = self.clock()
+        self.check_period(now)
+        entries = self.current_data[method]
+        if len(entries) >= self.max_entries:
+            self.dropped[method] += 1
+            return False
+        entries.append((int(now * 1000000),) + entry)
+        return True
+
+    def check_period(self, now: float) -> None:
+        period = self.period_of(now)
+        if period != self.current_period:
+            self.flush()
+            self.current_period = period
+
+    def flush(self) -> None:
+        """Hand the entries of the current period over to the writer thread."""
+        data, self.current_data = self.current_data, collections.defaultdict(list)
+        if not self.log_directory:
+            self.dropped.clear()
+            return
+
+        data['timestamp'] = self.current_period * 1000000
+        if self.dropped:
+            data['dropped'] = dict(self.dropped)
+            log.msg(f"access log: dropped {sum(self.dropped.values())} entries")
+            self.dropped.clear()
+
+        self.start()
+        try:
+            self.pending.put_nowait((self.current_period, data))
+        except queue.Full:
+            log.msg(f"access log: writer busy, dropped period {self.file_name(self.current_period)}")
+
+    def file_name(self, period: int) -> str:
+        timestamp = datetime.datetime.fromtimestamp(period, datetime.UTC)
+        return timestamp.strftime("%Y%m%d-%H%M") + self.file_suffix + ".json"
+
+    def start(self) -> None:
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='access-log', daemon=True)
+                self.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write the current period and wait for the writer thread to finish."""
+        self.flush()
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.pending.put(None)
+            thread.join(timeout)
+
+    def run(self) -> None:
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            self.write(*item)
+
+    def write(self, period: int, data: dict) -> None:
+        path = os.path.join(self.log_directory, self.file_name(period))
+        try:
+            with open(path, 'w') as output_file:
+                json.dump(data, output_file, separators=(',', ':'))
+        except (OSError, TypeError, ValueError) as error:
+            log.msg(f"access log: failed to write {path}: {error}")
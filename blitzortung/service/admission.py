@@ -0,0 +1,166 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import ipaddress
+import time
+from typing import Optional
+
+from twisted.python import log
+
+ADMITTED = None
+BLOCKED = 'blocked'
+BANNED = 'banned'
+RATE_LIMITED = 'rate_limited'
+
+REJECTED_FAULT_CODE = 429
+
+
+class TokenBucket:
+    __slots__ = ['tokens', 'last_update', 'rejections']
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.last_update = now
+        self.rejections = 0
+
+    def take(self, rate: float, burst: float, now: float) -> bool:
+        self.tokens = min(burst, self.tokens + (now - self.last_update) * rate)
+        self.last_update = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class PrefixTrie:
+    """
+    Binary trie of network prefixes, answers whether an address is contained in any of the stored networks.
+    """
+
+    def __init__(self, networks=()):
+        self.roots: dict[int, dict] = {4: {}, 6: {}}
+        for network in networks:
+            self.add(network)
+
+    def add(self, network) -> None:
+        network = ipaddress.ip_network(network, strict=False)
+        node = self.roots[network.version]
+        bits = int(network.network_address)
+        for index in range(network.prefixlen):
+            if node.get('end'):
+                return
+            bit = (bits >> (network.max_prefixlen - 1 - index)) & 1
+            node = node.setdefault(bit, {})
+        node.clear()
+        node['end'] = True
+
+    def contains(self, address) -> bool:
+        address = ipaddress.ip_address(address)
+        node = self.roots[address.version]
+        bits = int(address)
+        max_prefix_length = address.max_prefixlen
+        for index in range(max_prefix_length):
+            if node.get('end'):
+                return True
+            node = node.get((bits >> (max_prefix_length - 1 - index)) & 1)
+            if node is None:
+                return False
+        return bool(node.get('end'))
+
+
+class AdmissionControl:
+    """
+    Admission of client requests based on a CIDR blocklist and token buckets per client.
+
+    Clients are identified by their address prefix and user agent. Clients exhausting their bucket get a temporary
+    ban once the number of consecutive rejections reaches the ban threshold.
+
+    Rate limiting is disabled with a rate of zero, as many clients can share an address behind carrier-grade NAT.
+    """
+
+    IPV4_PREFIX_LENGTH = 32
+    IPV6_PREFIX_LENGTH = 64
+    CLEANUP_PERIOD = 60  # seconds
+
+    def __init__(self, rate: float = 0.0, burst: float = 30, ban_threshold: int = 30, ban_seconds: float = 300,
+                 blocklist=(), clock=time.time):
+        self.rate = rate
+        self.burst = burst
+        self.ban_threshold = ban_threshold
+        self.ban_seconds = ban_seconds
+        self.blocklist = PrefixTrie(blocklist)
+        self.clock = clock
+        self.buckets: dict[tuple, TokenBucket] = {}
+        self.bans: dict[tuple, float] = {}
+        self.next_cleanup = clock() + self.CLEANUP_PERIOD
+
+    def check(self, client: Optional[str], user_agent: Optional[str]) -> Optional[str]:
+        """Returns None if the request is admitted, the reason of the rejection otherwise."""
+        try:
+            address = ipaddress.ip_address(client)
+        except ValueError:
+            return BLOCKED
+
+        if self.blocklist.contains(address):
+            return BLOCKED
+
+        if self.rate <= 0:
+            return ADMITTED
+
+        now = self.clock()
+        if now > self.next_cleanup:
+            self.cleanup(now)
+
+        key = (self.client_prefix(address), user_agent)
+        ban_end = self.bans.get(key)
+        if ban_end is not None:
+            if now < ban_end:
+                return BANNED
+            del self.bans[key]
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.burst, now)
+        if bucket.take(self.rate, self.burst, now):
+            bucket.rejections = 0
+            return ADMITTED
+
+        bucket.rejections += 1
+        if bucket.rejections >= self.ban_threshold:
+            self.bans[key] = now + self.ban_seconds
+            del self.buckets[key]
+            log.msg(f"admission: banned {key[0]} '{key[1]}' for {self.ban_seconds}s")
+        return RATE_LIMITED
+
+    def client_prefix(self, address) -> str:
+        prefix_length = self.IPV4_PREFIX_LENGTH if address.version == 4 else self.IPV6_PREFIX_LENGTH
+        return str(ipaddress.ip_network((address, prefix_length), strict=False))
+
+    def cleanup(self, now: float) -> None:
+        """Drop buckets which have been refilled completely and expired bans."""
+        refill_seconds = self.burst / self.rate
+        self.buckets = {key: bucket for key, bucket in self.buckets.items()
+                        if now - bucket.last_update < refill_seconds}
+        self.bans = {key: ban_end for key, ban_end in self.bans.items() if ban_end > now}
+        self.next_cleanup = now + self.CLEANUP_PERIOD
+
+    def get_banned_clients(self) -> list[tuple]:
+        now = self.clock()
+        return [key for key, ban_end in self.bans.items() if ban_end > now]
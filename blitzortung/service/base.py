@@ -1,32 +1,36 @@
 """Blitzortung webservice classes."""
 
-import calendar
-import collections
-import datetime
 import gc
-import json
-import os
 import platform
 import time
 from typing import Any
 
-from twisted.internet.defer import succeed
+from twisted.internet.defer import Deferred, gatherResults, maybeDeferred, succeed
 from twisted.python import log
 from twisted.python.log import FileLogObserver, textFromEventDict, _safeFormat
 from twisted.python.util import untilConcludes
+from txjsonrpc_ng import jsonrpclib
 from txjsonrpc_ng.web import jsonrpc
-from txjsonrpc_ng.web.data import CacheableResult
 from txjsonrpc_ng.web.jsonrpc import with_request
 
 from blitzortung.gis.constants import grid, global_grid
+from blitzortung.service.access_log import AccessLog
+from blitzortung.service.admission import AdmissionControl, REJECTED_FAULT_CODE
 from blitzortung.gis.local_grid import LocalGrid
 from blitzortung.service.cache import ServiceCache
+from blitzortung.service.grid_delta import GridVersions
+from blitzortung.service.json_encoder import create_json_encoder
 from blitzortung.service.metrics import StatsDMetrics
+from blitzortung.service.strike_buffer import StrikeBuffer
+from blitzortung.service.tracing import CACHE_LOOKUP, CACHE_WAIT, REQUEST_LOG, SERIALIZATION, VALIDATION, \
+    Tracer
+from blitzortung.service.response import EncodedResult, encode_grid_result, render_encoded_result, \
+    combine_encoded_results
 from blitzortung.util import TimeConstraint
 import blitzortung.service
-from blitzortung.db.query import TimeInterval
-from blitzortung.service.general import create_time_interval
-from blitzortung.service.strike_grid import GridParameters
+from blitzortung.service.general import create_time_interval, canonical_grid_base_length, \
+    canonical_count_threshold
+from blitzortung.service.strike_grid import GridParameters, SharedHistogram
 
 
 JSON_CONTENT_TYPE = 'text/json'
@@ -37,6 +41,12 @@ FORBIDDEN_IPS: dict[str, Any] = {}
 
 USER_AGENT_PREFIX = 'bo-android-'
 
+ADMIN_CLIENTS = ('127.0.0.1', '::1')
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
 
 class Blitzortung(jsonrpc.JSONRPC):
     """
@@ -60,49 +70,65 @@ class Blitzortung(jsonrpc.JSONRPC):
     # User agent validation constants
     MAX_COMPATIBLE_ANDROID_VERSION = 177
 
+    # Batch request constants
+    MAX_BATCH_GRIDS = 8
+    BATCH_GRID_PARAMETERS = {
+        'region': ('minute_length', 'grid_base_length', 'minute_offset', 'region', 'count_threshold'),
+        'global': ('minute_length', 'grid_base_length', 'minute_offset', 'count_threshold'),
+        'local': ('x', 'y', 'grid_base_length', 'minute_length', 'minute_offset', 'count_threshold', 'data_area'),
+    }
+    BATCH_GRID_REQUIRED_PARAMETERS = {
+        'region': ('minute_length',),
+        'global': ('minute_length',),
+        'local': ('x', 'y'),
+    }
+
     # Memory info interval
     MEMORY_INFO_INTERVAL = 300  # 5 minutes
 
     def __init__(self, db_connection_pool=None, log_directory=None,
                  strike_query=None, strike_grid_query=None,
                  global_strike_grid_query=None, histogram_query=None,
-                 cache=None, metrics=None, forbidden_ips=None):
+                 cache=None, metrics=None, forbidden_ips=None, log_file_suffix='', admission=None, tracer=None,
+                 strike_buffer=None, json_encoder=None):
         super().__init__()
         self.connection_pool = db_connection_pool
         self.log_directory = log_directory
+        self.log_file_suffix = log_file_suffix
         self.strike_query = strike_query if strike_query is not None else blitzortung.service.strike_query()
         self.strike_grid_query = strike_grid_query if strike_grid_query is not None else blitzortung.service.strike_grid_query()
         self.global_strike_grid_query = global_strike_grid_query if global_strike_grid_query is not None else blitzortung.service.global_strike_grid_query()
         self.histogram_query = histogram_query if histogram_query is not None else blitzortung.service.histogram_query()
         self.check_count = 0
         self.cache = cache if cache is not None else ServiceCache()
-        self.current_period = self.__current_period()
-        self.current_data = collections.defaultdict(list)
+        self.access_log = AccessLog(log_directory, log_file_suffix)
+        self.grid_versions = GridVersions()
         self.next_memory_info = 0.0
         self.minute_constraints = TimeConstraint(self.DEFAULT_MINUTE_LENGTH, self.MAX_MINUTES_PER_DAY)
         self.metrics = metrics if metrics is not None else StatsDMetrics()
         self.forbidden_ips = forbidden_ips if forbidden_ips is not None else FORBIDDEN_IPS
+        self.admission = admission if admission is not None else AdmissionControl()
+        self.tracer = tracer if tracer is not None else Tracer(self.access_log)
+        self.strike_buffer = strike_buffer if strike_buffer is not None else StrikeBuffer()
+        self.json_encoder = json_encoder if json_encoder is not None else create_json_encoder()
+        self.shared_histograms = None
 
     addSlash = True
+    # JSONRPC is a leaf resource, which would hide child resources like /push
+    isLeaf = False
 
-    def __get_epoch(self, timestamp):
-        return calendar.timegm(timestamp.timetuple()) * 1000000 + timestamp.microsecond
+    def getChild(self, path, request):
+        return self
 
-    def __current_period(self):
-        return datetime.datetime.now(datetime.UTC).replace(second=0, microsecond=0)
+    def _cbRender(self, result, request, id, version):
+        if isinstance(result, EncodedResult) and not getattr(request, 'jsonp_callback', None):
+            render_encoded_result(result, request, id, version).addCallback(self.__count_not_modified)
+            return result
+        return super()._cbRender(result, request, id, version)
 
-    def __check_period(self):
-        if self.current_period != self.__current_period():
-            self.current_data['timestamp'] = self.__get_epoch(self.current_period)
-            if self.log_directory:
-                with open(os.path.join(self.log_directory, self.current_period.strftime("%Y%m%d-%H%M.json")),
-                          'w') as output_file:
-                    output_file.write(json.dumps(self.current_data))
-            self.__restart_period()
-
-    def __restart_period(self):
-        self.current_period = self.__current_period()
-        self.current_data = collections.defaultdict(list)
+    def __count_not_modified(self, not_modified):
+        if not_modified:
+            self.metrics.for_not_modified()
 
     @staticmethod
     def __force_range(number, min_number, max_number):
@@ -119,45 +145,98 @@ class Blitzortung(jsonrpc.JSONRPC):
 
     @with_request
     def jsonrpc_get_strikes(self, request, minute_length, id_or_offset=0):
-        """This endpoint is currently blocked for all requests."""
-        minute_length = self.__force_range(minute_length, 0, self.MAX_MINUTES_PER_DAY)
+        """
+        Return the strikes of the last minutes from the strike buffer, starting at the id given as a positive
+        id_or_offset. Requests are blocked while the strike buffer is not filled.
+        """
+        minute_length = self.__force_range(minute_length, 0, self.strike_buffer.minutes)
 
         client = self.get_request_client(request)
-        user_agent = request.getHeader("User-Agent")
-        log.msg('get_strikes(%d, %d) %s %s BLOCKED' % (minute_length, id_or_offset, client, user_agent))
-        return None
+        user_agent, user_agent_version = self.parse_user_agent(request)
+        if not self.strike_buffer.is_ready():
+            log.msg('get_strikes(%d, %d) %s %s BLOCKED' % (minute_length, id_or_offset, client, user_agent))
+            return None
+
+        self.check_admission(request, client, user_agent)
+
+        if self.is_blocked_client(request, client, user_agent_version) or request.getHeader(
+                'content-type') != JSON_CONTENT_TYPE:
+            log.msg('get_strikes(%d, %d) BLOCKED %s %s' % (minute_length, id_or_offset, client, user_agent))
+            return {}
+
+        response = self.strike_buffer.get_strikes(minute_length, id_or_offset)
+
+        log.msg('get_strikes(%d, %d) #%d %s %s' % (minute_length, id_or_offset, len(response.value['s']), client,
+                                                   user_agent))
+        self.access_log.append('get_strikes', minute_length, id_or_offset, client, user_agent)
+
+        return response
+
+    def create_grid_response(self, grid_query, grid_parameters, time_interval, minute_length, minute_offset,
+                             histogram_area, trace):
+        """
+        Query the grid and combine it with its histogram. While a batch is dispatched, the histogram of the first grid
+        of a time interval and histogram area is shared with the following grids of the same interval and area instead
+        of counting it again. The histogram area is the grid, or None for the whole world.
+
+        Only current grids are counted from the strike buffer, history grids are queried from the database.
+        """
+        shared_histogram = None
+        histogram_key = (time_interval.start, time_interval.end, histogram_area)
+        with_histogram = minute_length > self.HISTOGRAM_MINUTE_THRESHOLD
+        if with_histogram and self.shared_histograms is not None:
+            shared_histogram = self.shared_histograms.get(histogram_key)
+            with_histogram = shared_histogram is None
+
+        grid_result, state = grid_query.create(grid_parameters, time_interval, self.connection_pool,
+                                               self.metrics.statsd, with_histogram=with_histogram,
+                                               trace=trace,
+                                               strike_buffer=self.strike_buffer if minute_offset == 0 else None)
+
+        if shared_histogram is not None:
+            histogram_result = shared_histogram.get()
+        elif with_histogram:
+            if self.shared_histograms is not None:
+                self.shared_histograms[histogram_key] = SharedHistogram(grid_result)
+            histogram_result = None
+        else:
+            histogram_result = succeed([])
+
+        return grid_query.combine_result(grid_result, histogram_result, state)
 
     def get_strikes_grid(self, minute_length, grid_baselength, minute_offset, region, count_threshold):
         grid_parameters = GridParameters(grid[region].get_for(grid_baselength), grid_baselength, region,
                                          count_threshold=count_threshold)
-        time_interval = create_time_interval(minute_length, minute_offset)
-
-        grid_result, state = self.strike_grid_query.create(grid_parameters, time_interval, self.connection_pool,
-                                                           self.metrics.statsd)
+        time_interval = create_time_interval(minute_length, minute_offset, ServiceCache.time_alignment(minute_offset))
 
-        histogram_result = self.get_histogram(time_interval, envelope=grid_parameters.grid) \
-            if minute_length > self.HISTOGRAM_MINUTE_THRESHOLD else succeed([])
+        trace = self.tracer.start('strikes_grid', minute_length=minute_length, minute_offset=minute_offset,
+                                  grid_baselength=grid_baselength, region=region)
+        combined_result = self.create_grid_response(self.strike_grid_query, grid_parameters, time_interval,
+                                                    minute_length, minute_offset, grid_parameters.grid, trace)
 
-        combined_result = self.strike_grid_query.combine_result(grid_result, histogram_result, state)
-
-        combined_result.addCallback(lambda value: CacheableResult(value))
+        combined_result.addCallback(trace.enter, SERIALIZATION)
+        combined_result.addCallback(encode_grid_result, encoder=self.json_encoder)
+        combined_result.addBoth(self.tracer.finish, trace)
+        if minute_offset == 0:
+            combined_result.addCallback(self.grid_versions.add, count_threshold)
 
         return combined_result
 
     def get_global_strikes_grid(self, minute_length, grid_baselength, minute_offset, count_threshold):
         grid_parameters = GridParameters(global_grid.get_for(grid_baselength), grid_baselength,
                                          count_threshold=count_threshold)
-        time_interval = create_time_interval(minute_length, minute_offset)
-
-        grid_result, state = self.global_strike_grid_query.create(grid_parameters, time_interval, self.connection_pool,
-                                                                  self.metrics.statsd)
+        time_interval = create_time_interval(minute_length, minute_offset, ServiceCache.time_alignment(minute_offset))
 
-        histogram_result = self.get_histogram(
-            time_interval) if minute_length > self.HISTOGRAM_MINUTE_THRESHOLD else succeed([])
+        trace = self.tracer.start('global_strikes_grid', minute_length=minute_length, minute_offset=minute_offset,
+                                  grid_baselength=grid_baselength)
+        combined_result = self.create_grid_response(self.global_strike_grid_query, grid_parameters, time_interval,
+                                                    minute_length, minute_offset, None, trace)
 
-        combined_result = self.global_strike_grid_query.combine_result(grid_result, histogram_result, state)
-
-        combined_result.addCallback(lambda value: CacheableResult(value))
+        combined_result.addCallback(trace.enter, SERIALIZATION)
+        combined_result.addCallback(encode_grid_result, encoder=self.json_encoder)
+        combined_result.addBoth(self.tracer.finish, trace)
+        if minute_offset == 0:
+            combined_result.addCallback(self.grid_versions.add, count_threshold)
 
         return combined_result
 
@@ -166,17 +245,18 @@ class Blitzortung(jsonrpc.JSONRPC):
         grid_factory = local_grid.get_grid_factory()
         grid_parameters = GridParameters(grid_factory.get_for(grid_baselength), grid_baselength,
                                          count_threshold=count_threshold)
-        time_interval = create_time_interval(minute_length, minute_offset)
-
-        grid_result, state = self.strike_grid_query.create(grid_parameters, time_interval, self.connection_pool,
-                                                           self.metrics.statsd)
+        time_interval = create_time_interval(minute_length, minute_offset, ServiceCache.time_alignment(minute_offset))
 
-        histogram_result = self.get_histogram(time_interval, envelope=grid_parameters.grid) \
-            if minute_length > self.HISTOGRAM_MINUTE_THRESHOLD else succeed([])
+        trace = self.tracer.start('local_strikes_grid', minute_length=minute_length, minute_offset=minute_offset,
+                                  grid_baselength=grid_baselength, x=x, y=y, data_area=data_area)
+        combined_result = self.create_grid_response(self.strike_grid_query, grid_parameters, time_interval,
+                                                    minute_length, minute_offset, grid_parameters.grid, trace)
 
-        combined_result = self.strike_grid_query.combine_result(grid_result, histogram_result, state)
-
-        combined_result.addCallback(lambda value: CacheableResult(value))
+        combined_result.addCallback(trace.enter, SERIALIZATION)
+        combined_result.addCallback(encode_grid_result, encoder=self.json_encoder)
+        combined_result.addBoth(self.tracer.finish, trace)
+        if minute_offset == 0:
+            combined_result.addCallback(self.grid_versions.add, count_threshold)
 
         return combined_result
 
@@ -192,12 +272,15 @@ class Blitzortung(jsonrpc.JSONRPC):
     def jsonrpc_get_global_strikes_grid(self, request, minute_length, grid_base_length=10000, minute_offset=0,
                                         count_threshold=0):
         self.memory_info()
+        trace = self.tracer.start('get_global_strikes_grid')
+        trace.begin(VALIDATION)
         client = self.get_request_client(request)
         user_agent, user_agent_version = self.parse_user_agent(request)
 
-        if client in self.forbidden_ips or user_agent_version == 0 or request.getHeader(
-                'content-type') != JSON_CONTENT_TYPE or request.getHeader(
-            'referer') or grid_base_length < self.MIN_GRID_BASE_LENGTH or grid_base_length == self.INVALID_GRID_BASE_LENGTH:
+        self.check_admission(request, client, user_agent)
+
+        if self.is_blocked_client(request, client, user_agent_version) or request.getHeader(
+                'content-type') != JSON_CONTENT_TYPE or grid_base_length < self.MIN_GRID_BASE_LENGTH or grid_base_length == self.INVALID_GRID_BASE_LENGTH:
             log.msg(
                 f"FORBIDDEN - client: {client}, user agent: {user_agent_version}, content type: {request.getHeader('content-type')}, referer: {request.getHeader('referer')}")
             log.msg('get_global_strikes_grid(%d, %d, %d, >=%d) BLOCKED %.1f%% %s %s' % (
@@ -206,38 +289,42 @@ class Blitzortung(jsonrpc.JSONRPC):
             return {}
 
         original_grid_base_length = grid_base_length
-        grid_base_length = max(self.GLOBAL_MIN_GRID_BASE_LENGTH, grid_base_length)
+        grid_base_length = canonical_grid_base_length(grid_base_length, self.GLOBAL_MIN_GRID_BASE_LENGTH)
         minute_length, minute_offset = self.minute_constraints.enforce(minute_length, minute_offset, )
-        count_threshold = max(0, count_threshold)
+        count_threshold = canonical_count_threshold(count_threshold)
 
         cache = self.cache.global_strikes(minute_offset)
+        trace.begin(CACHE_LOOKUP)
         response = cache.get(self.get_global_strikes_grid, minute_length=minute_length,
                              grid_baselength=grid_base_length,
                              minute_offset=minute_offset,
                              count_threshold=count_threshold)
+        trace.begin(REQUEST_LOG)
         self.fix_bad_accept_header(request, user_agent)
 
         log.msg('get_global_strikes_grid(%d, %d, %d, >=%d) %.1f%% %s %s' % (
             minute_length, grid_base_length, minute_offset, count_threshold,
             cache.get_ratio() * 100, client, user_agent))
 
-        self.__check_period()
-        self.current_data['get_strikes_grid'].append(
-            (self.__get_epoch(datetime.datetime.now(datetime.UTC)), minute_length, original_grid_base_length,
-             minute_offset,
-             0, count_threshold, client, user_agent))
+        self.access_log.append('get_strikes_grid', minute_length, original_grid_base_length, minute_offset, 0,
+                               count_threshold, client, user_agent)
 
-        self.metrics.for_global_strikes(minute_length, cache.get_ratio())
+        self.metrics.for_global_strikes(minute_length, cache.get_window_ratio())
 
-        return response
+        self.trace_response(response, trace)
+        return self.cache.demand.request_result(response)
 
     @with_request
     def jsonrpc_get_local_strikes_grid(self, request, x, y, grid_base_length=10000, minute_length=60, minute_offset=0,
                                        count_threshold=0, data_area=5):
         self.memory_info()
+        trace = self.tracer.start('get_local_strikes_grid')
+        trace.begin(VALIDATION)
         client = self.get_request_client(request)
         user_agent, user_agent_version = self.parse_user_agent(request)
 
+        self.check_admission(request, client, user_agent)
+
         if client in self.forbidden_ips or request.getHeader(
                 'content-type') != JSON_CONTENT_TYPE or request.getHeader(
             'referer') or grid_base_length < self.MIN_GRID_BASE_LENGTH or grid_base_length == self.INVALID_GRID_BASE_LENGTH:
@@ -249,45 +336,47 @@ class Blitzortung(jsonrpc.JSONRPC):
             return {}
 
         original_grid_base_length = grid_base_length
-        grid_base_length = max(self.MIN_GRID_BASE_LENGTH, grid_base_length)
+        grid_base_length = canonical_grid_base_length(grid_base_length, self.MIN_GRID_BASE_LENGTH)
         minute_length, minute_offset = self.minute_constraints.enforce(minute_length, minute_offset, )
-        count_threshold = max(0, count_threshold)
+        count_threshold = canonical_count_threshold(count_threshold)
         data_area = round(max(5, data_area))
 
         cache = self.cache.local_strikes(minute_offset)
+        trace.begin(CACHE_LOOKUP)
         response = cache.get(self.get_local_strikes_grid, x=x, y=y,
                              grid_baselength=grid_base_length,
                              minute_length=minute_length,
                              minute_offset=minute_offset,
                              count_threshold=count_threshold,
                              data_area=data_area)
+        trace.begin(REQUEST_LOG)
 
         log.msg('get_local_strikes_grid(%d, %d, %d, %d, %d, >=%d, %d) %.1f%% %d# %s %s' % (
             x, y, minute_length, grid_base_length, minute_offset, count_threshold, data_area,
             cache.get_ratio() * 100, cache.get_size(), client,
             user_agent))
 
-        self.__check_period()
-        self.current_data['get_strikes_grid'].append(
-            (
-                self.__get_epoch(datetime.datetime.now(datetime.UTC)), minute_length, original_grid_base_length,
-                minute_offset,
-                -1, count_threshold, client, user_agent, x, y, data_area))
+        self.access_log.append('get_strikes_grid', minute_length, original_grid_base_length, minute_offset, -1,
+                               count_threshold, client, user_agent, x, y, data_area)
 
-        self.metrics.for_local_strikes(minute_length, data_area, cache.get_ratio())
+        self.metrics.for_local_strikes(minute_length, data_area, cache.get_window_ratio())
 
-        return response
+        self.trace_response(response, trace)
+        return self.cache.demand.request_result(response)
 
     @with_request
     def jsonrpc_get_strikes_grid(self, request, minute_length, grid_base_length=10000, minute_offset=0, region=1,
                                  count_threshold=0):
         self.memory_info()
+        trace = self.tracer.start('get_strikes_grid')
+        trace.begin(VALIDATION)
         client = self.get_request_client(request)
         user_agent, user_agent_version = self.parse_user_agent(request)
 
-        if client in self.forbidden_ips or user_agent_version == 0 or request.getHeader(
-                'content-type') != JSON_CONTENT_TYPE or request.getHeader(
-            'referer') or grid_base_length < self.MIN_GRID_BASE_LENGTH or grid_base_length == self.INVALID_GRID_BASE_LENGTH:
+        self.check_admission(request, client, user_agent)
+
+        if self.is_blocked_client(request, client, user_agent_version) or request.getHeader(
+                'content-type') != JSON_CONTENT_TYPE or grid_base_length < self.MIN_GRID_BASE_LENGTH or grid_base_length == self.INVALID_GRID_BASE_LENGTH:
             log.msg(
                 f"FORBIDDEN - client: {client}, user agent: {user_agent_version}, content type: {request.getHeader('content-type')}, referer: {request.getHeader('referer')}")
             log.msg('get_strikes_grid(%d, %d, %d, %d, >=%d) BLOCKED %.1f%% %s %s' % (
@@ -296,32 +385,144 @@ class Blitzortung(jsonrpc.JSONRPC):
             return {}
 
         original_grid_base_length = grid_base_length
-        grid_base_length = max(self.MIN_GRID_BASE_LENGTH, grid_base_length)
+        grid_base_length = canonical_grid_base_length(grid_base_length, self.MIN_GRID_BASE_LENGTH)
         minute_length, minute_offset = self.minute_constraints.enforce(minute_length, minute_offset, )
         region = self.__force_range(region, 1, self.MAX_REGION)
-        count_threshold = max(0, count_threshold)
+        count_threshold = canonical_count_threshold(count_threshold)
 
         cache = self.cache.strikes(minute_offset)
+        trace.begin(CACHE_LOOKUP)
         response = cache.get(self.get_strikes_grid, minute_length=minute_length,
                              grid_baselength=grid_base_length,
                              minute_offset=minute_offset, region=region,
                              count_threshold=count_threshold)
+        trace.begin(REQUEST_LOG)
         self.fix_bad_accept_header(request, user_agent)
 
         log.msg('get_strikes_grid(%d, %d, %d, %d, >=%d) %.1f%% %s %s' % (
             minute_length, grid_base_length, minute_offset, region, count_threshold,
             cache.get_ratio() * 100, client, user_agent))
 
-        self.__check_period()
-        self.current_data['get_strikes_grid'].append(
-            (self.__get_epoch(datetime.datetime.now(datetime.UTC)), minute_length, original_grid_base_length,
-             minute_offset,
-             region,
-             count_threshold, client, user_agent))
+        self.access_log.append('get_strikes_grid', minute_length, original_grid_base_length, minute_offset, region,
+                               count_threshold, client, user_agent)
 
-        self.metrics.for_strikes(minute_length, region, cache.get_ratio())
+        self.metrics.for_strikes(minute_length, region, cache.get_window_ratio())
 
-        return response
+        self.trace_response(response, trace)
+        return self.cache.demand.request_result(response)
+
+    @with_request
+    def jsonrpc_get_strikes_grids(self, request, grid_specs):
+        """
+        Return several grids in one response, in the order of the given grid specs.
+
+        Each spec is a dict with a 'type' of 'region' (default), 'global' or 'local' and the numeric parameters of the
+        corresponding single grid method, invalid specs yield an empty result. Grids are taken from the same caches,
+        misses are filled concurrently and grids of the same time interval and area share their histogram.
+        """
+        if not isinstance(grid_specs, list) or not 0 < len(grid_specs) <= self.MAX_BATCH_GRIDS:
+            log.msg(f"get_strikes_grids() INVALID {self.get_request_client(request)}")
+            return {}
+
+        user_agent, _ = self.parse_user_agent(request)
+        self.check_admission(request, self.get_request_client(request), user_agent)
+
+        self.shared_histograms = {}
+        try:
+            results = [maybeDeferred(self.__get_grid_for_spec, request, grid_spec) for grid_spec in grid_specs]
+        finally:
+            self.shared_histograms = None
+        combined_result = gatherResults(results, consumeErrors=True)
+        combined_result.addCallback(combine_encoded_results)
+        return combined_result
+
+    def __get_grid_for_spec(self, request, grid_spec):
+        if not isinstance(grid_spec, dict):
+            return {}
+        grid_type = grid_spec.get('type', 'region')
+        parameter_names = self.BATCH_GRID_PARAMETERS.get(grid_type)
+        if parameter_names is None:
+            return {}
+        parameters = {name: grid_spec[name] for name in parameter_names if name in grid_spec}
+        if any(name not in parameters for name in self.BATCH_GRID_REQUIRED_PARAMETERS[grid_type]) or \
+                not all(is_number(value) for value in parameters.values()):
+            return {}
+        if grid_type == 'global':
+            return self.jsonrpc_get_global_strikes_grid(request, **parameters)
+        if grid_type == 'local':
+            return self.jsonrpc_get_local_strikes_grid(request, **parameters)
+        return self.jsonrpc_get_strikes_grid(request, **parameters)
+
+    @with_request
+    def jsonrpc_get_strikes_grid_delta(self, request, t, grid_spec):
+        """
+        Return the cells of a current grid which changed since the grid response with the time 't'.
+
+        The grid is specified as in get_strikes_grids. The response contains the new or changed cells in 'r', the
+        positions of removed cells in 'rm' and the time 't' it is based on in 'b'. If the grid version 't' is not
+        available anymore, the complete grid is returned without 'b'.
+        """
+        if not isinstance(grid_spec, dict) or not isinstance(t, str):
+            log.msg(f"get_strikes_grid_delta() INVALID {self.get_request_client(request)}")
+            return {}
+
+        response = self.__get_grid_for_spec(request, grid_spec)
+        if not isinstance(response, Deferred):
+            return response
+
+        count_threshold = canonical_count_threshold(grid_spec.get('count_threshold', 0))
+        delta = gatherResults([response], consumeErrors=True)
+        delta.addCallback(lambda results: self.grid_versions.get_delta(results[0], t, count_threshold))
+        return delta
+
+    @with_request
+    def jsonrpc_get_cache_statistics(self, request, top_key_count=10):
+        """Return cache statistics, only available to local clients."""
+        if not self.is_admin_request(request):
+            log.msg(f"FORBIDDEN - get_cache_statistics from {self.get_request_client(request)}")
+            return {}
+
+        return self.cache.get_statistics(self.__force_range(top_key_count, 0, 100))
+
+    def trace_response(self, response, trace):
+        """The request trace ends when the cached result is available."""
+        trace.begin(CACHE_WAIT)
+        if isinstance(response, Deferred):
+            # passes the result through, the cached deferred is not modified
+            response.addBoth(self.tracer.finish, trace)
+        else:
+            self.tracer.finish(response, trace)
+
+    @with_request
+    def jsonrpc_get_trace_statistics(self, request):
+        """Return the latency percentiles per stage in milliseconds, only available to local clients."""
+        if not self.is_admin_request(request):
+            log.msg(f"FORBIDDEN - get_trace_statistics from {self.get_request_client(request)}")
+            return {}
+
+        return self.tracer.get_statistics()
+
+    def is_admitted(self, client, user_agent):
+        rejection = self.admission.check(client, user_agent)
+        if rejection is not None:
+            self.metrics.for_rejection(rejection)
+            return False
+        return True
+
+    def is_blocked_client(self, request, client, user_agent_version):
+        """Only released app versions are served, requests from browsers or forbidden clients are blocked."""
+        return client in self.forbidden_ips or user_agent_version == 0 or bool(request.getHeader('referer'))
+
+    def check_admission(self, request, client, user_agent):
+        """Admission is charged once per HTTP request, rejected requests get a fault instead of a result."""
+        if getattr(request, 'admitted', False):
+            return
+        if not self.is_admitted(client, user_agent):
+            raise jsonrpclib.Fault(REJECTED_FAULT_CODE, "too many requests")
+        request.admitted = True
+
+    def is_admin_request(self, request):
+        return request.getHeader("X-Forwarded-For") is None and request.getClientIP() in ADMIN_CLIENTS
 
     def parse_user_agent(self, request):
         """Parse user agent string to extract version information."""
@@ -348,12 +549,10 @@ class Blitzortung(jsonrpc.JSONRPC):
                 except ValueError:
                     pass
 
-    def get_histogram(self, time_interval: TimeInterval, region=None, envelope=None):
-        return self.cache.histogram.get(self.histogram_query.create,
-                                        time_interval=time_interval,
-                                        connection_pool=self.connection_pool,
-                                        region=region,
-                                        envelope=envelope)
+    def cache_creators(self):
+        """Return the cached result creators by name, used to restore cache snapshots."""
+        return {creator.__name__: creator for creator in
+                (self.get_strikes_grid, self.get_global_strikes_grid, self.get_local_strikes_grid)}
 
     def get_request_client(self, request):
         forward = request.getHeader("X-Forwarded-For")
@@ -1,33 +1,74 @@
+import json
+import os
+import sys
+import time
+
+from twisted.internet.defer import Deferred, succeed
+from twisted.python import log
+from txjsonrpc_ng.web.data import CacheableResult
+
 from ..cache import ObjectCache
+from .demand import ResultDemand
+from .disk_cache import DiskStore, PersistentObjectCache
+from .response import EncodedResult, encode_result
+
+
+def estimate_size(value) -> int:
+    """
+    Estimates the memory footprint of a cached value, sequences are extrapolated from their first element.
+    """
+    if isinstance(value, Deferred):
+        return sys.getsizeof(value) + (estimate_size(value.result) if value.called else 0)
+    if isinstance(value, EncodedResult):
+        return sys.getsizeof(value) + estimate_size(value.value) + len(value.body) + \
+            (len(value.compressed_body) if value.compressed_body else 0) + \
+            sum(len(rendering) for rendering in value.renderings.values()) + \
+            (sum(len(body) for body in value.packed if body) if value.packed else 0)
+    if isinstance(value, CacheableResult):
+        return sys.getsizeof(value) + estimate_size(value.value) + \
+            (len(value.string_value) if value.string_value else 0) + \
+            (len(value.compressed_value) if value.compressed_value else 0)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + (len(value) * estimate_size(value[0]) if value else 0)
+    return sys.getsizeof(value)
 
 
 class ServiceCache:
     CACHE_CLEANUP_PERIOD = 300  # 5 minutes
     CACHE_TTL_SHORT = 20  # seconds
     CACHE_TTL_LONG = 60  # seconds
+    CACHE_TTL_DISK = 600  # 10 minutes
     LOCAL_CACHE_SIZE_CURRENT = 100
     LOCAL_CACHE_SIZE_HISTORY = 400
 
-    def __init__(self):
+    def __init__(self, disk_store: DiskStore | None = None):
         self.__strikes_grid = ObjectCache(
             ttl_seconds=self.CACHE_TTL_SHORT, cleanup_period=self.CACHE_CLEANUP_PERIOD)
-        self.__strikes_history_grid = ObjectCache(
-            ttl_seconds=self.CACHE_TTL_LONG, cleanup_period=self.CACHE_CLEANUP_PERIOD)
+        self.__strikes_history_grid = self.__history_cache(
+            disk_store, ttl_seconds=self.CACHE_TTL_LONG, cleanup_period=self.CACHE_CLEANUP_PERIOD)
 
         self.__global_strikes_grid = ObjectCache(
             ttl_seconds=self.CACHE_TTL_SHORT, cleanup_period=self.CACHE_CLEANUP_PERIOD)
-        self.__global_strikes_history_grid = ObjectCache(
-            ttl_seconds=self.CACHE_TTL_LONG, cleanup_period=self.CACHE_CLEANUP_PERIOD)
+        self.__global_strikes_history_grid = self.__history_cache(
+            disk_store, ttl_seconds=self.CACHE_TTL_LONG, cleanup_period=self.CACHE_CLEANUP_PERIOD)
 
         self.__local_strikes_grid = ObjectCache(
             ttl_seconds=self.CACHE_TTL_SHORT, size=self.LOCAL_CACHE_SIZE_CURRENT,
             cleanup_period=self.CACHE_CLEANUP_PERIOD)
-        self.__local_strikes_history_grid = ObjectCache(
-            ttl_seconds=self.CACHE_TTL_LONG, size=self.LOCAL_CACHE_SIZE_HISTORY,
+        self.__local_strikes_history_grid = self.__history_cache(
+            disk_store, ttl_seconds=self.CACHE_TTL_LONG, size=self.LOCAL_CACHE_SIZE_HISTORY,
             cleanup_period=self.CACHE_CLEANUP_PERIOD)
 
-        self.histogram = ObjectCache(
-            ttl_seconds=self.CACHE_TTL_LONG, cleanup_period=self.CACHE_CLEANUP_PERIOD)
+        self.demand = ResultDemand()
+        for cache in self.caches().values():
+            cache.demand = self.demand
+
+    def __history_cache(self, disk_store, **kwargs):
+        if disk_store is None:
+            return ObjectCache(**kwargs)
+        return PersistentObjectCache(disk_store, self.CACHE_TTL_DISK, alignment=self.CACHE_TTL_LONG, **kwargs)
 
     def global_strikes(self, minute_offset):
         return self.__global_strikes_grid if minute_offset == 0 else self.__global_strikes_history_grid
@@ -37,3 +78,122 @@ class ServiceCache:
 
     def strikes(self, minute_offset):
         return self.__strikes_grid if minute_offset == 0 else self.__strikes_history_grid
+
+    @classmethod
+    def time_alignment(cls, minute_offset):
+        """Align query intervals to the lifetime of the cache entries they are stored in."""
+        return cls.CACHE_TTL_SHORT if minute_offset == 0 else cls.CACHE_TTL_LONG
+
+    def caches(self) -> dict[str, ObjectCache]:
+        return {
+            'strikes_grid': self.__strikes_grid,
+            'strikes_history_grid': self.__strikes_history_grid,
+            'global_strikes_grid': self.__global_strikes_grid,
+            'global_strikes_history_grid': self.__global_strikes_history_grid,
+            'local_strikes_grid': self.__local_strikes_grid,
+            'local_strikes_history_grid': self.__local_strikes_history_grid,
+        }
+
+    def current_caches(self) -> list[ObjectCache]:
+        return [self.__strikes_grid, self.__global_strikes_grid, self.__local_strikes_grid]
+
+    def get_statistics(self, top_key_count: int = 10) -> dict[str, dict]:
+        """
+        Returns windowed counters, size information and the most used keys of all caches.
+        """
+        now = time.time()
+        statistics = {}
+        for name, cache in self.caches().items():
+            entries = [entry for entry in cache.cache.values() if entry.is_valid(now)]
+            entry_bytes = sum(estimate_size(entry.peek_payload()) for entry in entries)
+            statistics[name] = {
+                **cache.statistics.get_summary(now),
+                'size': len(entries),
+                'capacity': cache.size,
+                'ttl': cache.get_time_to_live(),
+                'bytes': entry_bytes,
+                'top_keys': [[cache.format_cache_key(key), hit_count] for key, hit_count in
+                             cache.get_top_keys(top_key_count)],
+            }
+        return statistics
+
+    def save_snapshot(self, path: str) -> int:
+        """
+        Writes all completed and valid grid results to a snapshot file, returns the number of entries.
+        """
+        now = time.time()
+        snapshot: dict[str, list] = {}
+        for name, cache in self.caches().items():
+            entries = []
+            for cache_key, entry in list(cache.cache.items()):
+                if not entry.is_valid(now):
+                    continue
+                snapshot_entry = self.__snapshot_entry(cache, cache_key, entry)
+                if snapshot_entry is not None:
+                    entries.append(snapshot_entry)
+            snapshot[name] = entries
+
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(',', ':'))
+        os.replace(temporary_path, path)
+
+        entry_count = sum(len(entries) for entries in snapshot.values())
+        log.msg(f"service cache: saved {entry_count} entries to {path}")
+        return entry_count
+
+    @staticmethod
+    def __snapshot_entry(cache, cache_key, entry):
+        cached_object_creator = cache_key[0]
+        separator_index = cache_key.index(cache.kwargs_separator)
+        if separator_index != 1:
+            return None
+        kwargs = dict(cache_key[separator_index + 1:])
+        if not all(isinstance(value, (int, float, str)) for value in kwargs.values()):
+            return None
+
+        payload = entry.peek_payload()
+        if not isinstance(payload, Deferred) or not payload.called:
+            return None
+        result = payload.result
+        if not isinstance(result, CacheableResult) or not result.value:
+            return None
+
+        return [cached_object_creator.__name__, kwargs, entry.get_expiry_time(), result.value]
+
+    def load_snapshot(self, path: str, creators: dict) -> int:
+        """
+        Restores the entries of a snapshot file which are still valid, returns the number of entries.
+
+        :param path: The snapshot file path.
+        :param creators: Mapping of creator function names to the creator functions of the current process.
+        """
+        if not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path, 'r') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError) as error:
+            log.msg(f"service cache: failed to load snapshot {path}: {error}")
+            return 0
+
+        now = time.time()
+        caches = self.caches()
+        entry_count = 0
+        for name, entries in snapshot.items():
+            cache = caches.get(name)
+            if cache is None:
+                continue
+            for creator_name, kwargs, expiry_time, value in entries:
+                cached_object_creator = creators.get(creator_name)
+                if cached_object_creator is None or expiry_time <= now:
+                    continue
+                if cache.size is not None and cache.get_size() >= cache.size:
+                    break
+                cache_key = cache.generate_cache_key(cached_object_creator, (), kwargs)
+                cache.put(cache_key, succeed(encode_result(value)), expiry_time)
+                entry_count += 1
+
+        log.msg(f"service cache: restored {entry_count} entries from {path}")
+        return entry_count
@@ -16,15 +16,19 @@
 
 """
 
+import re
+
 import psycopg2
 import psycopg2.extras
 from twisted.internet.defer import Deferred
 from twisted.python import log
 from txpostgres import reconnection
-from txpostgres.txpostgres import Connection, ConnectionPool
+from txpostgres.txpostgres import Connection, ConnectionPool, _CancelInProgress
 
 import blitzortung.config
 from blitzortung.db.query import SelectQuery
+from blitzortung.service.query_scheduler import LIVE, QueryScheduler, query_settings
+from blitzortung.service.tracing import DB_EXECUTION, DB_WAIT
 
 
 def connection_factory(*args, **kwargs):
@@ -59,12 +63,62 @@ class DictConnection(Connection):
         super(DictConnection, self).__init__(reactor, cooperator, detector)
 
 
+SESSION_SETTING_NAMES = ('statement_timeout', 'work_mem', 'jit')
+SESSION_SETTING_VALUE = re.compile(r'^[A-Za-z0-9_. ]+$')
+
+
+def session_settings(settings: dict[str, str]) -> str:
+    """
+    Statements setting the session parameters for the transaction of the following query. Statements sent together
+    run in one implicit transaction, so the settings are not kept by the pooled connection.
+
+    Setting values are configurable and are therefore restricted to plain values like '5s', '64MB' or 'off'.
+    """
+    for name, value in settings.items():
+        if name not in SESSION_SETTING_NAMES:
+            raise ValueError(f"unsupported session setting '{name}'")
+        if not SESSION_SETTING_VALUE.match(str(value)):
+            raise ValueError(f"invalid value {value!r} of session setting '{name}'")
+    return ''.join(f"SET LOCAL {name} = '{value}'; " for name, value in settings.items())
+
+
+def cancel_query(query: Deferred) -> None:
+    """Cancel a running query, the connection is released when the database confirmed the cancellation."""
+    try:
+        query.cancel()
+    except _CancelInProgress:
+        pass
+
+
 class DictConnectionPool(ConnectionPool):
-    """Connection pool using DictConnection instances."""
+    """
+    Connection pool using DictConnection instances.
+
+    Queries are started by the query scheduler, which limits the concurrent queries per query class. Each query runs
+    with the session settings of its class, like the statement timeout.
+    """
     connectionFactory = DictConnection
 
-    def __init__(self, _ignored, *connargs, **connkw):
+    def __init__(self, _ignored, *connargs, query_limits=None, query_timeouts=None, **connkw):
         super(DictConnectionPool, self).__init__(_ignored, *connargs, **connkw)
+        self.scheduler = QueryScheduler(self.min, query_limits, cancel_query=cancel_query)
+        self.session_settings = {query_class: session_settings(settings) for query_class, settings in
+                                 query_settings(query_timeouts).items()}
+
+    def runQuery(self, *args, **kwargs):
+        return self.run_scheduled_query(LIVE, None, *args, **kwargs)
+
+    def run_scheduled_query(self, query_class, trace, query, *args, **kwargs):
+        """Run a query of the class, a trace is in the DB_WAIT stage until a pooled connection is available."""
+        if trace is not None:
+            trace.begin(DB_WAIT)
+        return self.scheduler.run(query_class, self._semaphore.run, self.__run_traced_query, trace,
+                                  self.session_settings[query_class] + query, *args, **kwargs)
+
+    def __run_traced_query(self, trace, *args, **kwargs):
+        if trace is not None:
+            trace.begin(DB_EXECUTION)
+        return self._runQuery(*args, **kwargs)
 
 
 def create_connection_pool() -> Deferred:
@@ -72,7 +126,9 @@ def create_connection_pool() -> Deferred:
     config = blitzortung.config.config()
     db_connection_string = config.get_db_connection_string()
 
-    connection_pool = DictConnectionPool(None, db_connection_string)
+    connection_pool = DictConnectionPool(None, db_connection_string, min=config.get_webservice_db_pool_size(),
+                                         query_limits=config.get_webservice_db_query_limits(),
+                                         query_timeouts=config.get_webservice_db_query_timeouts())
 
     d: Deferred = connection_pool.start()
     d.addErrback(log.err)
@@ -80,5 +136,14 @@ def create_connection_pool() -> Deferred:
     return d
 
 
-def execute(connection, query: SelectQuery):
+def execute(connection, query: SelectQuery, trace=None, query_class=LIVE):
+    """
+    Run the query on a connection or connection pool. A pool schedules the query by its class and applies the session
+    settings of the class. With a trace, the time spent waiting for a pooled connection is separated from the query
+    execution, if the pool supports it.
+    """
+    if isinstance(connection, DictConnectionPool):
+        return connection.run_scheduled_query(query_class, trace, str(query), query.get_parameters())
+    if trace is not None:
+        trace.begin(DB_EXECUTION)
     return connection.runQuery(str(query), query.get_parameters())
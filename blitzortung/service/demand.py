@@ -0,0 +1,89 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+
+class ResultDemand:
+    """
+    Counts the holders of pending results, which are the requests waiting for a result and the cache entries storing
+    it. A pending result without holders is cancelled, which cancels its database query.
+
+    Each request gets its own Deferred of a shared result, cancelling it only releases the hold of the request.
+    """
+
+    def __init__(self):
+        self.holders: dict[Deferred, int] = {}
+        self.cancelled_count = 0
+
+    def hold(self, result) -> None:
+        if not isinstance(result, Deferred) or result.called:
+            return
+        count = self.holders.get(result)
+        if count is None:
+            # passes the result through, the cached deferred is not modified
+            result.addBoth(self.__forget, result)
+            count = 0
+        self.holders[result] = count + 1
+
+    def request_result(self, result):
+        """
+        Deferred of the shared result for one request, which holds the result until it is available. The JSON-RPC
+        resource cancels it when the client disconnected.
+        """
+        if not isinstance(result, Deferred):
+            return result
+        if result.called:
+            request_result = Deferred()
+        else:
+            self.hold(result)
+            request_result = Deferred(lambda _: self.release(result))
+        # passes the result through, the cached deferred is not modified
+        result.addBoth(self.__deliver, request_result)
+        return request_result
+
+    def release(self, result) -> None:
+        count = self.holders.get(result)
+        if count is None:
+            return
+        if count > 1:
+            self.holders[result] = count - 1
+            return
+        del self.holders[result]
+        if not result.called:
+            self.cancelled_count += 1
+            # nobody waits for the result anymore
+            result.addErrback(lambda _failure: None)
+            result.cancel()
+
+    @staticmethod
+    def __deliver(value, request_result: Deferred):
+        if not request_result.called:
+            if isinstance(value, Failure):
+                request_result.errback(value)
+            else:
+                request_result.callback(value)
+        return value
+
+    def __forget(self, value, result: Deferred):
+        self.holders.pop(result, None)
+        return value
@@ -0,0 +1,268 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from twisted.internet.defer import Deferred, maybeDeferred
+from twisted.internet.threads import deferToThreadPool
+from twisted.python import log
+from twisted.python.threadpool import ThreadPool
+from txjsonrpc_ng.web.data import CacheableResult
+
+from ..cache import ObjectCache
+from .general import create_time_interval
+from .response import encode_result
+
+STORE_KEY_TYPES = (int, float, str, bool, type(None))
+
+
+class DiskStore:
+    """
+    Append-only file store with an in-memory index.
+
+    Every record consists of a JSON header line ``[key, expiry_time, length]`` followed by
+    ``length`` bytes of JSON payload. Newer records for the same key supersede older ones and
+    expired records are dropped from the index periodically, the file is rewritten once superseded
+    or expired records dominate it.
+
+    Once started, deferred operations run on a single thread, which is then the only one accessing the file.
+    The index is shared with the reactor thread and guarded by a lock.
+    """
+
+    MIN_COMPACTION_SIZE = 1024 * 1024
+    EXPIRY_CHECK_INTERVAL = 60  # seconds
+
+    def __init__(self, path: str, compaction_ratio: float = 0.5):
+        self.path = path
+        self.compaction_ratio = compaction_ratio
+        self.index: dict[str, tuple[int, int, float]] = {}
+        self.dead_bytes = 0
+        self.next_expiry_check = 0.0
+        self.__lock = threading.Lock()
+        self.pool: Optional[ThreadPool] = None
+        self.reactor = None
+        self.__file = open(path, 'a+b')
+        self.__load_index()
+
+    def start(self, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.reactor = reactor
+        self.pool = ThreadPool(1, 1, name='disk_store')
+        self.pool.start()
+
+    def defer(self, operation, *args) -> Deferred:
+        """Run a store operation on the store thread, or directly before the store is started."""
+        if self.pool is None:
+            return maybeDeferred(operation, *args)
+        return deferToThreadPool(self.reactor, self.pool, operation, *args)
+
+    def __load_index(self):
+        self.__file.seek(0)
+        offset = 0
+        while True:
+            header = self.__file.readline()
+            if not header.endswith(b'\n'):
+                break
+            try:
+                key, expiry_time, length = json.loads(header)
+            except ValueError:
+                break
+            payload_offset = offset + len(header)
+            self.__file.seek(payload_offset + length)
+            if self.__file.readline() != b'\n':
+                break
+            if key in self.index:
+                self.dead_bytes += self.index[key][1]
+            self.index[key] = (payload_offset, length, expiry_time)
+            offset = payload_offset + length + 1
+
+        self.__file.truncate(offset)
+
+    def contains(self, key: str, current_time: float) -> bool:
+        """Check the index for a valid record without accessing the file."""
+        with self.__lock:
+            entry = self.index.get(key)
+        return entry is not None and current_time < entry[2]
+
+    def get(self, key: str, current_time: float) -> Optional[Any]:
+        with self.__lock:
+            entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, length, expiry_time = entry
+        if current_time >= expiry_time:
+            return None
+        self.__file.seek(offset)
+        return json.loads(self.__file.read(length))
+
+    def put(self, key: str, value: Any, expiry_time: float) -> None:
+        payload = json.dumps(value, separators=(',', ':')).encode()
+        header = json.dumps([key, expiry_time, len(payload)]).encode() + b'\n'
+
+        self.__file.seek(0, os.SEEK_END)
+        offset = self.__file.tell()
+        self.__file.write(header + payload + b'\n')
+        self.__file.flush()
+
+        with self.__lock:
+            if key in self.index:
+                self.dead_bytes += self.index[key][1]
+            self.index[key] = (offset + len(header), len(payload), expiry_time)
+
+        current_time = time.time()
+        if current_time >= self.next_expiry_check:
+            self.drop_expired(current_time)
+            self.next_expiry_check = current_time + self.EXPIRY_CHECK_INTERVAL
+
+        size = self.get_file_size()
+        if size > self.MIN_COMPACTION_SIZE and self.dead_bytes > size * self.compaction_ratio:
+            self.compact()
+
+    def drop_expired(self, current_time: float) -> None:
+        """Remove expired records from the index and account them as dead."""
+        with self.__lock:
+            expired_keys = [key for key, entry in self.index.items() if current_time >= entry[2]]
+            for key in expired_keys:
+                self.dead_bytes += self.index.pop(key)[1]
+
+    def compact(self) -> None:
+        now = time.time()
+        temporary_path = self.path + '.tmp'
+        index = {}
+        with self.__lock:
+            entries = list(self.index.items())
+        with open(temporary_path, 'wb') as output_file:
+            for key, (offset, length, expiry_time) in entries:
+                if now >= expiry_time:
+                    continue
+                self.__file.seek(offset)
+                payload = self.__file.read(length)
+                header = json.dumps([key, expiry_time, length]).encode() + b'\n'
+                index[key] = (output_file.tell() + len(header), length, expiry_time)
+                output_file.write(header + payload + b'\n')
+
+        self.__file.close()
+        os.replace(temporary_path, self.path)
+        self.__file = open(self.path, 'a+b')
+        with self.__lock:
+            self.index = index
+        self.dead_bytes = 0
+
+    def get_file_size(self) -> int:
+        self.__file.seek(0, os.SEEK_END)
+        return self.__file.tell()
+
+    def get_size(self) -> int:
+        with self.__lock:
+            return len(self.index)
+
+    def close(self) -> None:
+        """Finish the pending operations and close the file."""
+        if self.pool is not None:
+            self.pool.stop()
+            self.pool = None
+        self.__file.close()
+
+
+def generate_store_key(cached_object_creator, args, kwargs, end_time: Optional[int] = None) -> Optional[str]:
+    """
+    Generates a process independent key, returns None if the arguments are not plain values. The end time of the
+    requested time interval is appended if given.
+    """
+    values = args + tuple(kwargs.values())
+    if not all(isinstance(value, STORE_KEY_TYPES) for value in values):
+        return None
+    key = [cached_object_creator.__name__, args, sorted(kwargs.items())]
+    if end_time is not None:
+        key.append(end_time)
+    return json.dumps(key)
+
+
+class PersistentObjectCache(ObjectCache):
+    """
+    Object cache backed by a disk store for results which outlive the memory TTL.
+
+    Cached payloads are deferred CacheableResult values, their plain values are written to the
+    store once they become available.
+
+    With an alignment, results of requests with a minute length and offset are stored by the
+    absolute end of their aligned time interval, as the same request denotes a later interval
+    after the next alignment period.
+    """
+
+    def __init__(self, store: DiskStore, store_ttl_seconds: int, alignment: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.store_ttl_seconds = store_ttl_seconds
+        self.alignment = alignment
+        self.store_hit_count = 0
+
+    def create_payload(self, cached_object_creator, args, kwargs):
+        store_key = generate_store_key(cached_object_creator, args, kwargs, self.get_end_time(kwargs))
+        if store_key is None:
+            return super().create_payload(cached_object_creator, args, kwargs)
+
+        current_time = time.time()
+        if self.store.contains(store_key, current_time):
+            self.store_hit_count += 1
+            payload = self.store.defer(self.store.get, store_key, current_time)
+            payload.addErrback(self.__restore_failed, store_key)
+            payload.addCallback(self.__restore_result, cached_object_creator, args, kwargs, store_key)
+            return payload
+
+        return self.__create_payload(cached_object_creator, args, kwargs, store_key)
+
+    def get_end_time(self, kwargs) -> Optional[int]:
+        minute_length = kwargs.get('minute_length')
+        minute_offset = kwargs.get('minute_offset')
+        if self.alignment is None or not isinstance(minute_length, int) or not isinstance(minute_offset, int):
+            return None
+        return int(create_time_interval(minute_length, minute_offset, self.alignment).end.timestamp())
+
+    def __create_payload(self, cached_object_creator, args, kwargs, store_key):
+        payload = super().create_payload(cached_object_creator, args, kwargs)
+        if isinstance(payload, Deferred):
+            payload.addCallback(self.__store_result, store_key)
+        return payload
+
+    def __restore_result(self, value, cached_object_creator, args, kwargs, store_key):
+        if value is None:
+            return self.__create_payload(cached_object_creator, args, kwargs, store_key)
+        return encode_result(value)
+
+    @staticmethod
+    def __restore_failed(failure, store_key):
+        log.msg(f"disk cache: failed to read {store_key}: {failure.value}")
+
+    def __store_result(self, result, store_key):
+        value = result.value if isinstance(result, CacheableResult) else result
+        if value:
+            stored = self.store.defer(self.store.put, store_key, value, time.time() + self.store_ttl_seconds)
+            stored.addErrback(self.__store_failed, store_key)
+        return result
+
+    @staticmethod
+    def __store_failed(failure, store_key):
+        log.msg(f"disk cache: failed to store {store_key}: {failure.value}")
@@ -19,28 +19,56 @@
 """
 
 import datetime
+import math
 import time
 
+from .tracing import Trace
 from .. import db
 
 
-def create_time_interval(minute_length, minute_offset):
+def create_time_interval(minute_length, minute_offset, alignment=1):
+    """
+    Create the time interval ending now shifted by minute_offset.
+
+    With an alignment of more than one second the end time is rounded down to the last multiple of the alignment, so
+    that all requests within one alignment period query the same interval and no interval ends in the future.
+    """
     end_time = datetime.datetime.now(datetime.timezone.utc)
     end_time = end_time.replace(microsecond=0)
+    if alignment > 1:
+        timestamp = int(end_time.timestamp())
+        end_time -= datetime.timedelta(seconds=timestamp % alignment)
     end_time += datetime.timedelta(minutes=minute_offset)
     start_time = end_time - datetime.timedelta(minutes=minute_length)
     return db.query.TimeInterval(start_time, end_time)
 
 
+def canonical_grid_base_length(grid_base_length, min_grid_base_length):
+    """
+    Map a requested grid base length to the integer base length of the grid actually created.
+
+    Grids are created for every base length, so no supported values are imposed here; only lengths below the given
+    minimum and fractional lengths are collapsed.
+    """
+    return max(min_grid_base_length, int(grid_base_length))
+
+
+def canonical_count_threshold(count_threshold):
+    """
+    Collapse count thresholds with identical results, strikes are counted as integers with count > threshold.
+    """
+    return max(0, math.floor(count_threshold))
+
+
 class TimingState:
-    __slots__ = ['statsd_client', 'reference_time', 'name', 'info_text']
+    __slots__ = ['statsd_client', 'reference_time', 'name', 'trace']
 
-    def __init__(self, name, statsd_client):
+    def __init__(self, name, statsd_client, trace=None):
         self.statsd_client = statsd_client
 
         self.reference_time = time.time()
         self.name = name
-        self.info_text = []
+        self.trace = trace if trace is not None else Trace(name)
 
     def get_seconds(self, reference_time=None):
         return time.time() - (reference_time if reference_time else self.reference_time)
@@ -59,6 +87,3 @@ class TimingState:
 
     def log_incr(self, key):
         self.statsd_client.incr(key)
-
-    def add_info_text(self, info_text):
-        self.info_text += [info_text]
@@ -0,0 +1,136 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import calendar
+import collections
+import datetime
+from typing import Optional
+
+from .packed_grid import is_grid_response
+from .response import EncodedResult, encode_result
+
+TIME_FORMAT = "%Y%m%dT%H:%M:%S"
+GRID_KEYS = ('xd', 'yd', 'x0', 'y1', 'xc', 'yc', 'dt')
+
+
+def parse_grid_time(value: str) -> int:
+    return calendar.timegm(datetime.datetime.strptime(value, TIME_FORMAT).timetuple())
+
+
+class GridVersion:
+    __slots__ = ['response', 'seconds', 'cells', 'deltas']
+
+    def __init__(self, response: dict):
+        self.response = response
+        self.seconds = parse_grid_time(response['t'])
+        self.cells: Optional[dict] = None
+        self.deltas: dict[str, EncodedResult] = {}
+
+    def get_cells(self) -> dict:
+        """Cells by position with their count and the absolute time of their latest strike."""
+        if self.cells is None:
+            self.cells = {(x, y): (count, self.seconds + age) for x, y, count, age in self.response['r']}
+        return self.cells
+
+
+def create_delta(previous: GridVersion, current: GridVersion) -> dict:
+    """
+    Returns the current grid response with only the cells which are new or changed since the previous version in 'r'
+    and the positions of cells which are gone in 'rm'. 'b' is the time of the previous version.
+    """
+    previous_cells = previous.get_cells()
+    current_seconds = current.seconds
+
+    changed = []
+    for cell in current.response['r']:
+        x, y, count, age = cell
+        if previous_cells.get((x, y)) != (count, current_seconds + age):
+            changed.append(cell)
+    current_cells = current.get_cells()
+    removed = [position for position in previous_cells if position not in current_cells]
+
+    delta = dict(current.response)
+    delta['r'] = tuple(changed)
+    delta['rm'] = tuple(removed)
+    delta['b'] = previous.response['t']
+    return delta
+
+
+class GridVersions:
+    """
+    Keeps the latest versions of the current grid responses, so that clients can fetch only the cells which changed
+    since their last response.
+
+    Grids are identified by their geometry, duration and count threshold, their versions by the grid time 't'.
+    """
+
+    VERSIONS_PER_GRID = 9
+    MAX_GRIDS = 200
+
+    def __init__(self, versions_per_grid: int = VERSIONS_PER_GRID, max_grids: int = MAX_GRIDS):
+        self.versions_per_grid = versions_per_grid
+        self.max_grids = max_grids
+        self.grids: collections.OrderedDict = collections.OrderedDict()
+
+    @staticmethod
+    def grid_key(response: dict, count_threshold: int) -> tuple:
+        return tuple(response.get(key) for key in GRID_KEYS) + (count_threshold,)
+
+    def add(self, result, count_threshold: int):
+        """Record a grid result, returns the result to be usable as callback."""
+        if not isinstance(result, EncodedResult) or not is_grid_response(result.value):
+            return result
+
+        response = result.value
+        key = self.grid_key(response, count_threshold)
+        versions = self.grids.get(key)
+        if versions is None:
+            versions = self.grids[key] = collections.OrderedDict()
+            if len(self.grids) > self.max_grids:
+                self.grids.popitem(last=False)
+        else:
+            self.grids.move_to_end(key)
+
+        if response['t'] not in versions:
+            versions[response['t']] = GridVersion(response)
+            while len(versions) > self.versions_per_grid:
+                versions.popitem(last=False)
+        return result
+
+    def get_delta(self, result, base_time: str, count_threshold: int):
+        """
+        Returns the delta of the given current grid result to its version at base_time, the complete result if that
+        version is not known anymore.
+        """
+        if not isinstance(result, EncodedResult) or not is_grid_response(result.value):
+            return result
+
+        versions = self.grids.get(self.grid_key(result.value, count_threshold))
+        if versions is None:
+            return result
+        current = versions.get(result.value['t'])
+        previous = versions.get(base_time)
+        if current is None or previous is None or previous.seconds > current.seconds:
+            return result
+
+        delta = current.deltas.get(base_time)
+        if delta is None:
+            delta = current.deltas[base_time] = encode_result(create_delta(previous, current))
+        return delta
@@ -18,40 +18,44 @@
 
 """
 
-import time
-
 from injector import inject
 
 from .db import execute
+from .offload import ResultOffload
+from .query_scheduler import HISTOGRAM
 from .. import db
 from ..db.query import TimeInterval
 
+HISTOGRAM_BIN_SIZE = 5  # minutes
+
 
 class HistogramQuery:
     @inject
-    def __init__(self, strike_query_builder: db.query_builder.Strike):
+    def __init__(self, strike_query_builder: db.query_builder.Strike, result_offload: ResultOffload = None):
         self.strike_query_builder = strike_query_builder
+        self.result_offload = result_offload if result_offload is not None else ResultOffload()
 
     def create(self, time_interval: TimeInterval, connection_pool, region=None, envelope=None):
-        reference_time = time.time()
-
-        query = self.strike_query_builder.histogram_query(db.table.Strike.table_name, time_interval, 5, region,
-                                                          envelope)
+        query = self.strike_query_builder.histogram_query(db.table.Strike.table_name, time_interval,
+                                                          HISTOGRAM_BIN_SIZE, region, envelope)
 
-        result = execute(connection_pool, query)
-        result.addCallback(self.build_result, minutes=time_interval.minutes(), bin_size=5,
-                           reference_time=reference_time)
+        result = execute(connection_pool, query, query_class=HISTOGRAM)
+        result.addCallback(self.result_offload.build, self.build_result, minutes=time_interval.minutes(),
+                           bin_size=HISTOGRAM_BIN_SIZE)
         return result
 
     @staticmethod
-    def build_result(query_result, minutes, bin_size, reference_time):
-        time_duration = time.time() - reference_time
-        print("histogram: query %.03fs" % time_duration)
-        value_count = int(minutes / bin_size)
+    def build_result(query_result, minutes, bin_size):
+        return build_histogram(query_result, minutes, bin_size)
 
-        result = [0] * value_count
 
-        for bin_data in query_result:
-            result[bin_data[0] + value_count - 1] = bin_data[1]
+def build_histogram(bins, minutes, bin_size):
+    """Fill the (interval, count) pairs of a histogram query into a list of counts, the latest bin is last."""
+    value_count = int(minutes / bin_size)
 
-        return result
+    result = [0] * value_count
+
+    for interval, count in bins:
+        result[interval + value_count - 1] = count
+
+    return result
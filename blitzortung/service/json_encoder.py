@@ -0,0 +1,120 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+
+from typing import Any
+
+from twisted.python import log
+from txjsonrpc_ng import jsonrpclib
+
+from .packed_grid import is_grid_response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+GRID_ROW_FORMAT = '[%d, %d, %d, %d]'
+
+
+def check_integers(values) -> None:
+    """Formatting with '%d' equals the JSON encoding only for plain integers, not for floats or booleans."""
+    for value in values:
+        if type(value) is not int:  # pylint: disable=unidiomatic-typecheck
+            raise TypeError(f"not an integer: {value!r}")
+
+
+def check_integer_rows(rows) -> None:
+    for row in rows:
+        check_integers(row)
+
+
+class JsonEncoder:
+    """Encodes responses with the JSON-RPC encoder based on the json module of the standard library."""
+
+    name = 'json'
+
+    def __init__(self):
+        self.encoder = jsonrpclib.JSONRPCEncoder()
+
+    def encode(self, value: Any) -> bytes:
+        return self.encoder.encode(value).encode()
+
+    def encode_rows(self, rows) -> bytes:
+        """Encode a sequence of grid rows as JSON list."""
+        return self.encode(rows)
+
+
+class GridJsonEncoder(JsonEncoder):
+    """
+    Encodes grid rows of four integers and the histogram with string formatting, other values with the JSON-RPC
+    encoder. The output equals the output of the JSON-RPC encoder, responses with values other than plain integers
+    in the rows or the histogram are encoded with the JSON-RPC encoder.
+    """
+
+    name = 'grid'
+
+    def encode(self, value: Any) -> bytes:
+        if not is_grid_response(value):
+            return super().encode(value)
+        try:
+            items = [self.encoder.encode(key) + ': ' + self.encode_item(key, item) for key, item in value.items()]
+        except TypeError:
+            return super().encode(value)
+        return ('{' + ', '.join(items) + '}').encode()
+
+    def encode_item(self, key: str, item: Any) -> str:
+        if key == 'r':
+            check_integer_rows(item)
+            return '[' + ', '.join(map(GRID_ROW_FORMAT.__mod__, item)) + ']'
+        if key == 'h':
+            check_integers(item)
+            return '[' + ', '.join(map('%d'.__mod__, item)) + ']'
+        return self.encoder.encode(item)
+
+    def encode_rows(self, rows) -> bytes:
+        try:
+            check_integer_rows(rows)
+            return ('[' + ', '.join(map(GRID_ROW_FORMAT.__mod__, rows)) + ']').encode()
+        except TypeError:
+            return super().encode_rows(rows)
+
+
+class OrjsonEncoder(JsonEncoder):
+    """Encodes responses with orjson, the output is compact and has no spaces after separators."""
+
+    name = 'orjson'
+
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=self.encoder.default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+
+JSON_ENCODERS = {encoder.name: encoder for encoder in (JsonEncoder, GridJsonEncoder, OrjsonEncoder)}
+
+
+def create_json_encoder(name: str = GridJsonEncoder.name) -> JsonEncoder:
+    """Create the encoder of the given name, orjson falls back to the grid encoder if it is not installed."""
+    if name not in JSON_ENCODERS:
+        raise ValueError(f"unknown JSON encoder '{name}'")
+    if name == OrjsonEncoder.name and orjson is None:
+        log.msg("orjson is not installed, using the grid JSON encoder")
+        name = GridJsonEncoder.name
+    return JSON_ENCODERS[name]()
@@ -10,12 +10,26 @@ TOTAL_COUNT = 'total_count'
 BG_COUNT = 'bg_count'
 CACHE_HITS = 'cache_hits'
 DATA_AREA = 'data_area'
+CACHE = 'cache'
+RESPONSE = 'response'
+WORKER = 'worker'
+SUPERVISOR = 'supervisor'
+ADMISSION = 'admission'
+NOT_MODIFIED = 'not_modified'
+TRACE = 'trace'
+DB = 'db'
+WAIT = 'wait'
+CACHE_STATISTICS_GAUGES = ('hits', 'misses', 'ratio', 'evictions', 'expirations', 'fill_ms_avg', 'fill_ms_max',
+                           'size', 'bytes')
+TRACE_STATISTICS_GAUGES = ('count', 'p50', 'p95', 'p99', 'max')
+QUERY_STATISTICS_GAUGES = ('queued', 'running', 'cancelled')
 
 
 class StatsDMetrics:
 
-    def __init__(self, statsd: Optional[StatsClient] = None):
+    def __init__(self, statsd: Optional[StatsClient] = None, worker: Optional[int] = None):
         self.statsd = statsd if statsd else StatsClient('localhost', 8125, prefix='org.blitzortung.service')
+        self.worker = worker
 
     def for_global_strikes(self, minute_length: int, cache_ratio: float) -> None:
         self.statsd.incr(self.name(STRIKES_GRID, TOTAL_COUNT))
@@ -42,6 +56,40 @@ class StatsDMetrics:
             self.statsd.incr(self.name(STRIKES_GRID, BG_COUNT))
             self.statsd.incr(self.name(STRIKES_GRID, BG_COUNT, str(region)))
 
+    def for_cache_statistics(self, statistics: dict[str, dict]) -> None:
+        """Gauges are reported per worker process, counters of all workers add up in statsd."""
+        prefix = (WORKER, str(self.worker)) if self.worker is not None else ()
+        for cache_name, cache_statistics in statistics.items():
+            for gauge in CACHE_STATISTICS_GAUGES:
+                self.statsd.gauge(self.name(*prefix, CACHE, cache_name, gauge), cache_statistics[gauge])
+
+    def for_trace_statistics(self, statistics: dict[str, dict[str, dict]]) -> None:
+        """Latency percentiles per trace name and stage in milliseconds, reported per worker process."""
+        prefix = (WORKER, str(self.worker)) if self.worker is not None else ()
+        for trace_name, stages in statistics.items():
+            for stage, stage_statistics in stages.items():
+                for gauge in TRACE_STATISTICS_GAUGES:
+                    self.statsd.gauge(self.name(*prefix, TRACE, trace_name, stage, gauge), stage_statistics[gauge])
+
+    def for_query_statistics(self, statistics: dict[str, dict]) -> None:
+        """Queue depth, running and cancelled queries and wait time percentiles per query class, reported per worker process."""
+        prefix = (WORKER, str(self.worker)) if self.worker is not None else ()
+        for query_class, class_statistics in statistics.items():
+            for gauge in QUERY_STATISTICS_GAUGES:
+                self.statsd.gauge(self.name(*prefix, DB, query_class, gauge), class_statistics[gauge])
+            for gauge in TRACE_STATISTICS_GAUGES:
+                self.statsd.gauge(self.name(*prefix, DB, query_class, WAIT, gauge), class_statistics[WAIT][gauge])
+
+    def for_supervisor(self, worker_count: int, restart_count: int) -> None:
+        self.statsd.gauge(self.name(SUPERVISOR, 'workers'), worker_count)
+        self.statsd.gauge(self.name(SUPERVISOR, 'restarts'), restart_count)
+
+    def for_rejection(self, reason: str) -> None:
+        self.statsd.incr(self.name(ADMISSION, reason))
+
+    def for_not_modified(self) -> None:
+        self.statsd.incr(self.name(RESPONSE, NOT_MODIFIED))
+
     @staticmethod
     def name(*args: str) -> str:
         return '.'.join(args)
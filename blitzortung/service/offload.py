@@ -0,0 +1,64 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from typing import Optional
+
+from injector import singleton
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+
+@singleton
+class ResultOffload:
+    """
+    Builds the results of large query results on a bounded thread pool instead of the reactor thread.
+
+    Query results with fewer rows than the threshold are built directly, as are all results before the pool is
+    started.
+    """
+
+    THRESHOLD = 10000  # rows
+    MAX_THREADS = 2
+
+    def __init__(self):
+        self.threshold = self.THRESHOLD
+        self.pool: Optional[ThreadPool] = None
+        self.reactor = None
+        self.offloaded_count = 0
+
+    def start(self, threshold: int = THRESHOLD, max_threads: int = MAX_THREADS, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.threshold = threshold
+        self.reactor = reactor
+        self.pool = ThreadPool(1, max_threads, name='result_offload')
+        self.pool.start()
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.stop()
+            self.pool = None
+
+    def build(self, rows, builder, *args, **kwargs):
+        """Call the builder with the rows, usable as callback of a Deferred. Returns a Deferred if offloaded."""
+        if self.pool is None or len(rows) < self.threshold:
+            return builder(rows, *args, **kwargs)
+        self.offloaded_count += 1
+        return deferToThreadPool(self.reactor, self.pool, builder, rows, *args, **kwargs)
@@ -0,0 +1,115 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import json
+from typing import Any
+
+from txjsonrpc_ng import jsonrpclib
+
+MAGIC = b'BOG\x01'
+
+
+def is_grid_response(value: Any) -> bool:
+    return isinstance(value, dict) and 'r' in value
+
+
+def pack_grid(value: dict) -> bytes:
+    """
+    Encode a grid response in the compact binary format.
+
+    Layout (all integers are unsigned LEB128 varints):
+
+        magic        b'BOG' followed by the format version byte
+        header       length, followed by the JSON encoded response without 'r'
+        cell count
+        cells        zigzag(x - previous x), zigzag(y - previous y), count, zigzag(age) per cell
+
+    Cells are sorted by row and column, so that the coordinate deltas are mostly small.
+    """
+    output = bytearray(MAGIC)
+
+    header = json.dumps({key: entry for key, entry in value.items() if key != 'r'}, separators=(',', ':'),
+                        cls=jsonrpclib.JSONRPCEncoder).encode()
+    write_varint(output, len(header))
+    output += header
+
+    cells = sorted(value['r'], key=lambda cell: (cell[1], cell[0]))
+    write_varint(output, len(cells))
+    previous_x = previous_y = 0
+    for x, y, count, age in cells:
+        write_varint(output, zigzag(x - previous_x))
+        write_varint(output, zigzag(y - previous_y))
+        write_varint(output, count)
+        write_varint(output, zigzag(age))
+        previous_x, previous_y = x, y
+
+    return bytes(output)
+
+
+def unpack_grid(data: bytes) -> dict:
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a packed grid")
+    position = len(MAGIC)
+
+    header_length, position = read_varint(data, position)
+    value = json.loads(data[position:position + header_length])
+    position += header_length
+
+    cell_count, position = read_varint(data, position)
+    cells = []
+    x = y = 0
+    for _ in range(cell_count):
+        delta_x, position = read_varint(data, position)
+        delta_y, position = read_varint(data, position)
+        count, position = read_varint(data, position)
+        age, position = read_varint(data, position)
+        x += unzigzag(delta_x)
+        y += unzigzag(delta_y)
+        cells.append((x, y, count, unzigzag(age)))
+
+    value['r'] = tuple(cells)
+    return value
+
+
+def zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def write_varint(output: bytearray, value: int) -> None:
+    while value > 0x7f:
+        output.append((value & 0x7f) | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def read_varint(data: bytes, position: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
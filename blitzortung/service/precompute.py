@@ -0,0 +1,153 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+
+import time
+from typing import Optional
+
+from twisted.internet.defer import DeferredList, maybeDeferred, succeed
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+
+from .cache import ServiceCache
+from .general import create_time_interval
+from .histogram import HISTOGRAM_BIN_SIZE
+from .strike_buffer import StrikeBufferFeed
+from ..cache import ObjectCache
+from ..gis.constants import global_grid, grid
+
+
+class GridPrecomputer:
+    """
+    Computes the current region and global grids of the standard views ahead of the requests and publishes them into
+    the service cache.
+
+    The grids of all regions and base lengths of a time window are counted with one pass over the strike buffer on
+    the thread pool of the result offload, the windows one after another. Windows not covered by the buffer are
+    computed by the regular grid queries. Published results expire like the other entries of their cache, the
+    default interval matches the time to live of the current grid caches.
+
+    Runs are aligned to multiples of the interval, like the query intervals, and start one strike buffer update
+    after the boundary, so that every run computes the newly begun interval from an updated buffer.
+    """
+
+    PRECOMPUTE_INTERVAL = ServiceCache.CACHE_TTL_SHORT  # seconds
+    START_DELAY = StrikeBufferFeed.UPDATE_INTERVAL  # seconds after the interval boundary
+    MINUTE_LENGTHS = (60, 120, 180)
+    BASE_LENGTHS = (10000, 25000, 50000)
+
+    def __init__(self, service, minute_lengths=MINUTE_LENGTHS, base_lengths=BASE_LENGTHS,
+                 interval: float = PRECOMPUTE_INTERVAL, result_offload=None):
+        self.service = service
+        self.result_offload = result_offload if result_offload is not None else service.strike_grid_query.result_offload
+        self.minute_lengths = minute_lengths
+        self.base_lengths = base_lengths
+        self.global_base_lengths = [base_length for base_length in base_lengths
+                                    if base_length >= service.GLOBAL_MIN_GRID_BASE_LENGTH]
+        self.regions = sorted(grid)
+        self.interval = interval
+        self.loop: Optional[LoopingCall] = None
+        self.delayed_start = None
+        self.running = False
+        self.precompute_count = 0
+
+    def start(self, clock=None):
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self.loop = LoopingCall(self.precompute)
+        self.loop.clock = clock
+        delay = -clock.seconds() % self.interval + self.START_DELAY
+        self.delayed_start = clock.callLater(delay, self.loop.start, self.interval)
+
+    def stop(self):
+        if self.delayed_start is not None and self.delayed_start.active():
+            self.delayed_start.cancel()
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+
+    def precompute(self):
+        """Compute and publish all configured grids, a run is skipped while the previous one is not finished."""
+        if self.running:
+            return succeed(None)
+        self.running = True
+
+        result = succeed(None)
+        for minute_length in self.minute_lengths:
+            result.addCallback(self.__precompute_window, minute_length)
+        result.addBoth(self.__finished)
+        return result
+
+    def __precompute_window(self, _, minute_length: int):
+        result = self.precount(minute_length)
+        result.addErrback(log.err)
+        result.addCallback(lambda _: self.publish_window(minute_length))
+        return result
+
+    def precount(self, minute_length: int):
+        """Count the strikes of the window into all grids at once, if the strike buffer covers it."""
+        strike_buffer = self.service.strike_buffer
+        time_interval = create_time_interval(minute_length, 0, ServiceCache.time_alignment(0))
+        if not strike_buffer.covers(time_interval):
+            return succeed(None)
+        bin_size = HISTOGRAM_BIN_SIZE if minute_length > self.service.HISTOGRAM_MINUTE_THRESHOLD else None
+        return strike_buffer.precount(time_interval,
+                                      [grid[region].get_for(base_length) for region in self.regions
+                                       for base_length in self.base_lengths],
+                                      [global_grid.get_for(base_length) for base_length in self.global_base_lengths],
+                                      bin_size, result_offload=self.result_offload)
+
+    def publish_window(self, minute_length: int):
+        """Compute and publish the region and global grids of the window."""
+        return DeferredList([self.publish(cache, cached_object_creator, **kwargs)
+                             for cache, cached_object_creator, kwargs in self.grids(minute_length)],
+                            consumeErrors=True)
+
+    def grids(self, minute_length: int):
+        """The caches, creators and arguments of the grids published for the window."""
+        for region in self.regions:
+            for base_length in self.base_lengths:
+                yield self.service.cache.strikes(0), self.service.get_strikes_grid, \
+                    dict(minute_length=minute_length, grid_baselength=base_length, minute_offset=0, region=region,
+                         count_threshold=0)
+        for base_length in self.global_base_lengths:
+            yield self.service.cache.global_strikes(0), self.service.get_global_strikes_grid, \
+                dict(minute_length=minute_length, grid_baselength=base_length, minute_offset=0, count_threshold=0)
+
+    def cache_keys(self) -> set[tuple]:
+        """The cache keys of all published grids."""
+        return {cache.generate_cache_key(cached_object_creator, (), kwargs)
+                for minute_length in self.minute_lengths
+                for cache, cached_object_creator, kwargs in self.grids(minute_length)}
+
+    def publish(self, cache: ObjectCache, cached_object_creator, **kwargs):
+        cache_key = cache.generate_cache_key(cached_object_creator, (), kwargs)
+        result = maybeDeferred(cached_object_creator, **kwargs)
+        result.addCallback(self.__put, cache, cache_key)
+        result.addErrback(log.err)
+        return result
+
+    def __put(self, result, cache: ObjectCache, cache_key: tuple) -> None:
+        if result is not None:
+            cache.put(cache_key, succeed(result), int(time.time()) + cache.get_time_to_live())
+            self.precompute_count += 1
+
+    def __finished(self, result):
+        self.running = False
+        return result
@@ -0,0 +1,263 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import datetime
+import json
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+from twisted.internet.defer import gatherResults, succeed
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+from twisted.web import resource, server
+from txjsonrpc_ng import jsonrpclib
+
+from .general import canonical_grid_base_length
+from ..gis.local_grid import LocalGrid
+from .grid_delta import GridVersion, TIME_FORMAT, create_delta
+from .response import EncodedResult
+
+EVENT_STREAM_CONTENT_TYPE = b'text/event-stream'
+KEEP_ALIVE = b':\n\n'
+
+
+@dataclass(frozen=True)
+class SubscriptionGroup:
+    """Current grid shared by all subscribers with the same parameters."""
+    grid_type: str
+    minute_length: int
+    grid_base_length: int
+    region: Optional[int] = None
+    x: Optional[int] = None
+    y: Optional[int] = None
+    data_area: Optional[int] = None
+
+
+def format_event(event: str, value) -> bytes:
+    data = json.dumps(value, separators=(',', ':'), cls=jsonrpclib.JSONRPCEncoder)
+    return b'event: ' + event.encode() + b'\ndata: ' + data.encode() + b'\n\n'
+
+
+class GroupState:
+    __slots__ = ['subscribers', 'version', 'grid_event']
+
+    def __init__(self):
+        self.subscribers: set = set()
+        self.version: Optional[GridVersion] = None
+        self.grid_event: Optional[bytes] = None
+
+
+class PushPublisher:
+    """
+    Pushes grid updates to subscribers as server-sent events.
+
+    The feed is queried once per subscription group and publish interval. New subscribers get the last complete grid
+    of their group as 'grid' event, later updates are sent as 'delta' events containing the changed cells only.
+
+    The number of subscription groups is limited separately, as every group costs a grid computation per interval.
+    """
+
+    PUBLISH_INTERVAL = 20  # seconds
+    MAX_SUBSCRIBERS = 10000
+    MAX_GROUPS = 200
+
+    def __init__(self, feed, max_subscribers: int = MAX_SUBSCRIBERS, max_groups: int = MAX_GROUPS, clock=None):
+        self.feed = feed
+        self.max_subscribers = max_subscribers
+        self.max_groups = max_groups
+        self.groups: dict[SubscriptionGroup, GroupState] = {}
+        self.subscriber_count = 0
+        self.publishing = False
+        self.loop = LoopingCall(self.publish)
+        if clock is not None:
+            self.loop.clock = clock
+
+    def start(self, interval: float = PUBLISH_INTERVAL):
+        self.loop.start(interval, now=False)
+
+    def stop(self):
+        if self.loop.running:
+            self.loop.stop()
+        for state in list(self.groups.values()):
+            for request in list(state.subscribers):
+                request.finish()
+        self.groups.clear()
+        self.subscriber_count = 0
+
+    def subscribe(self, group: SubscriptionGroup, request) -> bool:
+        if self.subscriber_count >= self.max_subscribers:
+            return False
+        state = self.groups.get(group)
+        if state is None:
+            if len(self.groups) >= self.max_groups:
+                return False
+            state = self.groups[group] = GroupState()
+        state.subscribers.add(request)
+        self.subscriber_count += 1
+        request.write(state.grid_event if state.grid_event is not None else KEEP_ALIVE)
+        return True
+
+    def unsubscribe(self, group: SubscriptionGroup, request) -> None:
+        state = self.groups.get(group)
+        if state is None or request not in state.subscribers:
+            return
+        state.subscribers.discard(request)
+        self.subscriber_count -= 1
+        if not state.subscribers:
+            del self.groups[group]
+
+    def publish(self):
+        """Fetch the current grids of all groups with subscribers and send the updates."""
+        if self.publishing:
+            return succeed(None)
+        self.publishing = True
+        updates = [self.feed(group).addCallback(self.update, group) for group in list(self.groups)]
+        result = gatherResults(updates, consumeErrors=True)
+        result.addErrback(log.err)
+        result.addBoth(self.__published)
+        return result
+
+    def __published(self, _):
+        self.publishing = False
+
+    def update(self, result, group: SubscriptionGroup) -> None:
+        state = self.groups.get(group)
+        response = result.value if isinstance(result, EncodedResult) else result
+        if state is None or not isinstance(response, dict) or 't' not in response:
+            return
+
+        version = GridVersion(response)
+        if state.version is None or version.seconds > state.version.seconds:
+            grid_event = format_event('grid', response)
+            message = grid_event if state.version is None else \
+                format_event('delta', create_delta(state.version, version))
+            state.version = version
+            state.grid_event = grid_event
+        else:
+            message = KEEP_ALIVE
+
+        for request in list(state.subscribers):
+            request.write(message)
+
+
+class GridFeed:
+    """Takes the current grids of subscription groups from the caches of the service."""
+
+    def __init__(self, service):
+        self.service = service
+
+    def __call__(self, group: SubscriptionGroup):
+        caches = self.service.cache
+        if group.grid_type == 'local':
+            grid = caches.local_strikes(0).get(self.service.get_local_strikes_grid, x=group.x, y=group.y,
+                                               grid_baselength=group.grid_base_length,
+                                               minute_length=group.minute_length, minute_offset=0,
+                                               count_threshold=0, data_area=group.data_area)
+        else:
+            grid = caches.strikes(0).get(self.service.get_strikes_grid, minute_length=group.minute_length,
+                                         grid_baselength=group.grid_base_length, minute_offset=0,
+                                         region=group.region, count_threshold=0)
+        # do not modify the result of the cached deferred
+        return gatherResults([grid], consumeErrors=True).addCallback(lambda results: results[0])
+
+
+class FakeGridFeed:
+    """Random grids with a moving grid time, for local testing without database."""
+
+    def __init__(self, x_count: int = 40, y_count: int = 30, cells_per_update: int = 5, seed=None,
+                 clock=datetime.datetime.now):
+        self.x_count = x_count
+        self.y_count = y_count
+        self.cells_per_update = cells_per_update
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.cells: dict[tuple, tuple] = {}
+
+    def __call__(self, group: SubscriptionGroup):
+        now = self.clock(datetime.UTC).replace(microsecond=0)
+        for _ in range(self.cells_per_update):
+            position = (self.random.randrange(self.x_count), self.random.randrange(self.y_count))
+            count = self.cells.get(position, (0, now))[0] + 1
+            self.cells[position] = (count, now)
+        cells = tuple((x, y, count, -int((now - timestamp).total_seconds()))
+                      for (x, y), (count, timestamp) in sorted(self.cells.items()))
+        return succeed({'r': cells, 'xd': 0.1, 'yd': 0.1, 'x0': 0.0, 'y1': 0.0, 'xc': self.x_count,
+                        'yc': self.y_count, 't': now.strftime(TIME_FORMAT), 'dt': group.minute_length * 60,
+                        'h': []})
+
+
+class PushResource(resource.Resource):
+    """
+    Server-sent event stream of grid updates.
+
+    Query arguments: 'type' ('region' or 'local'), 'minute_length', 'grid_base_length' and 'region' or 'x', 'y' and
+    'data_area'.
+    """
+    isLeaf = True
+
+    def __init__(self, publisher: PushPublisher, service):
+        super().__init__()
+        self.publisher = publisher
+        self.service = service
+
+    def render_GET(self, request):
+        client = self.service.get_request_client(request)
+        user_agent, user_agent_version = self.service.parse_user_agent(request)
+        group = self.parse_group(request)
+        if group is None:
+            request.setResponseCode(400)
+            return b''
+        if self.service.is_blocked_client(request, client, user_agent_version) or \
+                not self.service.is_admitted(client, user_agent):
+            request.setResponseCode(403)
+            return b''
+
+        request.setHeader(b'content-type', EVENT_STREAM_CONTENT_TYPE)
+        request.setHeader(b'cache-control', b'no-cache')
+        if not self.publisher.subscribe(group, request):
+            request.setResponseCode(503)
+            return b''
+        log.msg(f'push subscribe {group} {client} {user_agent}')
+        request.notifyFinish().addBoth(lambda _: self.publisher.unsubscribe(group, request))
+        return server.NOT_DONE_YET
+
+    def parse_group(self, request) -> Optional[SubscriptionGroup]:
+        def argument(name, default=None):
+            values = request.args.get(name.encode())
+            return int(values[0]) if values else default
+
+        try:
+            grid_type = request.args.get(b'type', [b'region'])[0].decode()
+            minute_length, _ = self.service.minute_constraints.enforce(argument('minute_length', 60), 0)
+            grid_base_length = canonical_grid_base_length(argument('grid_base_length', 10000),
+                                                          self.service.MIN_GRID_BASE_LENGTH)
+            if grid_type == 'local' and argument('x') is not None and argument('y') is not None:
+                data_area = round(max(5, argument('data_area', 5)))
+                if LocalGrid(data_area, argument('x'), argument('y')).is_on_globe():
+                    return SubscriptionGroup(grid_type, minute_length, grid_base_length, x=argument('x'),
+                                             y=argument('y'), data_area=data_area)
+            if grid_type == 'region':
+                region = argument('region', 1)
+                if 1 <= region <= self.service.MAX_REGION:
+                    return SubscriptionGroup(grid_type, minute_length, grid_base_length, region=region)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            pass
+        return None
@@ -0,0 +1,166 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+
+import collections
+import datetime
+import time
+from typing import Optional
+
+from twisted.internet.defer import Deferred, maybeDeferred
+
+from .tracing import LatencyHistogram
+from ..db.query import TimeInterval
+
+LIVE = 'live'
+HISTOGRAM = 'histogram'
+GLOBAL = 'global'
+HISTORY = 'history'
+
+# query classes by priority, the highest first
+QUERY_CLASSES = (LIVE, HISTOGRAM, GLOBAL, HISTORY)
+
+# session settings per query class, applied to the transaction of each query
+QUERY_SETTINGS = {
+    LIVE: {'statement_timeout': '10s', 'work_mem': '16MB', 'jit': 'off'},
+    HISTOGRAM: {'statement_timeout': '10s', 'work_mem': '16MB', 'jit': 'off'},
+    GLOBAL: {'statement_timeout': '30s', 'work_mem': '64MB', 'jit': 'off'},
+    HISTORY: {'statement_timeout': '60s', 'work_mem': '64MB', 'jit': 'on'},
+}
+
+HISTORY_OFFSET = datetime.timedelta(minutes=5)
+HISTORY_DURATION = datetime.timedelta(hours=3)
+
+
+def classify(time_interval: TimeInterval, now: Optional[datetime.datetime] = None) -> str:
+    """Grid queries of intervals ending in the past or spanning several hours are history queries."""
+    if time_interval.start is None or time_interval.end is None:
+        return HISTORY
+    now = now if now is not None else datetime.datetime.now(datetime.timezone.utc)
+    if time_interval.end < now - HISTORY_OFFSET or time_interval.duration > HISTORY_DURATION:
+        return HISTORY
+    return LIVE
+
+
+def default_limits(size: int) -> dict[str, int]:
+    """Live queries may use all connections, the other classes at most half of them each."""
+    shared = max(1, size // 2)
+    return {LIVE: size, HISTOGRAM: shared, GLOBAL: shared, HISTORY: shared}
+
+
+def query_settings(timeouts: Optional[dict[str, str]] = None) -> dict[str, dict[str, str]]:
+    """Session settings per query class, the statement timeouts can be overridden."""
+    settings = {query_class: dict(class_settings) for query_class, class_settings in QUERY_SETTINGS.items()}
+    for query_class, timeout in (timeouts or {}).items():
+        if query_class not in settings:
+            raise ValueError(f"unknown query class '{query_class}'")
+        settings[query_class]['statement_timeout'] = timeout
+    return settings
+
+
+class QueryScheduler:
+    """
+    Runs queries on a limited number of connections, queued queries are started by priority of their class.
+
+    Each class is limited to a number of concurrently running queries, so that expensive history and global queries
+    can not occupy all connections needed by live queries.
+
+    Cancelling a result drops its query from the queue or cancels the running query.
+    """
+
+    def __init__(self, size: int, limits: Optional[dict[str, int]] = None, clock=time.perf_counter,
+                 cancel_query=Deferred.cancel):
+        self.size = size
+        self.limits = default_limits(size)
+        if limits:
+            self.limits.update({query_class: min(limit, size) for query_class, limit in limits.items()})
+        self.clock = clock
+        self.cancel_query = cancel_query
+        self.running_count = 0
+        self.running = {query_class: 0 for query_class in QUERY_CLASSES}
+        self.queues: dict[str, collections.deque] = {query_class: collections.deque() for query_class in QUERY_CLASSES}
+        self.running_queries: dict[Deferred, tuple[str, Deferred]] = {}
+        self.wait_times = {query_class: LatencyHistogram() for query_class in QUERY_CLASSES}
+        self.cancelled = {query_class: 0 for query_class in QUERY_CLASSES}
+
+    def run(self, query_class: str, function, *args, **kwargs) -> Deferred:
+        """Run the function returning a Deferred as soon as a connection is available for the query class."""
+        if query_class not in self.queues:
+            raise ValueError(f"unknown query class '{query_class}'")
+        result: Deferred = Deferred(self.cancel)
+        self.queues[query_class].append((result, self.clock(), function, args, kwargs))
+        self.dispatch()
+        return result
+
+    def dispatch(self) -> None:
+        while self.running_count < self.size:
+            query_class = self.next_class()
+            if query_class is None:
+                return
+            result, queued_time, function, args, kwargs = self.queues[query_class].popleft()
+            self.wait_times[query_class].add(self.clock() - queued_time)
+            self.running[query_class] += 1
+            self.running_count += 1
+            query = maybeDeferred(function, *args, **kwargs)
+            self.running_queries[result] = (query_class, query)
+            query.addBoth(self.finished, query_class, result)
+            query.chainDeferred(result)
+
+    def next_class(self) -> Optional[str]:
+        for query_class in QUERY_CLASSES:
+            if self.queues[query_class] and self.running[query_class] < self.limits[query_class]:
+                return query_class
+        return None
+
+    def finished(self, query_result, query_class: str, result: Deferred):
+        del self.running_queries[result]
+        self.running[query_class] -= 1
+        self.running_count -= 1
+        self.dispatch()
+        return query_result
+
+    def cancel(self, result: Deferred) -> None:
+        """
+        Canceller of a result. A running query keeps its connection until the database confirmed the cancellation.
+        """
+        for query_class, queue in self.queues.items():
+            for entry in queue:
+                if entry[0] is result:
+                    queue.remove(entry)
+                    self.cancelled[query_class] += 1
+                    return
+        if result in self.running_queries:
+            query_class, query = self.running_queries[result]
+            self.cancelled[query_class] += 1
+            self.cancel_query(query)
+
+    def get_statistics(self, reset: bool = False) -> dict[str, dict]:
+        """Queue depth, running and cancelled queries and wait time percentiles in milliseconds per query class."""
+        statistics = {query_class: {
+            'queued': len(self.queues[query_class]),
+            'running': self.running[query_class],
+            'limit': self.limits[query_class],
+            'cancelled': self.cancelled[query_class],
+            'wait': self.wait_times[query_class].get_statistics(),
+        } for query_class in QUERY_CLASSES}
+        if reset:
+            self.wait_times = {query_class: LatencyHistogram() for query_class in QUERY_CLASSES}
+            self.cancelled = {query_class: 0 for query_class in QUERY_CLASSES}
+        return statistics
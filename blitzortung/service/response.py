@@ -0,0 +1,302 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import gzip
+import hashlib
+import json
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from twisted.internet import task
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.interfaces import IPullProducer
+from twisted.web import http
+from txjsonrpc_ng import jsonrpclib
+from zope.interface import implementer
+from txjsonrpc_ng.web.data import CacheableResult
+
+from .json_encoder import JsonEncoder
+from .packed_grid import is_grid_response, pack_grid
+
+MIN_COMPRESSION_SIZE = 1000
+COMPRESSION_LEVEL = 9
+MAX_RENDERINGS = 4
+PACKED_GRID_CONTENT_TYPE = 'application/vnd.blitzortung.grid'
+STREAMING_MIN_SIZE = 256 * 1024
+STREAMING_CHUNK_SIZE = 64 * 1024
+CONDITIONAL_METHODS = (b'GET', b'HEAD')
+ENCODING_MIN_ROWS = 10000
+ENCODING_BATCH_ROWS = 2000
+
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+
+@dataclass
+class EncodedResult(CacheableResult):
+    """
+    Cacheable result holding its JSON encoded value and a gzip compressed variant of it.
+
+    The compressed body is a self-contained deflate segment, so that responses for different JSON-RPC
+    envelopes can be assembled without compressing the body again.
+    """
+    body: bytes = b''
+    compressed_body: Optional[bytes] = None
+    renderings: dict = field(default_factory=dict)
+    packed: Optional[tuple[bytes, Optional[bytes]]] = None
+    digest: Optional[str] = None
+
+    def render(self, version: int, id: Any, compressed: bool) -> bytes:
+        render_key = (version, id, compressed)
+        rendering = self.renderings.get(render_key)
+        if rendering is None:
+            rendering = b''.join(self.render_parts(version, id, compressed))
+            if len(self.renderings) >= MAX_RENDERINGS:
+                del self.renderings[next(iter(self.renderings))]
+            self.renderings[render_key] = rendering
+        return rendering
+
+    def render_parts(self, version: int, id: Any, compressed: bool) -> list[bytes]:
+        """
+        Returns the response as a sequence of byte strings, the encoded body is shared and not copied.
+        """
+        prefix, suffix = create_envelope(version, id)
+        if compressed:
+            return gzip_parts(prefix, self.body, self.compressed_body, suffix)
+        return [prefix, self.body, suffix]
+
+    def get_packed(self) -> tuple[bytes, Optional[bytes]]:
+        """
+        Returns the grid in the compact binary format and its gzip compressed variant, if it is large enough.
+
+        Both are created once per cached result on first use.
+        """
+        if self.packed is None:
+            packed_body = pack_grid(self.value)
+            compressed_packed_body = gzip.compress(packed_body, COMPRESSION_LEVEL, mtime=0) \
+                if len(packed_body) >= MIN_COMPRESSION_SIZE else None
+            self.packed = packed_body, compressed_packed_body
+        return self.packed
+
+    def get_etag(self, packed: bool) -> str:
+        """
+        Returns a weak entity tag derived from the encoded result, independent of the JSON-RPC envelope.
+        """
+        if self.digest is None:
+            self.digest = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        return f'W/"{self.digest}{".p" if packed else ""}"'
+
+    def is_compressible(self) -> bool:
+        return self.compressed_body is not None
+
+    def is_packable(self) -> bool:
+        return is_grid_response(self.value)
+
+
+def encode_result(value: Any, encoder: Optional[JsonEncoder] = None) -> EncodedResult:
+    body = encoder.encode(value) if encoder is not None else json.dumps(value, cls=jsonrpclib.JSONRPCEncoder).encode()
+    compressed_body = deflate_segment(body, final=False) if len(body) >= MIN_COMPRESSION_SIZE else None
+    return EncodedResult(value, body=body, compressed_body=compressed_body)
+
+
+def combine_encoded_results(results: list) -> EncodedResult:
+    """
+    Combines results into one encoded JSON list, reusing their encoded and compressed bodies.
+    """
+    results = [result if isinstance(result, EncodedResult) else encode_result(result) for result in results]
+    body = b'[' + b', '.join(result.body for result in results) + b']'
+    compressed_body = None
+    if len(body) >= MIN_COMPRESSION_SIZE:
+        if all(result.is_compressible() for result in results):
+            separator = deflate_segment(b', ', final=False)
+            compressed_body = deflate_segment(b'[', final=False) + \
+                separator.join(result.compressed_body for result in results) + deflate_segment(b']', final=False)
+        else:
+            compressed_body = deflate_segment(body, final=False)
+    return EncodedResult([result.value for result in results], body=body, compressed_body=compressed_body)
+
+
+def encode_grid_result(value: Any, cooperator: Optional[task.Cooperator] = None,
+                       encoder: Optional[JsonEncoder] = None):
+    """
+    Encodes a grid result, large grids are encoded and compressed in batches of rows which are interleaved with
+    other work of the reactor. Returns an EncodedResult or a Deferred of it.
+    """
+    if not is_grid_response(value) or len(value['r']) < ENCODING_MIN_ROWS:
+        return encode_result(value, encoder)
+
+    body_chunks: list[bytes] = []
+    compressed_chunks: list[bytes] = []
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    def encode():
+        for chunk in iterencode_grid(value, encoder):
+            body_chunks.append(chunk)
+            compressed_chunks.append(compressor.compress(chunk))
+            yield None
+
+    def build_result(_):
+        compressed_chunks.append(compressor.flush(zlib.Z_FULL_FLUSH))
+        return EncodedResult(value, body=b''.join(body_chunks), compressed_body=b''.join(compressed_chunks))
+
+    cooperate = cooperator.cooperate if cooperator is not None else task.cooperate
+    return cooperate(encode()).whenDone().addCallback(build_result)
+
+
+def iterencode_grid(value: dict, encoder: Optional[JsonEncoder] = None):
+    """
+    Yields the JSON encoding of a grid result in chunks of rows, the output equals json.dumps() with the default
+    encoder.
+    """
+    encoder = encoder if encoder is not None else JsonEncoder()
+    for index, (key, item) in enumerate(value.items()):
+        chunk = (b'{' if index == 0 else b', ') + encoder.encode(key) + b': '
+        if key != 'r' or not item:
+            yield chunk + encoder.encode(item)
+            continue
+        yield chunk + b'['
+        for offset in range(0, len(item), ENCODING_BATCH_ROWS):
+            rows = encoder.encode_rows(item[offset:offset + ENCODING_BATCH_ROWS])[1:-1]
+            yield rows if offset == 0 else b', ' + rows
+        yield b']'
+    yield b'}' if value else b'{}'
+
+
+def create_envelope(version: int, id: Any) -> tuple[bytes, bytes]:
+    """
+    Returns the JSON-RPC response text before and after the result, identical to jsonrpclib.dumps().
+    """
+    if version == jsonrpclib.VERSION_PRE1:
+        return b'[', b']'
+    encoded_id = json.dumps(id, cls=jsonrpclib.JSONRPCEncoder).encode()
+    if version == jsonrpclib.VERSION_2:
+        return b'{"jsonrpc": "2.0", "result": ', b', "id": ' + encoded_id + b'}'
+    return b'{"result": ', b', "error": null, "id": ' + encoded_id + b'}'
+
+
+def deflate_segment(data: bytes, final: bool) -> bytes:
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_FULL_FLUSH)
+
+
+def assemble_gzip(prefix: bytes, body: bytes, compressed_body: bytes, suffix: bytes) -> bytes:
+    """
+    Builds a single gzip member from independently compressed byte aligned deflate segments.
+    """
+    return b''.join(gzip_parts(prefix, body, compressed_body, suffix))
+
+
+def gzip_parts(prefix: bytes, body: bytes, compressed_body: bytes, suffix: bytes) -> list[bytes]:
+    crc = zlib.crc32(suffix, zlib.crc32(body, zlib.crc32(prefix)))
+    size = len(prefix) + len(body) + len(suffix)
+    return [GZIP_HEADER + deflate_segment(prefix, final=False), compressed_body,
+            deflate_segment(suffix, final=True) + struct.pack('<II', crc, size & 0xffffffff)]
+
+
+def accepts_gzip(request) -> bool:
+    accept_encoding = request.getHeader('Accept-encoding') or ''
+    return 'gzip' in (encoding.strip().lower() for encoding in accept_encoding.split(','))
+
+
+def accepts_packed_grid(request) -> bool:
+    accept = request.getHeader('Accept') or ''
+    return PACKED_GRID_CONTENT_TYPE in (media_type.split(';')[0].strip().lower() for media_type in accept.split(','))
+
+
+def matches_etag(request, etag: str) -> bool:
+    """Conditional responses are only allowed for GET and HEAD requests, other methods ignore If-None-Match."""
+    if request.method not in CONDITIONAL_METHODS:
+        return False
+    if_none_match = request.getHeader('If-None-Match')
+    if not if_none_match:
+        return False
+    return any(tag.strip() in ('*', etag, etag[2:]) for tag in if_none_match.split(','))
+
+
+def render_encoded_result(result: EncodedResult, request, id, version) -> Deferred:
+    """
+    Writes the result as JSON-RPC response or in the compact binary grid format, if the client asks for it, and
+    finishes the request. Large responses are written in chunks as the connection accepts them.
+
+    Responses carry an ETag, a GET or HEAD request with a matching If-None-Match header gets an empty 304 response.
+    JSON-RPC calls sent by POST always get the complete response. The returned Deferred fires with True if the
+    response is not modified.
+    """
+    packed = result.is_packable() and accepts_packed_grid(request)
+    etag = result.get_etag(packed)
+    request.setHeader("etag", etag)
+    request.setHeader("vary", "Accept, Accept-Encoding")
+    if matches_etag(request, etag):
+        request.setResponseCode(http.NOT_MODIFIED)
+        request.finish()
+        return succeed(True)
+
+    if packed:
+        packed_body, compressed_packed_body = result.get_packed()
+        compressed = compressed_packed_body is not None and accepts_gzip(request)
+        parts = [compressed_packed_body if compressed else packed_body]
+        request.setHeader("content-type", PACKED_GRID_CONTENT_TYPE)
+    else:
+        compressed = result.is_compressible() and accepts_gzip(request)
+        if len(result.body) < STREAMING_MIN_SIZE:
+            parts = [result.render(version, id, compressed)]
+        else:
+            parts = result.render_parts(version, id, compressed)
+    if compressed:
+        request.setHeader("content-encoding", "gzip")
+    request.setHeader("content-length", str(sum(len(part) for part in parts)))
+
+    if len(parts) == 1 and len(parts[0]) < STREAMING_MIN_SIZE:
+        request.write(parts[0])
+        request.finish()
+        return succeed(False)
+    return BodyProducer(request, parts).start().addCallback(lambda _: False)
+
+
+@implementer(IPullProducer)
+class BodyProducer:
+    """
+    Writes byte strings to a request in chunks whenever the connection is ready for more data.
+    """
+
+    def __init__(self, request, parts: list[bytes], chunk_size: int = STREAMING_CHUNK_SIZE):
+        self.request = request
+        self.chunks = (memoryview(part)[offset:offset + chunk_size]
+                       for part in parts for offset in range(0, len(part), chunk_size))
+        self.finished: Deferred = Deferred()
+
+    def start(self) -> Deferred:
+        self.request.registerProducer(self, False)
+        return self.finished
+
+    def resumeProducing(self) -> None:
+        chunk = next(self.chunks, None)
+        if chunk is not None:
+            self.request.write(bytes(chunk))
+            return
+        self.request.unregisterProducer()
+        self.request.finish()
+        self.finished.callback(None)
+
+    def stopProducing(self) -> None:
+        self.chunks = iter(())
+        if not self.finished.called:
+            self.finished.callback(None)
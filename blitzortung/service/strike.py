@@ -25,6 +25,8 @@ from twisted.internet.defer import gatherResults
 from twisted.python import log
 
 from .general import TimingState
+from .offload import ResultOffload
+from .tracing import BUILD_RESULT
 from .. import db, geom
 from ..data import Timestamp
 from ..db.query import TimeInterval
@@ -40,9 +42,11 @@ class StrikeState(TimingState):
 
 class StrikeQuery:
     @inject
-    def __init__(self, strike_query_builder: db.query_builder.Strike, strike_mapper: db.mapper.Strike):
+    def __init__(self, strike_query_builder: db.query_builder.Strike, strike_mapper: db.mapper.Strike,
+                 result_offload: ResultOffload = None):
         self.strike_query_builder = strike_query_builder
         self.strike_mapper = strike_mapper
+        self.result_offload = result_offload if result_offload is not None else ResultOffload()
         self.id_order = db.query.Order('id')
 
     def create(self, id_or_offset, time_interval: TimeInterval, connection, statsd_client):
@@ -54,11 +58,11 @@ class StrikeQuery:
                                                        id_interval=id_interval)
 
         strikes_result = connection.runQuery(str(query), query.get_parameters())
-        strikes_result.addCallback(self.build_result, state=state)
+        strikes_result.addCallback(self.result_offload.build, self.build_result, state=state)
         return strikes_result, state
 
     def build_result(self, query_result, state):
-        state.add_info_text("query %.03fs #%d" % (state.get_seconds(), len(query_result)))
+        state.trace.begin(BUILD_RESULT)
         state.log_timing('strikes.query')
 
         reference_time = time.time()
@@ -79,7 +83,6 @@ class StrikeQuery:
         if strikes:
             result['next'] = query_result[-1][0] + 1
 
-        state.add_info_text(", result %.03fs" % state.get_seconds(reference_time))
         state.log_timing('strikes.build_result', reference_time)
         return result
 
@@ -104,7 +107,6 @@ class StrikeQuery:
         }
         final_result.update(strikes_result)
 
-        state.add_info_text(", total %.03fs" % state.get_seconds())
         state.log_timing('strikes.total')
 
         return final_result
@@ -0,0 +1,424 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import array
+import bisect
+import datetime
+from typing import Optional
+
+from injector import inject
+from twisted.internet.defer import Deferred, maybeDeferred, succeed
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+
+from .db import execute
+from .histogram import HISTOGRAM_BIN_SIZE
+from .response import EncodedResult, encode_result
+from .. import db, geom
+from ..db.query import IdInterval, Order, TimeInterval
+from ..geom import Grid
+
+NANOSECONDS = 1000000000
+
+
+def to_nanoseconds(timestamp: datetime.datetime, nanoseconds: int = 0) -> int:
+    return int(timestamp.timestamp()) * NANOSECONDS + timestamp.microsecond * 1000 + (nanoseconds or 0)
+
+
+def to_datetime(timestamp: int) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(timestamp // NANOSECONDS, datetime.timezone.utc) \
+        + datetime.timedelta(microseconds=timestamp % NANOSECONDS // 1000)
+
+
+def count_window(timestamps, x, y, time_interval: TimeInterval, cell_functions: dict,
+                 bin_size: Optional[int] = None) -> dict:
+    """
+    Count the strikes of the time interval into the cells and bins of several grids with one pass over a window of
+    strikes, returns the cells and bins per key of the cell functions.
+
+    Only reads the given window, so that it can be counted outside of the reactor thread.
+    """
+    start_time = to_nanoseconds(time_interval.start)
+    end_time = to_nanoseconds(time_interval.end)
+    bin_length = bin_size * 60 if bin_size else 0
+    half_second = NANOSECONDS // 2
+    counts = {key: ({}, {}) for key in cell_functions}
+    counters = [(cell_of,) + counts[key] for key, cell_of in cell_functions.items()]
+    for index, timestamp in enumerate(timestamps):
+        if not start_time <= timestamp < end_time:
+            continue
+        strike_x = x[index]
+        strike_y = y[index]
+        interval = -((end_time - timestamp + half_second) // NANOSECONDS // bin_length) if bin_length else None
+        for cell_of, cells, bins in counters:
+            cell = cell_of(strike_x, strike_y)
+            if cell is None:
+                continue
+            entry = cells.get(cell)
+            if entry is None:
+                cells[cell] = [1, timestamp]
+            else:
+                entry[0] += 1
+                if timestamp > entry[1]:
+                    entry[1] = timestamp
+            if bin_length:
+                bins[interval] = bins.get(interval, 0) + 1
+    return counts
+
+
+def build_grid_rows(counts: tuple[dict, dict], count_threshold: int = 0) -> list[dict]:
+    """Rows of the grid query from the cells and bins of a grid."""
+    cells, bins = counts
+    rows = [{'rx': rx, 'ry': ry, 'interval': None, 'strike_count': count, 'timestamp': to_datetime(timestamp)}
+            for (rx, ry), (count, timestamp) in cells.items() if count > count_threshold]
+    rows += [{'rx': None, 'ry': None, 'interval': interval, 'strike_count': count, 'timestamp': None}
+             for interval, count in sorted(bins.items())]
+    return rows
+
+
+def count_grid_rows(timestamps, x, y, time_interval: TimeInterval, cell_of, bin_size: Optional[int],
+                    count_threshold: int) -> list[dict]:
+    """Rows of the grid query counted from a window of strikes."""
+    return build_grid_rows(count_window(timestamps, x, y, time_interval, {None: cell_of}, bin_size)[None],
+                           count_threshold)
+
+
+class StrikeBuffer:
+    """
+    Strikes of the last minutes in insertion order, kept in compact arrays.
+
+    Strikes are appended in id order, so that id cursors are found by binary search. Late strikes can have older
+    timestamps than earlier ones, the running maximum of the timestamps is used to find the first strike of a time
+    window by binary search.
+
+    Responses are shared by all clients asking for the same window and cursor until the buffer is updated.
+
+    Grids and histograms of time intervals within the buffer are counted from the buffered strikes, the rows have the
+    same form as the rows of the corresponding database queries. The grids of a time interval can be precounted
+    together, the counts are kept until the buffer is updated.
+    """
+
+    MINUTES = 180
+    MAX_RESPONSES = 1000
+    MAX_AGE = 15  # seconds, one update interval of the feed plus the time of its query
+
+    def __init__(self, minutes: int = MINUTES, max_responses: int = MAX_RESPONSES, max_age: int = MAX_AGE):
+        self.minutes = minutes
+        self.max_responses = max_responses
+        self.max_age = datetime.timedelta(seconds=max_age)
+        self.ids = array.array('q')
+        self.timestamps = array.array('q')
+        self.max_timestamps = array.array('q')
+        self.x = array.array('d')
+        self.y = array.array('d')
+        self.altitudes = array.array('d')
+        self.lateral_errors = array.array('d')
+        self.amplitudes = array.array('d')
+        self.station_counts = array.array('i')
+        self.end_time: Optional[datetime.datetime] = None
+        self.responses: dict[tuple[int, int], EncodedResult] = {}
+        self.histograms: dict[int, list[int]] = {}
+        self.grid_counts: dict[tuple, tuple[dict, dict]] = {}
+        self.update_count = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def is_ready(self) -> bool:
+        return self.end_time is not None
+
+    def covers(self, time_interval: TimeInterval, now: Optional[datetime.datetime] = None) -> bool:
+        """
+        True if the buffer contains all strikes of the time interval. The buffer must have been updated after the end of
+        the interval and recently, so that results counted from it are not outdated when they are cached.
+        """
+        if not self.is_ready() or time_interval.start is None or time_interval.end is None:
+            return False
+        now = now if now is not None else datetime.datetime.now(datetime.timezone.utc)
+        return now - self.end_time <= self.max_age and time_interval.end <= self.end_time and \
+            time_interval.start >= self.end_time - datetime.timedelta(minutes=self.minutes)
+
+    def get_last_id(self) -> int:
+        return self.ids[-1] if self.ids else 0
+
+    def add(self, rows, end_time: datetime.datetime) -> int:
+        """
+        Append strike rows ordered by id and drop strikes older than the buffer length. Returns the number of
+        strikes added.
+        """
+        last_id = self.get_last_id()
+        max_timestamp = self.max_timestamps[-1] if self.max_timestamps else 0
+        count = 0
+        for row in rows:
+            if row['id'] <= last_id:
+                continue
+            timestamp = to_nanoseconds(row['timestamp'], row['nanoseconds'])
+            max_timestamp = max(max_timestamp, timestamp)
+            self.ids.append(row['id'])
+            self.timestamps.append(timestamp)
+            self.max_timestamps.append(max_timestamp)
+            self.x.append(row['x'])
+            self.y.append(row['y'])
+            self.altitudes.append(row['altitude'] or 0)
+            self.lateral_errors.append(min(max(row['error2d'] or 0, 0), 32767))
+            self.amplitudes.append(row['amplitude'] or 0)
+            self.station_counts.append(row['stationcount'] or 0)
+            last_id = row['id']
+            count += 1
+
+        self.expire(end_time)
+        self.end_time = end_time.replace(microsecond=0)
+        self.responses.clear()
+        self.histograms.clear()
+        self.grid_counts.clear()
+        self.update_count += 1
+        return count
+
+    def expire(self, end_time: datetime.datetime) -> None:
+        index = self.find_time(to_nanoseconds(end_time - datetime.timedelta(minutes=self.minutes)))
+        if index:
+            for values in (self.ids, self.timestamps, self.max_timestamps, self.x, self.y, self.altitudes,
+                           self.lateral_errors, self.amplitudes, self.station_counts):
+                del values[:index]
+
+    def find_time(self, timestamp: int) -> int:
+        """Index of the first strike which can be at or after the given time, all strikes before are older."""
+        return bisect.bisect_left(self.max_timestamps, timestamp)
+
+    def find_id(self, id_value: int) -> int:
+        return bisect.bisect_left(self.ids, id_value)
+
+    def get_strikes(self, minute_length: int, id_or_offset: int = 0) -> EncodedResult:
+        """
+        Strikes of the last minutes as in the database based response, starting at the id given as a positive
+        id_or_offset.
+        """
+        minute_length = max(0, min(minute_length, self.minutes))
+        end_time = to_nanoseconds(self.end_time)
+        start_time = end_time - minute_length * 60 * NANOSECONDS
+        start_index = self.find_time(start_time)
+        if id_or_offset > 0:
+            start_index = max(start_index, self.find_id(id_or_offset))
+
+        key = (minute_length, self.ids[start_index] if start_index < len(self.ids) else -1)
+        response = self.responses.get(key)
+        if response is None:
+            if len(self.responses) >= self.max_responses:
+                del self.responses[next(iter(self.responses))]
+            response = self.responses[key] = encode_result(
+                self.build_response(minute_length, start_index, start_time, end_time))
+        return response
+
+    def build_response(self, minute_length: int, start_index: int, start_time: int, end_time: int) -> dict:
+        timestamps = self.timestamps
+        strikes = tuple(
+            (
+                max(0, end_time - timestamps[index]) // NANOSECONDS,
+                self.x[index],
+                self.y[index],
+                self.altitudes[index],
+                self.lateral_errors[index],
+                self.amplitudes[index],
+                self.station_counts[index]
+            ) for index in range(start_index, len(self.ids)) if timestamps[index] >= start_time)
+
+        response = {
+            't': self.end_time.strftime("%Y%m%dT%H:%M:%S"),
+            'h': self.get_histogram(minute_length),
+            's': strikes
+        }
+        if strikes:
+            response['next'] = self.ids[-1] + 1
+        return response
+
+    def get_histogram(self, minute_length: int, bin_size: int = HISTOGRAM_BIN_SIZE) -> list[int]:
+        """Strike counts per bin of the last minutes like the histogram query, the latest bin is last."""
+        histogram = self.histograms.get(minute_length)
+        if histogram is None:
+            value_count = minute_length // bin_size
+            histogram = [0] * value_count
+            end_time = to_nanoseconds(self.end_time)
+            bin_length = bin_size * 60 * NANOSECONDS
+            start_time = end_time - value_count * bin_length
+            timestamps = self.timestamps
+            for index in range(self.find_time(start_time), len(timestamps)):
+                age = end_time - timestamps[index]
+                if 0 <= age < value_count * bin_length:
+                    histogram[value_count - 1 - age // bin_length] += 1
+            self.histograms[minute_length] = histogram
+        return histogram
+
+    def count(self, time_interval: TimeInterval, cell_of=None, bin_size: Optional[int] = None):
+        """
+        Count the strikes of the time interval per cell and per histogram bin.
+
+        cell_of maps the coordinates of a strike to its cell or to None for strikes outside of the grid. Cells map to
+        their strike count and latest timestamp, bins are numbered like in the histogram query. With a cell function,
+        only the strikes within the grid are counted in the bins.
+        """
+        if cell_of is None:
+            return {}, self.count_bins(time_interval, bin_size)
+        return self.count_grids(time_interval, {None: cell_of}, bin_size)[None]
+
+    def count_bins(self, time_interval: TimeInterval, bin_size: Optional[int]) -> dict[int, int]:
+        start_time = to_nanoseconds(time_interval.start)
+        end_time = to_nanoseconds(time_interval.end)
+        bin_length = bin_size * 60 if bin_size else 0
+        half_second = NANOSECONDS // 2
+        bins: dict[int, int] = {}
+        if not bin_length:
+            return bins
+        timestamps = self.timestamps
+        for index in range(self.find_time(start_time), len(timestamps)):
+            timestamp = timestamps[index]
+            if start_time <= timestamp < end_time:
+                interval = -((end_time - timestamp + half_second) // NANOSECONDS // bin_length)
+                bins[interval] = bins.get(interval, 0) + 1
+        return bins
+
+    def get_window(self, time_interval: TimeInterval) -> tuple[array.array, array.array, array.array]:
+        """Copies of the timestamps and coordinates of the strikes which can be within the time interval."""
+        index = self.find_time(to_nanoseconds(time_interval.start))
+        return self.timestamps[index:], self.x[index:], self.y[index:]
+
+    def count_grids(self, time_interval: TimeInterval, cell_functions: dict, bin_size: Optional[int] = None) -> dict:
+        """
+        Count the strikes of the time interval into the cells and bins of several grids with one pass over the
+        buffer, returns the cells and bins per key of the cell functions.
+        """
+        return count_window(*self.get_window(time_interval), time_interval, cell_functions, bin_size)
+
+    def precount(self, time_interval: TimeInterval, grids=(), global_grids=(), bin_size: Optional[int] = None,
+                 result_offload=None) -> Deferred:
+        """
+        Count the strikes of the time interval into all given grids with one pass over the buffer. The counts are
+        used by get_grid_rows until the buffer is updated.
+
+        The copied strike window is counted on the thread pool of the result offload if given. Counts finished after
+        an update of the buffer are dropped.
+        """
+        interval_key = (to_nanoseconds(time_interval.start), to_nanoseconds(time_interval.end), bin_size)
+        cell_functions = {(grid, False) + interval_key: self.cell_function(grid) for grid in grids}
+        cell_functions.update({(grid, True) + interval_key: self.global_cell_function(grid) for grid in global_grids})
+        timestamps, x, y = self.get_window(time_interval)
+        if result_offload is None:
+            counts = succeed(count_window(timestamps, x, y, time_interval, cell_functions, bin_size))
+        else:
+            counts = maybeDeferred(result_offload.build, timestamps, count_window, x, y, time_interval,
+                                   cell_functions, bin_size)
+        counts.addCallback(self.__store_counts, self.update_count)
+        return counts
+
+    def __store_counts(self, counts: dict, update_count: int) -> None:
+        if update_count == self.update_count:
+            self.grid_counts.update(counts)
+
+    def get_grid_rows(self, grid: Grid, time_interval: TimeInterval, count_threshold: int = 0,
+                      histogram_binsize: Optional[int] = None, global_grid: bool = False,
+                      result_offload=None) -> Deferred:
+        """
+        Deferred rows of the grid query, with histogram bin size the rows of the combined grid and histogram query.
+
+        Grids which are not precounted are counted from a copy of the strikes of the time interval, on the thread pool
+        of the result offload if given.
+        """
+        counts = self.grid_counts.get((grid, global_grid, to_nanoseconds(time_interval.start),
+                                       to_nanoseconds(time_interval.end), histogram_binsize))
+        if counts is not None:
+            return succeed(build_grid_rows(counts, count_threshold))
+
+        cell_of = self.global_cell_function(grid) if global_grid else self.cell_function(grid)
+        timestamps, x, y = self.get_window(time_interval)
+        if result_offload is None:
+            return succeed(count_grid_rows(timestamps, x, y, time_interval, cell_of, histogram_binsize,
+                                           count_threshold))
+        return maybeDeferred(result_offload.build, timestamps, count_grid_rows, x, y, time_interval, cell_of,
+                             histogram_binsize, count_threshold)
+
+    @staticmethod
+    def cell_function(grid: Grid):
+        x_min, x_max, x_div = grid.x_min, grid.x_max, grid.x_div
+        y_min, y_max, y_div = grid.y_min, grid.y_max, grid.y_div
+
+        def cell_of(x, y):
+            if x_min <= x <= x_max and y_min <= y <= y_max:
+                return int((x - x_min) / x_div), int((y - y_min) / y_div)
+            return None
+
+        return cell_of
+
+    @staticmethod
+    def global_cell_function(grid: Grid):
+        x_div = grid.x_div
+        y_div = grid.y_div
+
+        def cell_of(x, y):
+            return round((x - x_div * 0.5) / x_div), round((y - y_div * 0.5) / y_div)
+
+        return cell_of
+
+
+class StrikeBufferFeed:
+    """
+    Fills a strike buffer with the strikes after the last buffered id.
+
+    The first update loads the strikes of the whole buffer length.
+    """
+
+    UPDATE_INTERVAL = 10  # seconds
+
+    @inject
+    def __init__(self, strike_query_builder: db.query_builder.Strike):
+        self.strike_query_builder = strike_query_builder
+        self.id_order = Order('id')
+        self.loop: Optional[LoopingCall] = None
+        self.updating = False
+
+    def start(self, strike_buffer: StrikeBuffer, connection_pool, interval: float = UPDATE_INTERVAL, clock=None):
+        self.loop = LoopingCall(self.update, strike_buffer, connection_pool)
+        if clock is not None:
+            self.loop.clock = clock
+        self.loop.start(interval)
+
+    def stop(self):
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+
+    def update(self, strike_buffer: StrikeBuffer, connection_pool):
+        if self.updating:
+            return succeed(None)
+        self.updating = True
+
+        end_time = datetime.datetime.now(datetime.timezone.utc)
+        time_interval = TimeInterval(end_time - datetime.timedelta(minutes=strike_buffer.minutes))
+        last_id = strike_buffer.get_last_id()
+        query = self.strike_query_builder.select_query(db.table.Strike.table_name, geom.Geometry.default_srid,
+                                                       time_interval=time_interval, order=self.id_order,
+                                                       id_interval=IdInterval(last_id + 1) if last_id else None)
+
+        result = execute(connection_pool, query)
+        result.addCallback(strike_buffer.add, end_time)
+        result.addErrback(log.err)
+        result.addBoth(self.__updated)
+        return result
+
+    def __updated(self, result):
+        self.updating = False
+        return result
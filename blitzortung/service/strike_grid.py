@@ -23,11 +23,15 @@ from dataclasses import dataclass
 from typing import Optional
 
 from injector import inject
-from twisted.internet.defer import gatherResults
-from twisted.python import log
+from twisted.internet.defer import Deferred, gatherResults
+from twisted.python.failure import Failure
 
 from .db import execute
 from .general import TimingState
+from .histogram import HISTOGRAM_BIN_SIZE, build_histogram
+from .offload import ResultOffload
+from .query_scheduler import GLOBAL, classify
+from .tracing import BUILD_RESULT, HISTOGRAM, STRIKE_BUFFER
 from .. import db
 from ..db.grid_result import build_grid_result
 from ..db.query import TimeInterval
@@ -42,56 +46,127 @@ class GridParameters:
     count_threshold: int = 0
 
 
+def split_histogram_rows(results):
+    """Separate the grid cells from the (interval, count) histogram bins of a combined grid query result."""
+    grid_rows = []
+    histogram_rows = []
+    for result in results:
+        if result['interval'] is None:
+            grid_rows.append(result)
+        else:
+            histogram_rows.append((result['interval'], result['strike_count']))
+    return grid_rows, histogram_rows
+
+
+class SharedHistogram:
+    """
+    Hands out the histogram of a grid result created with histogram to other grids of the same time interval and area.
+    """
+
+    def __init__(self, grid_result: Deferred):
+        self.result = None
+        self.waiting: Optional[list[Deferred]] = []
+        grid_result.addBoth(self.__deliver)
+
+    def __deliver(self, result):
+        self.result = result if isinstance(result, Failure) else result[1]
+        waiting, self.waiting = self.waiting, None
+        for histogram_result in waiting:
+            self.__fire(histogram_result)
+        return result
+
+    def get(self) -> Deferred:
+        """A new deferred histogram, cancelling it does not affect the grid result."""
+        histogram_result = Deferred()
+        if self.waiting is None:
+            self.__fire(histogram_result)
+        else:
+            self.waiting.append(histogram_result)
+        return histogram_result
+
+    def __fire(self, histogram_result: Deferred):
+        if isinstance(self.result, Failure):
+            histogram_result.errback(self.result)
+        else:
+            histogram_result.callback(self.result)
+
+
 class StrikeGridState(TimingState):
     __slots__ = ['grid_parameters', 'time_interval']
 
-    def __init__(self, statsd_client, grid_parameters: GridParameters, time_interval: TimeInterval):
-        super().__init__("strikes_grid", statsd_client)
+    def __init__(self, statsd_client, grid_parameters: GridParameters, time_interval: TimeInterval, trace=None):
+        super().__init__("strikes_grid", statsd_client, trace)
         self.grid_parameters = grid_parameters
         self.time_interval = time_interval
 
 
 class StrikeGridQuery:
     @inject
-    def __init__(self, strike_query_builder: db.query_builder.Strike):
+    def __init__(self, strike_query_builder: db.query_builder.Strike, result_offload: ResultOffload = None):
         self.strike_query_builder = strike_query_builder
-
-    def create(self, grid_parameters: GridParameters, time_interval: TimeInterval, connection_pool, statsd_client):
-        state = StrikeGridState(statsd_client, grid_parameters, time_interval)
-
-        query = self.strike_query_builder.grid_query(db.table.Strike.table_name, grid_parameters.grid,
-                                                     time_interval=time_interval,
-                                                     count_threshold=grid_parameters.count_threshold)
-
-        result = execute(connection_pool, query)
-        result.addCallback(self.build_result, state=state)
-        result.addErrback(log.err)
+        self.result_offload = result_offload if result_offload is not None else ResultOffload()
+
+    def create(self, grid_parameters: GridParameters, time_interval: TimeInterval, connection_pool, statsd_client,
+               with_histogram=False, trace=None, strike_buffer=None):
+        """
+        Query the strike grid. With histogram, the histogram of the same strikes is computed by the same query and
+        the result contains both the grid and the histogram.
+
+        Time intervals covered by the strike buffer are counted from the buffered strikes instead of the database.
+        """
+        state = StrikeGridState(statsd_client, grid_parameters, time_interval, trace)
+        histogram_binsize = HISTOGRAM_BIN_SIZE if with_histogram else None
+
+        if strike_buffer is not None and strike_buffer.covers(time_interval):
+            state.trace.begin(STRIKE_BUFFER)
+            result = strike_buffer.get_grid_rows(grid_parameters.grid, time_interval, grid_parameters.count_threshold,
+                                                 histogram_binsize, result_offload=self.result_offload)
+        else:
+            query = self.strike_query_builder.grid_query(db.table.Strike.table_name, grid_parameters.grid,
+                                                         time_interval=time_interval,
+                                                         count_threshold=grid_parameters.count_threshold,
+                                                         histogram_binsize=histogram_binsize)
+
+            result = execute(connection_pool, query, state.trace, classify(time_interval))
+        result.addCallback(self.result_offload.build, self.build_result, state=state, with_histogram=with_histogram)
         return result, state
 
     @staticmethod
-    def build_result(results, state: StrikeGridState):
-        state.add_info_text("grid query %.03fs #%d %s" % (state.get_seconds(), len(results), state.grid_parameters))
+    def build_result(results, state: StrikeGridState, with_histogram=False):
+        state.trace.begin(BUILD_RESULT)
         state.log_timing('strikes_grid.query')
 
         reference_time = time.time()
 
+        if with_histogram:
+            results, histogram_rows = split_histogram_rows(results)
+
         grid = state.grid_parameters.grid
         strikes_grid_result = build_grid_result(results, grid.x_bin_count, grid.y_bin_count, state.time_interval.end)
 
-        state.add_info_text(", result %.03fs" % state.get_seconds(reference_time))
         state.log_timing('strikes_grid.build_result', reference_time)
 
+        if with_histogram:
+            state.trace.begin(HISTOGRAM)
+            return strikes_grid_result, build_histogram(histogram_rows, state.time_interval.minutes(),
+                                                        HISTOGRAM_BIN_SIZE)
         return strikes_grid_result
 
     def combine_result(self, strike_grid_result, histogram_result, state: StrikeGridState):
-        combined_result = gatherResults([strike_grid_result, histogram_result], consumeErrors=True)
+        """
+        Combine grid and histogram into the response. Without a histogram result, the grid result was created with
+        histogram and already contains both. Failures are passed on, so that failed results are not cached.
+        """
+        if histogram_result is None:
+            combined_result = strike_grid_result
+        else:
+            combined_result = gatherResults([strike_grid_result, histogram_result], consumeErrors=True)
         combined_result.addCallback(self.build_grid_response, state=state)
-        combined_result.addErrback(log.err)
-
         return combined_result
 
     @staticmethod
     def build_grid_response(results, state: StrikeGridState):
+        state.trace.begin(BUILD_RESULT)
         state.log_timing('strikes_grid.results')
 
         grid_data = results[0]
@@ -116,37 +191,47 @@ class StrikeGridQuery:
                     't': end_time.strftime("%Y%m%dT%H:%M:%S"),
                     'dt': duration.seconds,
                     'h': histogram_data}
-        state.add_info_text(", total %.03fs" % state.get_seconds())
         state.log_timing('strikes_grid.total')
-        print("".join(state.info_text))
 
         return response
 
 
 class GlobalStrikeGridQuery:
     @inject
-    def __init__(self, strike_query_builder: db.query_builder.Strike):
+    def __init__(self, strike_query_builder: db.query_builder.Strike, result_offload: ResultOffload = None):
         self.strike_query_builder = strike_query_builder
-
-    def create(self, grid_parameters: GridParameters, time_interval: TimeInterval, connection_pool, statsd_client):
-        state = StrikeGridState(statsd_client, grid_parameters, time_interval)
-
-        query = self.strike_query_builder.global_grid_query(db.table.Strike.table_name, grid_parameters.grid,
-                                                            time_interval=time_interval,
-                                                            count_threshold=grid_parameters.count_threshold)
-
-        result = execute(connection_pool, query)
-        result.addCallback(self.build_result, state=state)
-        result.addErrback(log.err)
+        self.result_offload = result_offload if result_offload is not None else ResultOffload()
+
+    def create(self, grid_parameters: GridParameters, time_interval: TimeInterval, connection_pool, statsd_client,
+               with_histogram=False, trace=None, strike_buffer=None):
+        state = StrikeGridState(statsd_client, grid_parameters, time_interval, trace)
+        histogram_binsize = HISTOGRAM_BIN_SIZE if with_histogram else None
+
+        if strike_buffer is not None and strike_buffer.covers(time_interval):
+            state.trace.begin(STRIKE_BUFFER)
+            result = strike_buffer.get_grid_rows(grid_parameters.grid, time_interval, grid_parameters.count_threshold,
+                                                 histogram_binsize, global_grid=True,
+                                                 result_offload=self.result_offload)
+        else:
+            query = self.strike_query_builder.global_grid_query(db.table.Strike.table_name, grid_parameters.grid,
+                                                                time_interval=time_interval,
+                                                                count_threshold=grid_parameters.count_threshold,
+                                                                histogram_binsize=histogram_binsize)
+
+            result = execute(connection_pool, query, state.trace, GLOBAL)
+        result.addCallback(self.result_offload.build, self.build_result, state=state, with_histogram=with_histogram)
         return result, state
 
     @staticmethod
-    def build_result(results, state):
-        state.add_info_text(
-            "global grid query %.03fs #%d %s" % (state.get_seconds(), len(results), state.grid_parameters))
+    def build_result(results, state, with_histogram=False):
+        state.trace.begin(BUILD_RESULT)
         state.log_timing('global_strikes_grid.query')
 
         reference_time = time.time()
+
+        if with_histogram:
+            results, histogram_rows = split_histogram_rows(results)
+
         end_time = state.time_interval.end
         global_strikes_grid_result = tuple(
             (
@@ -156,20 +241,25 @@ class GlobalStrikeGridQuery:
                 -(end_time - result['timestamp']).seconds
             ) for result in results
         )
-        state.add_info_text(", result %.03fs" % state.get_seconds(reference_time))
         state.log_timing('globaL_strikes_grid.build_result', reference_time)
 
+        if with_histogram:
+            state.trace.begin(HISTOGRAM)
+            return global_strikes_grid_result, build_histogram(histogram_rows, state.time_interval.minutes(),
+                                                               HISTOGRAM_BIN_SIZE)
         return global_strikes_grid_result
 
     def combine_result(self, strike_grid_result, histogram_result, state):
-        combined_result = gatherResults([strike_grid_result, histogram_result], consumeErrors=True)
+        if histogram_result is None:
+            combined_result = strike_grid_result
+        else:
+            combined_result = gatherResults([strike_grid_result, histogram_result], consumeErrors=True)
         combined_result.addCallback(self.build_grid_response, state=state)
-        combined_result.addErrback(log.err)
-
         return combined_result
 
     @staticmethod
     def build_grid_response(results, state):
+        state.trace.begin(BUILD_RESULT)
         state.log_timing('global_strikes_grid.results')
 
         grid_data = results[0]
@@ -192,8 +282,6 @@ class GlobalStrikeGridQuery:
                     't': end_time.strftime("%Y%m%dT%H:%M:%S"),
                     'dt': duration.seconds,
                     'h': histogram_data}
-        state.add_info_text(", total %.03fs" % state.get_seconds())
         state.log_timing('global_strikes_grid.total')
-        print("".join(state.info_text))
 
         return response
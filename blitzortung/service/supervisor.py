@@ -0,0 +1,223 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import os
+import signal
+import socket
+import time
+from typing import Optional
+
+from twisted.application import service
+from twisted.internet import protocol
+from twisted.internet.defer import Deferred, DeferredList, succeed
+from twisted.python import log
+
+LISTEN_FD_VARIABLE = 'BLITZORTUNG_WEBSERVICE_FD'
+WORKER_VARIABLE = 'BLITZORTUNG_WEBSERVICE_WORKER'
+
+
+def create_listening_socket(port: int, interface: str = '127.0.0.1', backlog: int = 511) -> socket.socket:
+    """Create the listening socket which is shared by all worker processes."""
+    listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listening_socket.bind((interface, port))
+    listening_socket.listen(backlog)
+    listening_socket.setblocking(False)
+    return listening_socket
+
+
+def get_worker_index() -> Optional[int]:
+    """Returns the index of the current worker process, None if not running under a supervisor."""
+    worker = os.environ.get(WORKER_VARIABLE)
+    return int(worker) if worker is not None else None
+
+
+def get_listening_fd() -> Optional[int]:
+    """Returns the inherited listening socket of the current worker process, None if not running under a supervisor."""
+    listening_fd = os.environ.get(LISTEN_FD_VARIABLE)
+    return int(listening_fd) if listening_fd is not None else None
+
+
+class AdoptedPortService(service.Service):
+    """Serves a site on a listening socket inherited from the supervisor."""
+
+    def __init__(self, listening_fd: int, factory, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.reactor = reactor
+        self.listening_fd = listening_fd
+        self.factory = factory
+        self.port = None
+
+    def startService(self):
+        super().startService()
+        self.port = self.reactor.adoptStreamPort(self.listening_fd, socket.AF_INET, self.factory)
+
+    def stopService(self):
+        super().stopService()
+        if self.port is not None:
+            port, self.port = self.port, None
+            return port.stopListening()
+        return None
+
+
+class WorkerProcessProtocol(protocol.ProcessProtocol):
+
+    def __init__(self, supervisor: 'WorkerSupervisor', index: int):
+        self.supervisor = supervisor
+        self.index = index
+        self.start_time = time.time()
+        self.ended = Deferred()
+
+    def processEnded(self, reason):
+        self.supervisor.worker_ended(self, reason)
+        self.ended.callback(None)
+
+    def terminate(self):
+        try:
+            self.transport.signalProcess('TERM')
+        except Exception:  # process already gone
+            pass
+
+
+class WorkerSupervisor:
+    """
+    Runs a number of webservice worker processes which share one listening socket.
+
+    Workers which exit unexpectedly are restarted with an increasing delay. A rolling restart replaces one worker
+    at a time. As a replacement uses the cache directory of the worker index, it is started only after the old
+    process has ended and written its cache snapshot; the listening socket stays open in the supervisor, so
+    connections are queued or served by the other workers in the meantime. The next worker is replaced after the
+    replacement had time to start up.
+    """
+
+    RESTART_DELAY = 1  # seconds
+    MAX_RESTART_DELAY = 60  # seconds
+    MIN_UPTIME = 30  # seconds, workers running shorter count as failed start
+    STARTUP_GRACE_PERIOD = 10  # seconds
+
+    def __init__(self, worker_count: int, listening_fd: int, command: list[str], reactor=None, metrics=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.reactor = reactor
+        self.worker_count = worker_count
+        self.listening_fd = listening_fd
+        self.command = command
+        self.metrics = metrics
+        self.workers: dict[int, WorkerProcessProtocol] = {}
+        self.retiring: set[WorkerProcessProtocol] = set()
+        self.failures: dict[int, int] = {}
+        self.restart_count = 0
+        self.stopping = False
+        self.restarting = False
+
+    def start(self) -> None:
+        for index in range(self.worker_count):
+            self.spawn(index)
+
+    def spawn(self, index: int) -> WorkerProcessProtocol:
+        worker = WorkerProcessProtocol(self, index)
+        environment = dict(os.environ)
+        environment[LISTEN_FD_VARIABLE] = str(self.listening_fd)
+        environment[WORKER_VARIABLE] = str(index)
+        self.reactor.spawnProcess(worker, self.command[0], self.command, env=environment,
+                                  childFDs={0: 0, 1: 1, 2: 2, self.listening_fd: self.listening_fd})
+        self.workers[index] = worker
+        log.msg(f"supervisor: started worker {index}")
+        return worker
+
+    def worker_ended(self, worker: WorkerProcessProtocol, reason) -> None:
+        if worker in self.retiring:
+            self.retiring.discard(worker)
+            if self.workers.get(worker.index) is worker:
+                del self.workers[worker.index]
+            log.msg(f"supervisor: retired worker {worker.index}")
+            return
+        if self.workers.get(worker.index) is not worker:
+            return
+        del self.workers[worker.index]
+        if self.stopping:
+            return
+
+        if time.time() - worker.start_time < self.MIN_UPTIME:
+            self.failures[worker.index] = self.failures.get(worker.index, 0) + 1
+        else:
+            self.failures[worker.index] = 0
+        delay = min(self.MAX_RESTART_DELAY, self.RESTART_DELAY * 2 ** self.failures[worker.index])
+        log.msg(f"supervisor: worker {worker.index} ended ({reason.value}), restarting in {delay}s")
+        self.restart_count += 1
+        self.reactor.callLater(delay, self.respawn, worker.index)
+
+    def respawn(self, index: int) -> None:
+        if not self.stopping and index not in self.workers:
+            self.spawn(index)
+
+    def restart(self) -> Deferred:
+        """Replace all workers one after the other."""
+        if self.restarting or self.stopping:
+            return succeed(None)
+        self.restarting = True
+        log.msg("supervisor: rolling restart")
+
+        result = succeed(None)
+        for index in sorted(self.workers):
+            result.addCallback(lambda _, index=index: self.replace(index))
+        result.addBoth(self.__restart_finished)
+        return result
+
+    def replace(self, index: int) -> Deferred:
+        old_worker = self.workers.get(index)
+        self.restart_count += 1
+        if old_worker is None:
+            self.spawn(index)
+            return succeed(None)
+        self.retiring.add(old_worker)
+
+        replaced = Deferred()
+
+        def started():
+            if not self.stopping and index not in self.workers:
+                self.spawn(index)
+                self.reactor.callLater(self.STARTUP_GRACE_PERIOD, replaced.callback, None)
+            else:
+                replaced.callback(None)
+
+        old_worker.ended.addCallback(lambda _: started())
+        old_worker.terminate()
+        return replaced
+
+    def __restart_finished(self, result):
+        self.restarting = False
+        return result
+
+    def stop(self) -> Deferred:
+        """Terminate all workers, the result fires when all of them have ended."""
+        self.stopping = True
+        workers = list(self.workers.values()) + list(self.retiring)
+        for worker in workers:
+            worker.terminate()
+        return DeferredList([worker.ended for worker in workers])
+
+    def report_metrics(self) -> None:
+        if self.metrics is not None:
+            self.metrics.for_supervisor(len(self.workers), self.restart_count)
+
+    def install_signal_handlers(self) -> None:
+        signal.signal(signal.SIGHUP, lambda *_: self.reactor.callFromThread(self.restart))
@@ -0,0 +1,168 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import bisect
+import random
+import time
+from typing import Optional
+
+VALIDATION = 'validation'
+CACHE_LOOKUP = 'cache_lookup'
+CACHE_WAIT = 'cache_wait'
+REQUEST_LOG = 'request_log'
+DB_WAIT = 'db_wait'
+DB_EXECUTION = 'db_execution'
+STRIKE_BUFFER = 'strike_buffer'
+BUILD_RESULT = 'build_result'
+HISTOGRAM = 'histogram'
+SERIALIZATION = 'serialization'
+TOTAL = 'total'
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+PERCENTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+
+class LatencyHistogram:
+    """Counts latencies in buckets with fixed upper bounds in milliseconds, the last bucket is unbounded."""
+    __slots__ = ['counts', 'count', 'max_ms']
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.max_ms = 0.0
+
+    def add(self, seconds: float) -> None:
+        milliseconds = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, milliseconds)] += 1
+        self.count += 1
+        self.max_ms = max(self.max_ms, milliseconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket containing the given fraction of latencies, the maximum for the last one."""
+        rank = fraction * self.count
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            if count and total >= rank:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def get_statistics(self) -> dict:
+        statistics = {name: self.percentile(fraction) for name, fraction in PERCENTILES}
+        statistics['count'] = self.count
+        statistics['max'] = round(self.max_ms, 3)
+        return statistics
+
+
+class Trace:
+    """
+    Time spent per stage of one request or cache fill.
+
+    Stages follow each other, beginning a stage ends the current one. Repeated stages add up.
+    """
+    __slots__ = ['name', 'clock', 'start_time', 'stage', 'stage_start', 'durations', 'attributes', 'sampled']
+
+    def __init__(self, name: str, clock=time.perf_counter, sampled: bool = False, **attributes):
+        self.name = name
+        self.clock = clock
+        self.start_time = clock()
+        self.stage: Optional[str] = None
+        self.stage_start = self.start_time
+        self.durations: dict[str, float] = {}
+        self.attributes = attributes
+        self.sampled = sampled
+
+    def begin(self, stage: str) -> None:
+        now = self.clock()
+        self.end(now)
+        self.stage = stage
+        self.stage_start = now
+
+    def enter(self, result, stage: str):
+        """Begin a stage as callback of a Deferred, the result is passed through."""
+        self.begin(stage)
+        return result
+
+    def end(self, now: Optional[float] = None) -> None:
+        if self.stage is None:
+            return
+        now = self.clock() if now is None else now
+        self.add(self.stage, now - self.stage_start)
+        self.stage = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def get_total(self) -> float:
+        return self.clock() - self.start_time
+
+
+class Tracer:
+    """
+    Aggregates finished traces into latency histograms per trace name and stage.
+
+    A sample of the traces is appended to the trace log, which writes them from a background thread.
+    """
+
+    SAMPLE_RATE = 0.01
+
+    def __init__(self, trace_log=None, sample_rate: float = SAMPLE_RATE, clock=time.perf_counter,
+                 sample=random.random):
+        self.trace_log = trace_log
+        self.sample_rate = sample_rate
+        self.clock = clock
+        self.sample = sample
+        self.histograms: dict[str, dict[str, LatencyHistogram]] = {}
+
+    def start(self, name: str, **attributes) -> Trace:
+        sampled = self.trace_log is not None and self.sample() < self.sample_rate
+        return Trace(name, self.clock, sampled, **attributes)
+
+    def finish(self, result, trace: Trace):
+        """Record the trace, usable as callback of a Deferred, the result is passed through."""
+        total = trace.get_total()
+        trace.end()
+        histograms = self.histograms.get(trace.name)
+        if histograms is None:
+            histograms = self.histograms[trace.name] = {}
+        for stage, seconds in trace.durations.items():
+            self.histogram(histograms, stage).add(seconds)
+        self.histogram(histograms, TOTAL).add(total)
+
+        if trace.sampled:
+            self.trace_log.append('trace', trace.name, round(total * 1000000),
+                                  {stage: round(seconds * 1000000) for stage, seconds in trace.durations.items()},
+                                  trace.attributes)
+        return result
+
+    @staticmethod
+    def histogram(histograms: dict[str, LatencyHistogram], stage: str) -> LatencyHistogram:
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = LatencyHistogram()
+        return histogram
+
+    def get_statistics(self, reset: bool = False) -> dict[str, dict[str, dict]]:
+        """Latency percentiles in milliseconds per trace name and stage, optionally starting new histograms."""
+        statistics = {name: {stage: histogram.get_statistics() for stage, histogram in histograms.items()}
+                      for name, histograms in self.histograms.items()}
+        if reset:
+            self.histograms = {}
+        return statistics
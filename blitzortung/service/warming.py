@@ -0,0 +1,136 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2025 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import heapq
+import time
+from typing import Optional
+
+from twisted.internet.defer import maybeDeferred, succeed
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+
+from ..cache import ObjectCache
+
+
+class CacheWarmer:
+    """
+    Refreshes the most popular cache entries shortly before they expire.
+
+    Accesses are counted per cache key with an exponential decay, so that the scores follow the recent
+    popularity of a key. Refreshed results replace the cached entry only once they are complete, until then
+    clients are served from the previous entry.
+
+    Query intervals are aligned to the given period, an entry is refreshed only after a new period has begun since
+    it was created, as a refresh within the same period would compute the same interval again. Keys kept up to date
+    elsewhere, e.g. by the grid precomputer, can be ignored.
+    """
+
+    REFRESH_INTERVAL = 2  # seconds
+    DECAY_HALF_LIFE = 60  # seconds
+    MIN_SCORE = 0.1
+
+    def __init__(self, caches: list[ObjectCache], top_key_count=20, max_concurrency=2, lead_seconds=4,
+                 min_score=2.0, alignment=1, ignored_keys=frozenset()):
+        self.top_key_count = top_key_count
+        self.max_concurrency = max_concurrency
+        self.lead_seconds = lead_seconds
+        self.min_score = min_score
+        self.alignment = alignment
+        self.ignored_keys = ignored_keys
+        self.scores: dict[tuple, float] = {}
+        self.cache_of_key: dict[tuple, ObjectCache] = {}
+        self.in_flight: set[tuple] = set()
+        self.refresh_count = 0
+        self.last_decay = time.time()
+        self.looping_call: Optional[LoopingCall] = None
+
+        for cache in caches:
+            cache.access_listener = self.record_access
+
+    def record_access(self, cache: ObjectCache, cache_key: tuple) -> None:
+        if cache_key in self.ignored_keys:
+            return
+        self.scores[cache_key] = self.scores.get(cache_key, 0.0) + 1.0
+        self.cache_of_key[cache_key] = cache
+
+    def start(self):
+        self.looping_call = LoopingCall(self.tick)
+        self.looping_call.start(self.REFRESH_INTERVAL, now=False)
+
+    def stop(self):
+        if self.looping_call is not None and self.looping_call.running:
+            self.looping_call.stop()
+
+    def tick(self, current_time: Optional[float] = None) -> None:
+        now = time.time() if current_time is None else current_time
+        self.decay(now)
+
+        candidates = heapq.nlargest(self.top_key_count, self.scores.items(), key=lambda item: item[1])
+        for cache_key, score in candidates:
+            if len(self.in_flight) >= self.max_concurrency:
+                break
+            if score < self.min_score or cache_key in self.in_flight:
+                continue
+            cache = self.cache_of_key[cache_key]
+            if self.needs_refresh(cache, cache_key, now):
+                self.refresh(cache, cache_key)
+
+    def decay(self, now: float) -> None:
+        factor = 0.5 ** ((now - self.last_decay) / self.DECAY_HALF_LIFE)
+        self.last_decay = now
+        for cache_key in list(self.scores):
+            score = self.scores[cache_key] * factor
+            if score < self.MIN_SCORE:
+                del self.scores[cache_key]
+                del self.cache_of_key[cache_key]
+            else:
+                self.scores[cache_key] = score
+
+    def needs_refresh(self, cache: ObjectCache, cache_key: tuple, now: float) -> bool:
+        entry = cache.cache.get(cache_key)
+        if entry is None:
+            return False
+        payload = entry.peek_payload()
+        if not getattr(payload, 'called', True):
+            return False
+        expiry_time = entry.get_expiry_time()
+        if expiry_time - now > self.lead_seconds:
+            return False
+        creation_time = expiry_time - cache.get_time_to_live()
+        return now // self.alignment > creation_time // self.alignment
+
+    def refresh(self, cache: ObjectCache, cache_key: tuple) -> None:
+        cached_object_creator, args, kwargs = cache.split_cache_key(cache_key)
+        self.in_flight.add(cache_key)
+        self.refresh_count += 1
+
+        result = maybeDeferred(cached_object_creator, *args, **kwargs)
+        result.addCallback(self.__update_entry, cache, cache_key)
+        result.addErrback(log.err)
+        result.addBoth(self.__finished, cache_key)
+
+    @staticmethod
+    def __update_entry(result, cache: ObjectCache, cache_key: tuple):
+        if result is not None and cache_key in cache.cache:
+            cache.put(cache_key, succeed(result), int(time.time()) + cache.get_time_to_live())
+        return result
+
+    def __finished(self, _, cache_key: tuple) -> None:
+        self.in_flight.discard(cache_key)
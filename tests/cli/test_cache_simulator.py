@@ -0,0 +1,152 @@
+"""Tests for blitzortung.cli.cache_simulator module."""
+
+import json
+import os
+import tempfile
+
+import pytest
+from assertpy import assert_that
+
+from blitzortung.cli.cache_simulator import CacheSimulator, RecordedRequest, read_minute_log, read_service_log
+
+TIMESTAMP = 1704067200
+
+
+def regional_request(timestamp, grid_baselength=10000, minute_offset=0, minute_length=60):
+    return RecordedRequest(timestamp, minute_length, grid_baselength, minute_offset, 1, 0)
+
+
+class TestLogReaders:
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            yield tmpdir
+
+    def test_read_minute_log(self, temp_dir):
+        file_name = os.path.join(temp_dir, "log.json")
+        with open(file_name, 'w') as json_file:
+            json.dump({'timestamp': TIMESTAMP * 1000000, 'get_strikes_grid': [
+                [TIMESTAMP * 1000000, 60, 10000, 0, 1, 0, "1.2.3.4", "bo-android-200"],
+                [TIMESTAMP * 1000000 + 500000, 30, 5000, -10, -1, 1, "1.2.3.5", "bo-android-200", 10, 20, 5],
+            ]}, json_file)
+
+        requests = read_minute_log(file_name)
+
+        assert_that(requests).is_equal_to([
+            RecordedRequest(TIMESTAMP, 60, 10000, 0, 1, 0),
+            RecordedRequest(TIMESTAMP + 0.5, 30, 5000, -10, -1, 1, 10, 20, 5),
+        ])
+
+    def test_read_service_log(self, temp_dir):
+        file_name = os.path.join(temp_dir, "servicelog_2024-01-01")
+        with open(file_name, 'w') as service_log:
+            service_log.write("1704067200.0000\t1\t10000\t0\t60\t0\t-\tDE\tBerlin\t200\t-\t-\t-\n")
+            service_log.write("1704067201.5000\t-1\t5000\t-10\t30\t1\t-\t-\t-\t-\t10\t20\t5\n")
+
+        requests = read_service_log(file_name)
+
+        assert_that(requests).is_equal_to([
+            RecordedRequest(TIMESTAMP, 60, 10000, 0, 1, 0),
+            RecordedRequest(TIMESTAMP + 1.5, 30, 5000, -10, -1, 1, 10, 20, 5),
+        ])
+
+
+class TestCacheSimulator:
+
+    def test_repeated_requests_hit_within_ttl(self):
+        simulator = CacheSimulator()
+
+        simulator.simulate([regional_request(TIMESTAMP + offset) for offset in (0, 5, 10, 25)])
+
+        result = simulator.report()['strikes_grid']
+        assert_that(result['requests']).is_equal_to(4)
+        assert_that(result['hits']).is_equal_to(2)
+        assert_that(result['ratio']).is_equal_to(0.5)
+        assert_that(result['db_queries']).is_equal_to(2)
+        assert_that(result['db_queries_saved']).is_equal_to(2)
+
+    def test_longer_ttl_increases_hits(self):
+        simulator = CacheSimulator(ttl_current=60)
+
+        simulator.simulate([regional_request(TIMESTAMP + offset) for offset in (0, 5, 10, 25)])
+
+        assert_that(simulator.report()['strikes_grid']['hits']).is_equal_to(3)
+
+    def test_history_requests_use_history_cache(self):
+        simulator = CacheSimulator()
+
+        simulator.simulate([regional_request(TIMESTAMP, minute_offset=-30, minute_length=10)])
+
+        report = simulator.report()
+        assert_that(report['strikes_history_grid']['requests']).is_equal_to(1)
+        assert_that(report['strikes_history_grid']['db_queries']).is_equal_to(1)
+        assert_that(report['strikes_grid']['requests']).is_equal_to(0)
+
+    def test_disk_store_serves_history_results_of_same_aligned_interval(self):
+        simulator = CacheSimulator(ttl_history=20, disk_store=True)
+
+        simulator.simulate([regional_request(TIMESTAMP + offset, minute_offset=-30, minute_length=10)
+                            for offset in (0, 30, 61)])
+
+        result = simulator.report()['strikes_history_grid']
+        assert_that(result['hits']).is_equal_to(0)
+        assert_that(result['disk_hits']).is_equal_to(1)
+        assert_that(result['db_queries']).is_equal_to(2)
+        assert_that(result['ratio']).is_equal_to(1 / 3)
+
+    def test_without_disk_store_history_misses_query_database(self):
+        simulator = CacheSimulator(ttl_history=20)
+
+        simulator.simulate([regional_request(TIMESTAMP + offset, minute_offset=-30, minute_length=10)
+                            for offset in (0, 30, 61)])
+
+        assert_that(simulator.report()['strikes_history_grid']['db_queries']).is_equal_to(3)
+
+    def test_clamped_parameters_share_entries(self):
+        simulator = CacheSimulator()
+
+        simulator.simulate([
+            RecordedRequest(TIMESTAMP, 60, 1000, 0, 0, 0),
+            RecordedRequest(TIMESTAMP + 1, 60, 10000, 0, 0, -5),
+        ])
+
+        assert_that(simulator.report()['global_strikes_grid']['hits']).is_equal_to(1)
+
+    def test_base_length_normalization(self):
+        requests = [regional_request(TIMESTAMP, 10000), regional_request(TIMESTAMP + 1, 9000)]
+
+        plain = CacheSimulator()
+        plain.simulate(requests)
+        normalized = CacheSimulator(base_lengths=[5000, 10000, 20000])
+        normalized.simulate(requests)
+
+        assert_that(plain.report()['total']['hits']).is_equal_to(0)
+        assert_that(normalized.report()['total']['hits']).is_equal_to(1)
+
+    @pytest.mark.parametrize("eviction,hits", [('lru', 1), ('fifo', 0)])
+    def test_eviction_policy(self, eviction, hits):
+        simulator = CacheSimulator(local_size_current=2, eviction=eviction)
+
+        simulator.simulate([
+            RecordedRequest(TIMESTAMP + offset, 60, 10000, 0, -1, 0, x, 0, 5)
+            for offset, x in enumerate((1, 2, 1, 3, 1))
+        ])
+
+        assert_that(simulator.report()['local_strikes_grid']['hits']).is_equal_to(hits + 1)
+
+    def test_peak_memory(self):
+        simulator = CacheSimulator(entry_bytes=1000)
+
+        simulator.simulate([regional_request(TIMESTAMP, grid_baselength) for grid_baselength in (10000, 20000)])
+
+        total = simulator.report()['total']
+        assert_that(total['peak_size']).is_equal_to(2)
+        assert_that(total['peak_bytes']).is_equal_to(2000)
+
+    def test_expired_entries_are_cleaned_up(self):
+        simulator = CacheSimulator()
+
+        simulator.simulate([regional_request(TIMESTAMP), regional_request(TIMESTAMP + 400, 20000)])
+
+        assert_that(simulator.caches['strikes_grid'].get_size()).is_equal_to(1)
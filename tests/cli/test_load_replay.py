@@ -0,0 +1,175 @@
+"""Tests for blitzortung.cli.load_replay module."""
+
+import datetime
+import gzip
+import json
+
+import pytest
+from assertpy import assert_that
+from twisted.internet import task
+
+from blitzortung.cli.cache_simulator import GLOBAL_REGION, LOCAL_REGION, RecordedRequest
+from blitzortung.cli.load_replay import FakeConnectionPool, LoadReplay, create_replay_request, create_service, \
+    is_fault, percentile, synthetic_requests
+from blitzortung.service.admission import AdmissionControl
+from blitzortung.service.base import Blitzortung
+from blitzortung.service.cache import ServiceCache
+
+END_TIME = datetime.datetime(2025, 1, 1, 12, 0, tzinfo=datetime.UTC)
+
+
+class TestFakeConnectionPool:
+
+    def test_grid_rows(self):
+        uut = FakeConnectionPool(cell_count=10, seed=1)
+
+        rows = uut.runQuery("SELECT ... GROUP BY rx, ry", {
+            'start_time': END_TIME - datetime.timedelta(hours=1), 'end_time': END_TIME}).result
+
+        assert_that(rows).is_length(10)
+        assert_that(all(END_TIME - datetime.timedelta(hours=1) <= row['timestamp'] <= END_TIME for row in rows)).is_true()
+        assert_that(uut.query_count).is_equal_to(1)
+
+    def test_combined_histogram_rows(self):
+        uut = FakeConnectionPool(cell_count=10, seed=1)
+
+        rows = uut.runQuery("SELECT ... GROUP BY GROUPING SETS ((rx, ry), (\"interval\"))", {
+            'start_time': END_TIME - datetime.timedelta(hours=1), 'end_time': END_TIME, 'binsize': 5}).result
+
+        assert_that([row for row in rows if row['interval'] is not None]).is_length(12)
+
+    def test_latency(self):
+        clock = task.Clock()
+        uut = FakeConnectionPool(latency=0.1, cell_count=1, clock=clock)
+
+        result = uut.runQuery("", {'end_time': END_TIME})
+
+        assert_that(result.called).is_false()
+        clock.advance(0.1)
+        assert_that(result.called).is_true()
+
+
+class TestReplayRequest:
+
+    def test_headers(self):
+        uut = create_replay_request(RecordedRequest(0.0, 60, 10000, 0, 1, 0), '10.0.0.1')
+
+        assert_that(uut.method).is_equal_to(b'POST')
+        assert_that(uut.getHeader('User-Agent')).is_equal_to('bo-android-200')
+        assert_that(uut.getHeader('content-type')).is_equal_to('text/json')
+        assert_that(uut.getHeader('Accept-Encoding')).is_equal_to('gzip')
+        assert_that(uut.getHeader('referer')).is_none()
+        assert_that(uut.getClientIP()).is_equal_to('10.0.0.1')
+
+    @pytest.mark.parametrize("request_,method,params", [
+        (RecordedRequest(0.0, 60, 10000, -30, 1, 0), 'get_strikes_grid', [60, 10000, -30, 1, 0]),
+        (RecordedRequest(0.0, 60, 20000, 0, GLOBAL_REGION, 0), 'get_global_strikes_grid', [60, 20000, 0, 0]),
+        (RecordedRequest(0.0, 60, 10000, 0, LOCAL_REGION, 0, 2, 10, 5), 'get_local_strikes_grid',
+         [2, 10, 10000, 60, 0, 0, 5]),
+    ])
+    def test_json_rpc_call(self, request_, method, params):
+        uut = create_replay_request(request_, '10.0.0.1', id=7)
+
+        assert_that(json.loads(uut.content.getvalue())).is_equal_to({'id': 7, 'method': method, 'params': params})
+
+    def test_rendered_response(self):
+        uut = create_replay_request(RecordedRequest(0.0, 60, 10000, 0, 1, 0), '10.0.0.1')
+
+        create_service(FakeConnectionPool(cell_count=200, seed=1)).render(uut)
+
+        assert_that(uut.finished).is_true()
+        assert_that(uut.responseHeaders.getRawHeaders('etag')).is_not_none()
+        assert_that(uut.responseHeaders.getRawHeaders('content-encoding')).is_equal_to(['gzip'])
+        assert_that(json.loads(gzip.decompress(b''.join(uut.written)))['result']).contains_key('r')
+        assert_that(is_fault(uut)).is_false()
+
+    def test_fault_response(self):
+        uut = create_replay_request(RecordedRequest(0.0, 60, 10000, 0, 1, 0), '10.0.0.1')
+        uut.content.write(b'{"id": 1, "method": "unknown", "params": []}')
+        uut.content.truncate()
+
+        create_service(FakeConnectionPool()).render(uut)
+
+        assert_that(is_fault(uut)).is_true()
+
+
+class TestSyntheticRequests:
+
+    def test_profile(self):
+        requests = synthetic_requests(100, 10.0, seed=1)
+
+        assert_that(requests).is_length(100)
+        assert_that(requests[10][0].timestamp).is_equal_to(1.0)
+        assert_that({request.region for request, _ in requests}).contains(LOCAL_REGION, 1)
+
+
+class TestPercentile:
+
+    @pytest.mark.parametrize("fraction,expected", [(0.5, 51), (0.95, 96), (0.99, 100)])
+    def test_percentile(self, fraction, expected):
+        assert_that(percentile(list(range(100, 0, -1)), fraction)).is_equal_to(expected)
+
+    def test_empty(self):
+        assert_that(percentile([], 0.5)).is_equal_to(0.0)
+
+
+class TestLoadReplay:
+
+    @pytest.fixture
+    def clock(self):
+        return task.Clock()
+
+    @pytest.fixture
+    def requests(self):
+        return [
+            RecordedRequest(0.0, 60, 10000, 0, 1, 0),
+            RecordedRequest(1.0, 60, 10000, 0, 1, 0),
+            RecordedRequest(2.0, 60, 20000, 0, GLOBAL_REGION, 0),
+            RecordedRequest(3.0, 60, 10000, 0, LOCAL_REGION, 0, 2, 10, 5),
+        ]
+
+    def test_replay_as_fast_as_possible(self, clock, requests):
+        connection_pool = FakeConnectionPool(cell_count=20, seed=1)
+        uut = LoadReplay(create_service(connection_pool), concurrency=2, clock=clock)
+
+        report = uut.run(requests).result
+
+        assert_that(report['requests']).is_equal_to(4)
+        assert_that(report['failures']).is_equal_to(0)
+        assert_that(report['cache_ratios']['strikes_grid']).is_equal_to(0.5)
+        assert_that(connection_pool.query_count).is_equal_to(3)
+        assert_that(report['p99']).is_greater_than_or_equal_to(report['p50'])
+        assert_that(report['stages']['strikes_grid']['db_execution']['count']).is_equal_to(1)
+
+    def test_replay_in_recorded_time(self, clock, requests):
+        connection_pool = FakeConnectionPool(latency=0.5, cell_count=20, seed=1, clock=clock)
+        uut = LoadReplay(create_service(connection_pool), speed=2.0, clock=clock)
+
+        result = uut.run(requests)
+        clock.pump([0.5, 0.5])
+        assert_that(uut.outstanding).is_equal_to(2)
+        clock.pump([0.5] * 4)
+
+        assert_that(result.result['requests']).is_equal_to(4)
+
+    def test_many_synchronous_requests(self, clock):
+        uut = LoadReplay(create_service(FakeConnectionPool(cell_count=1, seed=1)), concurrency=5, clock=clock)
+
+        report = uut.run([RecordedRequest(0.0, 60, 10000, 0, 1, 0)] * 2000).result
+
+        assert_that(report['requests']).is_equal_to(2000)
+
+    def test_count_rejected_requests_as_failures(self, clock):
+        service = Blitzortung(FakeConnectionPool(cell_count=1, seed=1), None, cache=ServiceCache(),
+                              forbidden_ips=set(), admission=AdmissionControl(rate=1e-9, burst=1))
+        uut = LoadReplay(service, clock=clock)
+
+        report = uut.run([RecordedRequest(0.0, 60, 10000, 0, 1, 0)] * 3).result
+
+        assert_that(report['requests']).is_equal_to(3)
+        assert_that(report['failures']).is_equal_to(2)
+
+    def test_empty(self, clock):
+        uut = LoadReplay(create_service(FakeConnectionPool()), clock=clock)
+
+        assert_that(uut.run([]).result['requests']).is_equal_to(0)
@@ -383,3 +383,26 @@ class TestGridQuery:
         wkb = parameters["envelope"].adapted
         envelope = shapely.wkb.loads(wkb)
         assert_that(envelope.bounds).is_equal_to((-10, 15, 20, 35))
+
+    def test_with_histogram(self):
+        raster = blitzortung.geom.Grid(-10, 20, 15, 35, 1.5, 1)
+
+        query = blitzortung.db.query.GridQuery(raster, count_threshold=2, histogram_binsize=5)
+        query.set_table_name("strikes")
+
+        expected_query = (
+            'SELECT rx, ry, "interval", count(*) AS strike_count, max("timestamp") as "timestamp" '
+            "FROM (SELECT "
+            "TRUNC((ST_X(ST_Transform(geog::geometry, %(srid)s)) - %(xmin)s) "
+            "/ %(xdiv)s)::integer AS rx, "
+            "TRUNC((ST_Y(ST_Transform(geog::geometry, %(srid)s)) - %(ymin)s) "
+            "/ %(ydiv)s)::integer AS ry, "
+            '-extract(epoch from %(end_time)s - "timestamp")::int/60/%(binsize)s AS "interval", '
+            '"timestamp" '
+            "FROM strikes "
+            "WHERE ST_GeomFromWKB(%(envelope)s, %(envelope_srid)s) && geog) AS cells "
+            'GROUP BY GROUPING SETS ((rx, ry), ("interval")) '
+            "HAVING (GROUPING(rx, ry) <> 0 OR count(*) > %(count_threshold)s)"
+        )
+        assert_that(str(query)).is_equal_to(expected_query)
+        assert_that(query.get_parameters()["binsize"]).is_equal_to(5)
@@ -28,3 +28,15 @@ def test_local_grid(data_area, x, y, ref_lon, ref_lat, center, extension):
     assert grid.x_max == pytest.approx(ref_lon + 3 * data_area + extension, rel=0.01)
     assert grid.y_min == ref_lat
     assert grid.y_max == pytest.approx(ref_lat + 3 * data_area, rel=0.1)
+
+
+@pytest.mark.parametrize("data_area,x,y,expected", [
+    (5, 6, 9, True),
+    (5, -35, -17, True),
+    (5, -36, 9, False),
+    (5, 6, 19, False),
+    (10, 18, 0, True),
+    (10, 19, 0, False),
+])
+def test_local_grid_is_on_globe(data_area, x, y, expected):
+    assert LocalGrid(data_area, x, y).is_on_globe() == expected
@@ -0,0 +1,98 @@
+import json
+import os
+import queue
+
+import pytest
+from assertpy import assert_that
+
+from blitzortung.cli.cache_simulator import read_minute_log
+from blitzortung.service.access_log import AccessLog
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 1735732800.5  # 2025-01-01 12:00:00.5 UTC
+
+    def __call__(self):
+        return self.time
+
+
+class TestAccessLog:
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def uut(self, tmp_path, clock):
+        access_log = AccessLog(str(tmp_path), '-1', max_entries=2, clock=clock)
+        yield access_log
+        access_log.stop()
+
+    def read_file(self, tmp_path, name):
+        with open(os.path.join(str(tmp_path), name)) as log_file:
+            return json.load(log_file)
+
+    def test_period_of(self):
+        assert_that(AccessLog.period_of(1735732859.9)).is_equal_to(1735732800)
+
+    def test_append_adds_timestamp(self, uut):
+        assert_that(uut.append('get_strikes_grid', 60, 10000)).is_true()
+
+        assert_that(uut.current_data['get_strikes_grid']).is_equal_to([(1735732800500000, 60, 10000)])
+
+    def test_entries_beyond_limit_are_counted(self, uut):
+        results = [uut.append('get_strikes_grid', index) for index in range(3)]
+
+        assert_that(results).is_equal_to([True, True, False])
+        assert_that(uut.current_data['get_strikes_grid']).is_length(2)
+        assert_that(uut.dropped['get_strikes_grid']).is_equal_to(1)
+
+    def test_period_change_writes_file(self, uut, clock, tmp_path):
+        for index in range(3):
+            uut.append('get_strikes_grid', 60, 10000, 0, 1, 0, '192.168.1.1', 'bo-android-150')
+        clock.time += 60
+        uut.append('get_strikes_grid', 60, 10000, 0, 1, 0, '192.168.1.2', 'bo-android-150')
+        uut.stop()
+
+        data = self.read_file(tmp_path, '20250101-1200-1.json')
+        assert_that(data['timestamp']).is_equal_to(1735732800000000)
+        assert_that(data['get_strikes_grid']).is_length(2)
+        assert_that(data['dropped']).is_equal_to({'get_strikes_grid': 1})
+        assert_that(self.read_file(tmp_path, '20250101-1201-1.json')['get_strikes_grid']).is_length(1)
+
+    def test_written_file_is_readable_by_simulator(self, uut, clock, tmp_path):
+        uut.append('get_strikes_grid', 60, 10000, 0, 1, 0, '192.168.1.1', 'bo-android-150')
+        uut.stop()
+
+        requests = list(read_minute_log(str(tmp_path / '20250101-1200-1.json')))
+
+        assert_that(requests).is_length(1)
+        assert_that(requests[0].minute_length).is_equal_to(60)
+
+    def test_period_is_dropped_when_writer_is_busy(self, uut, clock):
+        uut.pending = queue.Queue(1)
+        uut.pending.put((0, {}))
+        uut.start = lambda: None
+        uut.append('get_strikes_grid', 60)
+        clock.time += 60
+        uut.append('get_strikes_grid', 60)
+
+        assert_that(uut.pending.qsize()).is_equal_to(1)
+        assert_that(uut.current_data['get_strikes_grid']).is_length(1)
+
+    def test_without_log_directory_nothing_is_written(self, clock):
+        uut = AccessLog(None, clock=clock)
+        uut.append('get_strikes_grid', 60)
+        clock.time += 60
+        uut.append('get_strikes_grid', 60)
+
+        assert_that(uut.thread).is_none()
+        assert_that(uut.current_data['get_strikes_grid']).is_length(1)
+
+    def test_write_errors_are_logged(self, tmp_path):
+        uut = AccessLog(str(tmp_path / 'missing'))
+
+        uut.write(1735732800, {'timestamp': 0})
+
+        assert_that(os.path.exists(str(tmp_path / 'missing'))).is_false()
@@ -0,0 +1,120 @@
+import pytest
+from assertpy import assert_that
+
+from blitzortung.service.admission import AdmissionControl, PrefixTrie, TokenBucket, BLOCKED, BANNED, RATE_LIMITED
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+class TestTokenBucket:
+
+    def test_take_until_empty(self):
+        bucket = TokenBucket(2, 0.0)
+
+        assert_that([bucket.take(1.0, 2, 0.0) for _ in range(3)]).is_equal_to([True, True, False])
+
+    def test_refill(self):
+        bucket = TokenBucket(0, 0.0)
+
+        assert_that(bucket.take(0.5, 2, 1.0)).is_false()
+        assert_that(bucket.take(0.5, 2, 2.0)).is_true()
+
+    def test_refill_is_limited_to_burst(self):
+        bucket = TokenBucket(0, 0.0)
+        bucket.take(1.0, 2, 100.0)
+
+        assert_that(bucket.tokens).is_equal_to(1.0)
+
+
+class TestPrefixTrie:
+
+    @pytest.fixture
+    def uut(self):
+        return PrefixTrie(['10.0.0.0/8', '192.168.1.16/28', '2001:db8::/32', '203.0.113.7'])
+
+    @pytest.mark.parametrize("address,expected", [
+        ('10.1.2.3', True), ('11.0.0.1', False), ('192.168.1.20', True), ('192.168.1.32', False),
+        ('2001:db8::1', True), ('2001:db9::1', False), ('203.0.113.7', True), ('203.0.113.8', False),
+    ])
+    def test_contains(self, uut, address, expected):
+        assert_that(uut.contains(address)).is_equal_to(expected)
+
+    def test_shorter_prefix_covers_longer(self):
+        uut = PrefixTrie(['10.1.0.0/16', '10.0.0.0/8'])
+
+        assert_that(uut.contains('10.2.0.1')).is_true()
+
+    def test_empty(self):
+        assert_that(PrefixTrie().contains('127.0.0.1')).is_false()
+
+
+class TestAdmissionControl:
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def uut(self, clock):
+        return AdmissionControl(rate=1.0, burst=3, ban_threshold=3, ban_seconds=60, blocklist=['10.0.0.0/8'],
+                                clock=clock)
+
+    def test_admits_within_budget(self, uut):
+        assert_that([uut.check('1.2.3.4', 'agent') for _ in range(3)]).is_equal_to([None, None, None])
+
+    def test_rate_limits_over_budget(self, uut):
+        for _ in range(3):
+            uut.check('1.2.3.4', 'agent')
+
+        assert_that(uut.check('1.2.3.4', 'agent')).is_equal_to(RATE_LIMITED)
+
+    def test_clients_have_separate_budgets(self, uut):
+        for _ in range(3):
+            uut.check('1.2.3.4', 'agent')
+
+        assert_that(uut.check('1.2.3.5', 'agent')).is_none()
+        assert_that(uut.check('1.2.3.4', 'other agent')).is_none()
+
+    def test_ipv6_clients_are_keyed_by_prefix(self, uut):
+        for _ in range(3):
+            uut.check('2001:db8::1', 'agent')
+
+        assert_that(uut.check('2001:db8::2', 'agent')).is_equal_to(RATE_LIMITED)
+
+    def test_blocklist(self, uut):
+        assert_that(uut.check('10.1.2.3', 'agent')).is_equal_to(BLOCKED)
+
+    def test_invalid_client(self, uut):
+        assert_that(uut.check(None, 'agent')).is_equal_to(BLOCKED)
+
+    def test_temporary_ban(self, uut, clock):
+        for _ in range(6):
+            uut.check('1.2.3.4', 'agent')
+
+        clock.time += 30
+        assert_that(uut.check('1.2.3.4', 'agent')).is_equal_to(BANNED)
+        assert_that(uut.get_banned_clients()).is_equal_to([('1.2.3.4/32', 'agent')])
+
+        clock.time += 31
+        assert_that(uut.check('1.2.3.4', 'agent')).is_none()
+
+    def test_cleanup_drops_idle_buckets(self, uut, clock):
+        uut.check('1.2.3.4', 'agent')
+
+        clock.time += uut.CLEANUP_PERIOD + 1
+        uut.check('1.2.3.5', 'agent')
+
+        assert_that(uut.buckets).is_length(1)
+
+    def test_rate_limiting_is_disabled_by_default(self, clock):
+        uut = AdmissionControl(blocklist=['10.0.0.0/8'], clock=clock)
+
+        assert_that([uut.check('1.2.3.4', 'agent') for _ in range(100)]).is_equal_to([None] * 100)
+        assert_that(uut.check('10.1.2.3', 'agent')).is_equal_to(BLOCKED)
+        assert_that(uut.buckets).is_empty()
@@ -1,14 +1,27 @@
 """Tests for blitzortung.service.base module."""
 
-import datetime
+import json
 import time
-from io import StringIO
+from io import BytesIO, StringIO
 from unittest.mock import Mock, MagicMock, patch, call
 
 import pytest
 from assertpy import assert_that
 
+from blitzortung.service.access_log import AccessLog
+from blitzortung.service.admission import REJECTED_FAULT_CODE
 from blitzortung.service.base import Blitzortung, LogObserver
+from blitzortung.service.demand import ResultDemand
+from blitzortung.service.response import encode_grid_result, encode_result
+from blitzortung.service.tracing import Tracer
+from twisted.internet.address import IPv4Address
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.error import ConnectionDone
+from twisted.python.failure import Failure
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+from twisted.web.test.requesthelper import DummyRequest
+from txjsonrpc_ng import jsonrpclib
 
 
 class MockRequest:
@@ -50,6 +63,17 @@ class MockRequest:
         self._headers_removed.append(name)
 
 
+def json_rpc_request(method, params):
+    """Create a JSON-RPC request as sent by the app."""
+    request = DummyRequest([b''])
+    request.method = b'POST'
+    request.client = IPv4Address('TCP', '192.168.1.1', 12345)
+    request.content = BytesIO(json.dumps({'id': 1, 'method': method, 'params': params}).encode())
+    request.requestHeaders.setRawHeaders('User-Agent', ['bo-android-150'])
+    request.requestHeaders.setRawHeaders('content-type', ['text/json'])
+    return request
+
+
 @pytest.fixture
 def mock_connection_pool():
     """Create a mock database connection pool."""
@@ -101,21 +125,22 @@ def mock_cache():
     mock.strikes = Mock(return_value=Mock(
         get=Mock(return_value={}),
         get_ratio=Mock(return_value=0.0),
+        get_window_ratio=Mock(return_value=0.0),
         get_size=Mock(return_value=0)
     ))
     mock.local_strikes = Mock(return_value=Mock(
         get=Mock(return_value={}),
         get_ratio=Mock(return_value=0.0),
+        get_window_ratio=Mock(return_value=0.0),
         get_size=Mock(return_value=0)
     ))
     mock.global_strikes = Mock(return_value=Mock(
         get=Mock(return_value={}),
         get_ratio=Mock(return_value=0.0),
+        get_window_ratio=Mock(return_value=0.0),
         get_size=Mock(return_value=0)
     ))
-    mock.histogram = Mock(
-        get=Mock(return_value=Mock())
-    )
+    mock.demand = ResultDemand()
     return mock
 
 
@@ -215,9 +240,12 @@ class TestBlitzortungInitialization:
     def test_initializes_check_count(self, blitzortung):
         assert_that(blitzortung.check_count).is_equal_to(0)
 
-    def test_initializes_current_data_as_defaultdict(self, blitzortung):
-        assert_that(blitzortung.current_data).is_instance_of(dict)
-        assert_that(blitzortung.current_data['test']).is_equal_to([])
+    def test_initializes_access_log(self, blitzortung, mock_log_directory):
+        assert_that(blitzortung.access_log).is_instance_of(AccessLog)
+        assert_that(blitzortung.access_log.log_directory).is_same_as(mock_log_directory)
+
+    def test_initializes_tracer_writing_to_access_log(self, blitzortung):
+        assert_that(blitzortung.tracer.trace_log).is_same_as(blitzortung.access_log)
 
     def test_initializes_minute_constraints(self, blitzortung):
         assert_that(blitzortung.minute_constraints).is_not_none()
@@ -396,30 +424,6 @@ class TestMemoryInfo:
         assert_that(mock_log.msg.call_count).is_greater_than(0)
 
 
-class TestGetEpoch:
-    """Test __get_epoch method."""
-
-    def test_converts_datetime_to_epoch_microseconds(self, blitzortung):
-        dt = datetime.datetime(2025, 1, 1, 12, 0, 0, 500000, tzinfo=datetime.timezone.utc)
-        result = blitzortung._Blitzortung__get_epoch(dt)
-        # 2025-01-01 12:00:00.500000 UTC
-        expected = 1735732800 * 1000000 + 500000
-        assert_that(result).is_equal_to(expected)
-
-
-class TestCurrentPeriod:
-    """Test __current_period method."""
-
-    def test_returns_datetime_with_utc_timezone(self, blitzortung):
-        result = blitzortung._Blitzortung__current_period()
-        assert_that(result.tzinfo).is_equal_to(datetime.timezone.utc)
-
-    def test_returns_datetime_with_zero_seconds(self, blitzortung):
-        result = blitzortung._Blitzortung__current_period()
-        assert_that(result.second).is_equal_to(0)
-        assert_that(result.microsecond).is_equal_to(0)
-
-
 class TestForbiddenIps:
     """Test forbidden IP functionality."""
 
@@ -472,6 +476,7 @@ class TestForbiddenIps:
         mock_cache.strikes = Mock(return_value=Mock(
             get=Mock(return_value={'data': 'test'}),
             get_ratio=Mock(return_value=0.5),
+            get_window_ratio=Mock(return_value=0.5),
             get_size=Mock(return_value=10)
         ))
         mock_cache.global_strikes = Mock(return_value=Mock(get=Mock(return_value={})))
@@ -508,6 +513,240 @@ class TestForbiddenIps:
         mock_cache.strikes.return_value.get.assert_called()
 
 
+class TestJsonRpcGetStrikesGrids:
+    """Test jsonrpc_get_strikes_grids batch method."""
+
+    @pytest.fixture
+    def request_mock(self):
+        return MockRequest(client_ip='192.168.1.1', content_type='text/json', user_agent='bo-android-150')
+
+    def test_returns_grids_in_order(self, blitzortung, mock_cache, request_mock):
+        mock_cache.strikes.return_value.get.return_value = succeed(encode_result({'r': [[1, 2, 3, 4]]}))
+        mock_cache.global_strikes.return_value.get.return_value = succeed(encode_result({'r': []}))
+
+        result = blitzortung.jsonrpc_get_strikes_grids(request_mock, [
+            {'type': 'global', 'minute_length': 60, 'grid_base_length': 20000},
+            {'minute_length': 60, 'grid_base_length': 10000, 'region': 2},
+        ]).result
+
+        assert_that(result.value).is_equal_to([{'r': []}, {'r': [[1, 2, 3, 4]]}])
+        assert_that(result.body).is_equal_to(b'[{"r": []}, {"r": [[1, 2, 3, 4]]}]')
+        mock_cache.strikes.return_value.get.assert_called_once_with(
+            blitzortung.get_strikes_grid, minute_length=60, grid_baselength=10000, minute_offset=0, region=2,
+            count_threshold=0)
+
+    def test_grids_of_same_interval_and_area_share_histogram(self, blitzortung, mock_cache, mock_strike_grid_query,
+                                                              request_mock):
+        mock_cache.strikes.return_value.get.side_effect = lambda creator, **kwargs: creator(**kwargs)
+        grid_results = [Deferred(), Deferred(), Deferred()]
+        mock_strike_grid_query.create.side_effect = [(grid_result, Mock()) for grid_result in grid_results]
+        mock_strike_grid_query.combine_result.return_value = Deferred()
+
+        blitzortung.jsonrpc_get_strikes_grids(request_mock, [
+            {'minute_length': 180, 'grid_base_length': 10000, 'region': 1},
+            {'minute_length': 180, 'grid_base_length': 10000, 'region': 1, 'count_threshold': 1},
+            {'minute_length': 180, 'grid_base_length': 20000, 'region': 1},
+        ])
+
+        with_histogram = [kwargs['with_histogram'] for _, kwargs in mock_strike_grid_query.create.call_args_list]
+        assert_that(with_histogram).is_equal_to([True, False, True])
+        shared_histogram = mock_strike_grid_query.combine_result.call_args_list[1].args[1]
+        grid_results[0].callback(([], [1, 2, 3]))
+        assert_that(shared_histogram.result).is_equal_to([1, 2, 3])
+        assert_that(blitzortung.shared_histograms).is_none()
+
+    def test_single_grids_do_not_share_histogram(self, blitzortung, mock_strike_grid_query):
+        mock_strike_grid_query.create.return_value = (Deferred(), Mock())
+        mock_strike_grid_query.combine_result.return_value = Deferred()
+
+        blitzortung.get_strikes_grid(180, 10000, 0, 1, 0)
+        blitzortung.get_strikes_grid(180, 10000, 0, 1, 1)
+
+        with_histogram = [kwargs['with_histogram'] for _, kwargs in mock_strike_grid_query.create.call_args_list]
+        assert_that(with_histogram).is_equal_to([True, True])
+
+    def test_batch_is_admitted_once(self, blitzortung, mock_cache, request_mock):
+        blitzortung.admission = Mock(check=Mock(return_value=None))
+        mock_cache.strikes.return_value.get.return_value = succeed(encode_result({'r': []}))
+
+        blitzortung.jsonrpc_get_strikes_grids(request_mock, [
+            {'minute_length': 60, 'grid_base_length': 10000, 'region': region} for region in range(1, 5)])
+
+        blitzortung.admission.check.assert_called_once_with('192.168.1.1', 'bo-android-150')
+        assert_that(mock_cache.strikes.return_value.get.call_count).is_equal_to(4)
+
+    def test_rejected_batch_fails_without_grids(self, blitzortung, mock_cache, request_mock):
+        blitzortung.admission = Mock(check=Mock(return_value='rate_limited'))
+
+        with pytest.raises(jsonrpclib.Fault):
+            blitzortung.jsonrpc_get_strikes_grids(request_mock, [{'minute_length': 60, 'region': 1}])
+
+        mock_cache.strikes.assert_not_called()
+
+    def test_local_grid_spec(self, blitzortung, mock_cache, request_mock):
+        mock_cache.local_strikes.return_value.get.return_value = succeed(encode_result({'r': []}))
+
+        blitzortung.jsonrpc_get_strikes_grids(request_mock, [{'type': 'local', 'x': 1, 'y': 2}])
+
+        mock_cache.local_strikes.return_value.get.assert_called_once()
+
+    def test_invalid_specs_yield_empty_results(self, blitzortung, request_mock):
+        result = blitzortung.jsonrpc_get_strikes_grids(request_mock, ['invalid', {'type': 'unknown'}]).result
+
+        assert_that(result.value).is_equal_to([{}, {}])
+
+    def test_specs_with_missing_or_invalid_parameters_yield_empty_results(self, blitzortung, mock_cache,
+                                                                          request_mock):
+        mock_cache.strikes.return_value.get.return_value = succeed(encode_result({'r': []}))
+
+        result = blitzortung.jsonrpc_get_strikes_grids(request_mock, [
+            {'type': 'local', 'x': 1}, {'type': 'global'}, {'minute_length': '60'}, {'minute_length': True},
+            {'minute_length': 60}]).result
+
+        assert_that(result.value).is_equal_to([{}, {}, {}, {}, {'r': []}])
+
+    @pytest.mark.parametrize("grid_specs", [[], [{}] * 9, {'type': 'region'}])
+    def test_rejects_invalid_batch(self, blitzortung, request_mock, grid_specs):
+        assert_that(blitzortung.jsonrpc_get_strikes_grids(request_mock, grid_specs)).is_equal_to({})
+
+
+class TestJsonRpcGetStrikesGridDelta:
+    """Test jsonrpc_get_strikes_grid_delta method."""
+
+    @pytest.fixture
+    def request_mock(self):
+        return MockRequest(client_ip='192.168.1.1', content_type='text/json', user_agent='bo-android-150')
+
+    @staticmethod
+    def grid(t, cells):
+        return encode_result({'r': tuple(cells), 'xd': 0.1, 'yd': 0.1, 'x0': 10.0, 'y1': 50.0, 'xc': 40, 'yc': 30,
+                              't': t, 'dt': 3600, 'h': []})
+
+    def test_returns_delta_to_known_version(self, blitzortung, mock_cache, request_mock):
+        previous = self.grid('20250101T12:00:00', [(1, 1, 3, -100)])
+        current = self.grid('20250101T12:00:20', [(1, 1, 3, -120), (2, 2, 1, -3)])
+        blitzortung.grid_versions.add(previous, 0)
+        blitzortung.grid_versions.add(current, 0)
+        mock_cache.strikes.return_value.get.return_value = succeed(current)
+
+        result = blitzortung.jsonrpc_get_strikes_grid_delta(
+            request_mock, '20250101T12:00:00', {'minute_length': 60, 'region': 1}).result
+
+        assert_that(result.value['r']).is_equal_to(((2, 2, 1, -3),))
+        assert_that(result.value['b']).is_equal_to('20250101T12:00:00')
+
+    def test_cached_grid_result_is_not_modified(self, blitzortung, mock_cache, request_mock):
+        current = self.grid('20250101T12:00:20', [])
+        cached_result = succeed(current)
+        mock_cache.strikes.return_value.get.return_value = cached_result
+
+        blitzortung.jsonrpc_get_strikes_grid_delta(request_mock, '20250101T12:00:00', {'minute_length': 60})
+
+        assert_that(cached_result.result).is_same_as(current)
+
+    def test_returns_complete_grid_for_unknown_version(self, blitzortung, mock_cache, request_mock):
+        current = self.grid('20250101T12:00:20', [])
+        mock_cache.strikes.return_value.get.return_value = succeed(current)
+
+        result = blitzortung.jsonrpc_get_strikes_grid_delta(
+            request_mock, '20250101T11:00:00', {'minute_length': 60}).result
+
+        assert_that(result).is_same_as(current)
+
+    @pytest.mark.parametrize("t,grid_spec", [(None, {}), ('20250101T12:00:00', 'invalid')])
+    def test_rejects_invalid_parameters(self, blitzortung, request_mock, t, grid_spec):
+        assert_that(blitzortung.jsonrpc_get_strikes_grid_delta(request_mock, t, grid_spec)).is_equal_to({})
+
+    def test_creator_records_current_grid_versions(self, blitzortung, mock_strike_grid_query):
+        with patch('blitzortung.service.base.GridParameters'):
+            mock_strike_grid_query.create.return_value = (Mock(), Mock())
+            combined_result = Mock()
+            mock_strike_grid_query.combine_result.return_value = combined_result
+
+            blitzortung.get_strikes_grid(60, 10000, 0, 1, 2)
+
+            combined_result.addCallback.assert_called_with(blitzortung.grid_versions.add, 2)
+
+
+class TestJsonRpcGetCacheStatistics:
+    """Test jsonrpc_get_cache_statistics method."""
+
+    def test_returns_statistics_for_local_client(self, blitzortung, mock_cache):
+        mock_cache.get_statistics = Mock(return_value={'strikes_grid': {}})
+        request = MockRequest(client_ip='127.0.0.1')
+
+        result = blitzortung.jsonrpc_get_cache_statistics(request, 5)
+
+        assert_that(result).is_equal_to({'strikes_grid': {}})
+        mock_cache.get_statistics.assert_called_once_with(5)
+
+    def test_blocks_remote_client(self, blitzortung, mock_cache):
+        request = MockRequest(client_ip='192.168.1.1')
+
+        assert_that(blitzortung.jsonrpc_get_cache_statistics(request)).is_equal_to({})
+
+    def test_blocks_forwarded_client(self, blitzortung, mock_cache):
+        request = MockRequest(client_ip='127.0.0.1', x_forwarded_for='10.0.0.1')
+
+        assert_that(blitzortung.jsonrpc_get_cache_statistics(request)).is_equal_to({})
+
+
+class TestJsonRpcGetTraceStatistics:
+    """Test jsonrpc_get_trace_statistics method."""
+
+    def test_returns_statistics_for_local_client(self, blitzortung):
+        blitzortung.tracer = Mock(get_statistics=Mock(return_value={'strikes_grid': {}}))
+
+        result = blitzortung.jsonrpc_get_trace_statistics(MockRequest(client_ip='127.0.0.1'))
+
+        assert_that(result).is_equal_to({'strikes_grid': {}})
+
+    def test_blocks_remote_client(self, blitzortung):
+        assert_that(blitzortung.jsonrpc_get_trace_statistics(MockRequest(client_ip='192.168.1.1'))).is_equal_to({})
+
+
+class TestResourceTraversal:
+    """Test resolving of resources below the service."""
+
+    def test_child_resource_is_reachable(self, blitzortung):
+        push_resource = Resource()
+        blitzortung.putChild(b'push', push_resource)
+
+        assert_that(Site(blitzortung).getResourceFor(DummyRequest([b'push']))).is_same_as(push_resource)
+
+    @pytest.mark.parametrize("path", [[b''], [b'jsonrpc'], [b'some', b'path']])
+    def test_other_paths_are_served_by_service(self, blitzortung, path):
+        blitzortung.putChild(b'push', Resource())
+
+        assert_that(Site(blitzortung).getResourceFor(DummyRequest(path))).is_same_as(blitzortung)
+
+
+class TestCbRender:
+    """Test rendering of encoded results."""
+
+    def test_renders_encoded_result(self, blitzortung):
+        result = encode_result({'r': []})
+        request = Mock(jsonp_callback=None)
+        request.getHeader.return_value = None
+
+        assert_that(blitzortung._cbRender(result, request, 1, 1)).is_same_as(result)
+
+        request.write.assert_called_once_with(b'{"result": {"r": []}, "error": null, "id": 1}')
+        request.finish.assert_called_once()
+
+    def test_renders_not_modified(self, blitzortung, mock_metrics):
+        result = encode_result({'r': []})
+        request = Mock(jsonp_callback=None, method=b'GET')
+        request.getHeader.side_effect = lambda name: result.get_etag(False) if name == 'If-None-Match' else None
+
+        blitzortung._cbRender(result, request, 1, 1)
+
+        request.setResponseCode.assert_called_once_with(304)
+        request.write.assert_not_called()
+        request.finish.assert_called_once()
+        mock_metrics.for_not_modified.assert_called_once()
+
+
 class TestLogObserver:
     """Test LogObserver class."""
 
@@ -553,7 +792,70 @@ class TestGetStrikesGrid:
 
                 blitzortung.get_strikes_grid(60, 10000, 0, 1, 0)
 
-                mock_interval.assert_called_with(60, 0)
+                mock_interval.assert_called_with(60, 0, 20)
+
+    def test_aligns_history_time_interval(self, blitzortung, mock_strike_grid_query):
+        with patch('blitzortung.service.base.GridParameters'):
+            with patch('blitzortung.service.base.create_time_interval') as mock_interval:
+                mock_interval.return_value = Mock()
+                mock_strike_grid_query.create.return_value = (Mock(), Mock())
+                mock_strike_grid_query.combine_result.return_value = Mock()
+
+                blitzortung.get_strikes_grid(60, 10000, -30, 1, 0)
+
+                mock_interval.assert_called_with(60, -30, 60)
+
+    def test_encodes_with_json_encoder(self, blitzortung, mock_strike_grid_query):
+        with patch('blitzortung.service.base.GridParameters'):
+            mock_strike_grid_query.create.return_value = (Mock(), Mock())
+            combined_result = Mock()
+            mock_strike_grid_query.combine_result.return_value = combined_result
+
+            blitzortung.get_strikes_grid(60, 10000, 0, 1, 0)
+
+            assert_that(combined_result.addCallback.call_args_list).contains(
+                call(encode_grid_result, encoder=blitzortung.json_encoder))
+
+    def test_passes_strike_buffer(self, blitzortung, mock_strike_grid_query):
+        with patch('blitzortung.service.base.GridParameters'):
+            mock_strike_grid_query.create.return_value = (Mock(), Mock())
+            mock_strike_grid_query.combine_result.return_value = Mock()
+
+            blitzortung.get_strikes_grid(60, 10000, 0, 1, 0)
+
+            kwargs = mock_strike_grid_query.create.call_args.kwargs
+            assert_that(kwargs['strike_buffer']).is_same_as(blitzortung.strike_buffer)
+
+    def test_history_grid_is_not_counted_from_strike_buffer(self, blitzortung, mock_strike_grid_query):
+        with patch('blitzortung.service.base.GridParameters'):
+            mock_strike_grid_query.create.return_value = (Mock(), Mock())
+            mock_strike_grid_query.combine_result.return_value = Mock()
+
+            blitzortung.get_strikes_grid(60, 10000, -30, 1, 0)
+
+            assert_that(mock_strike_grid_query.create.call_args.kwargs['strike_buffer']).is_none()
+
+    def test_combines_histogram_into_grid_query(self, blitzortung, mock_strike_grid_query, mock_cache):
+        with patch('blitzortung.service.base.GridParameters'):
+            grid_result = Mock()
+            state = Mock()
+            mock_strike_grid_query.create.return_value = (grid_result, state)
+            mock_strike_grid_query.combine_result.return_value = Mock()
+
+            blitzortung.get_strikes_grid(60, 10000, 0, 1, 0)
+
+            assert_that(mock_strike_grid_query.create.call_args.kwargs['with_histogram']).is_true()
+            mock_strike_grid_query.combine_result.assert_called_once_with(grid_result, None, state)
+
+    def test_short_interval_without_histogram(self, blitzortung, mock_strike_grid_query):
+        with patch('blitzortung.service.base.GridParameters'):
+            mock_strike_grid_query.create.return_value = (Mock(), Mock())
+            mock_strike_grid_query.combine_result.return_value = Mock()
+
+            blitzortung.get_strikes_grid(10, 10000, 0, 1, 0)
+
+            assert_that(mock_strike_grid_query.create.call_args.kwargs['with_histogram']).is_false()
+            assert_that(mock_strike_grid_query.combine_result.call_args.args[1].result).is_equal_to([])
 
 
 class TestGetGlobalStrikesGrid:
@@ -591,20 +893,6 @@ class TestGetLocalStrikesGrid:
                     mock_local_grid.assert_called()
 
 
-class TestGetHistogram:
-    """Test get_histogram method."""
-
-    def test_calls_histogram_cache(self, blitzortung, mock_cache):
-        mock_time_interval = Mock()
-        mock_histogram = Mock()
-        mock_cache.histogram.get.return_value = mock_histogram
-
-        result = blitzortung.get_histogram(mock_time_interval)
-
-        mock_cache.histogram.get.assert_called()
-        assert_that(result).is_same_as(mock_histogram)
-
-
 class TestJsonRpcGetStrikesRaster:
     """Test jsonrpc_get_strikes_raster method."""
 
@@ -645,10 +933,38 @@ class TestJsonRpcGetStrikes:
 
     def test_enforces_max_minute_length(self, blitzortung):
         request = MockRequest()
-        # minute_length of 2000 should be clamped to 1440
+        # minute_length of 2000 should be clamped to the strike buffer length
         result = blitzortung.jsonrpc_get_strikes(request, 2000, 0)
         assert_that(result).is_none()
 
+    @pytest.fixture
+    def strike_buffer(self):
+        strike_buffer = Mock()
+        strike_buffer.minutes = 120
+        strike_buffer.get_strikes.return_value = encode_result({'t': '20250101T12:00:00', 'h': [], 's': ()})
+        return strike_buffer
+
+    @pytest.fixture
+    def request_(self):
+        return MockRequest(client_ip='192.168.1.1', content_type='text/json', user_agent='bo-android-200')
+
+    def test_returns_strikes_from_buffer(self, blitzortung, strike_buffer, request_):
+        blitzortung.strike_buffer = strike_buffer
+        blitzortung.access_log = Mock()
+
+        result = blitzortung.jsonrpc_get_strikes(request_, 2000, 5)
+
+        assert_that(result).is_same_as(strike_buffer.get_strikes.return_value)
+        strike_buffer.get_strikes.assert_called_once_with(120, 5)
+        blitzortung.access_log.append.assert_called_once_with('get_strikes', 120, 5, '192.168.1.1', 'bo-android-200')
+
+    def test_returns_empty_for_forbidden_ip(self, blitzortung, strike_buffer, request_):
+        blitzortung.strike_buffer = strike_buffer
+        blitzortung.forbidden_ips['192.168.1.1'] = True
+
+        assert_that(blitzortung.jsonrpc_get_strikes(request_, 60, 0)).is_equal_to({})
+        strike_buffer.get_strikes.assert_not_called()
+
 
 class TestJsonRpcGetStrikesGrid:
     """Test jsonrpc_get_strikes_grid method."""
@@ -698,6 +1014,119 @@ class TestJsonRpcGetStrikesGrid:
         # Should return cached response (empty dict from mock)
         assert_that(result).is_equal_to({})
 
+    def test_appends_request_to_access_log(self, blitzortung):
+        """Test that served requests are recorded with their original parameters."""
+        blitzortung.access_log = Mock()
+        request = MockRequest(
+            client_ip='192.168.1.1',
+            content_type='text/json',
+            user_agent='bo-android-150'
+        )
+        blitzortung.jsonrpc_get_strikes_grid(request, 60, 12000, 0, 1, 2)
+
+        blitzortung.access_log.append.assert_called_once_with(
+            'get_strikes_grid', 60, 12000, 0, 1, 2, '192.168.1.1', 'bo-android-150')
+
+    def test_traces_request_until_cached_result_is_available(self, blitzortung, mock_cache):
+        """Test that the stages of a request are traced."""
+        blitzortung.tracer = Tracer()
+        response = Deferred()
+        mock_cache.strikes.return_value.get.return_value = response
+        request = MockRequest(
+            client_ip='192.168.1.1',
+            content_type='text/json',
+            user_agent='bo-android-150'
+        )
+        blitzortung.jsonrpc_get_strikes_grid(request, 60, 10000, 0, 1)
+        assert_that(blitzortung.tracer.histograms).is_empty()
+
+        response.callback('result')
+
+        assert_that(response.result).is_equal_to('result')
+        assert_that(blitzortung.tracer.histograms['get_strikes_grid']).contains_only(
+            'validation', 'cache_lookup', 'request_log', 'cache_wait', 'total')
+
+    def test_disconnect_only_releases_the_hold_of_the_client(self, blitzortung, mock_cache):
+        """Test that a disconnecting client does not cancel the shared result of the other clients."""
+        response = Deferred()
+        mock_cache.strikes.return_value.get.return_value = response
+        requests = [json_rpc_request('get_strikes_grid', [60, 10000, 0, 1]) for _ in range(2)]
+        for request in requests:
+            blitzortung.render(request)
+
+        requests[0].processingFailed(Failure(ConnectionDone()))
+        response.callback(encode_result({'r': []}))
+
+        assert_that(response.called).is_true()
+        assert_that(mock_cache.demand.cancelled_count).is_equal_to(0)
+        assert_that(requests[1].finished).is_equal_to(1)
+        assert_that(json.loads(b''.join(requests[1].written))['result']).is_equal_to({'r': []})
+
+    def test_result_is_cancelled_when_all_clients_disconnected(self, blitzortung, mock_cache):
+        """Test that a pending result without cache entry is cancelled when its last client disconnected."""
+        response = Deferred()
+        response.addErrback(lambda failure: None)
+        mock_cache.strikes.return_value.get.return_value = response
+        request = json_rpc_request('get_strikes_grid', [60, 10000, 0, 1])
+        blitzortung.render(request)
+
+        request.processingFailed(Failure(ConnectionDone()))
+
+        assert_that(response.called).is_true()
+        assert_that(mock_cache.demand.cancelled_count).is_equal_to(1)
+
+    def test_rejects_before_cache_access(self, blitzortung, mock_cache, mock_metrics):
+        """Test that requests over the client budget are rejected without cache or database work."""
+        blitzortung.admission = Mock(check=Mock(return_value='rate_limited'))
+        request = MockRequest(
+            client_ip='192.168.1.1',
+            content_type='text/json',
+            user_agent='bo-android-150'
+        )
+        with pytest.raises(jsonrpclib.Fault) as fault:
+            blitzortung.jsonrpc_get_strikes_grid(request, 60, 10000, 0, 1)
+
+        assert_that(fault.value.faultCode).is_equal_to(REJECTED_FAULT_CODE)
+        blitzortung.admission.check.assert_called_once_with('192.168.1.1', 'bo-android-150')
+        mock_cache.strikes.assert_not_called()
+        mock_metrics.for_rejection.assert_called_once_with('rate_limited')
+
+    def test_rejection_is_rendered_as_fault(self, blitzortung, mock_cache):
+        blitzortung.admission = Mock(check=Mock(return_value='rate_limited'))
+        request = json_rpc_request('get_strikes_grid', [60, 10000, 0, 1])
+
+        blitzortung.render(request)
+
+        response = json.loads(b''.join(request.written))
+        assert_that(response['error']['faultCode']).is_equal_to(REJECTED_FAULT_CODE)
+        assert_that(response['result']).is_none()
+        mock_cache.strikes.assert_not_called()
+
+    def test_uses_canonical_cache_key(self, blitzortung, mock_cache):
+        """Test that cosmetically different parameters are mapped to the same cache entry."""
+        request = MockRequest(
+            client_ip='192.168.1.1',
+            content_type='text/json',
+            user_agent='bo-android-150'
+        )
+        blitzortung.jsonrpc_get_strikes_grid(request, 60, 10000.5, 0, 1, -2)
+
+        mock_cache.strikes.return_value.get.assert_called_once_with(
+            blitzortung.get_strikes_grid, minute_length=60, grid_baselength=10000, minute_offset=0, region=1,
+            count_threshold=0)
+
+    @pytest.mark.parametrize("client,version,referer,expected", [
+        ('192.168.1.1', 150, None, False),
+        ('192.168.1.1', 0, None, True),
+        ('192.168.1.1', 150, 'http://example.com', True),
+        ('192.168.1.2', 150, None, True),
+    ])
+    def test_is_blocked_client(self, blitzortung, client, version, referer, expected):
+        blitzortung.forbidden_ips = {'192.168.1.2': True}
+        request = MockRequest(referer=referer)
+
+        assert_that(blitzortung.is_blocked_client(request, client, version)).is_equal_to(expected)
+
     def test_blocks_request_with_referer(self, blitzortung):
         """Test that requests with referer are blocked."""
         request = MockRequest(
@@ -814,38 +1243,3 @@ class TestJsonRpcGetLocalStrikesGrid:
         )
         result = blitzortung.jsonrpc_get_local_strikes_grid(request, 10, 20, 10000, 60, 0)
         assert_that(result).is_equal_to({})
-
-
-class TestCheckPeriod:
-    """Test __check_period method."""
-
-    def test_restarts_period_when_changed(self, blitzortung):
-        """Test that period is restarted when it changes."""
-        with patch.object(blitzortung, '_Blitzortung__restart_period') as mock_restart:
-            with patch.object(blitzortung, '_Blitzortung__current_period') as mock_current:
-                # Set current period to be different
-                mock_current.return_value = datetime.datetime(2025, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
-                blitzortung.current_period = datetime.datetime(2025, 1, 1, 11, 0, 0, tzinfo=datetime.timezone.utc)
-                blitzortung._Blitzortung__check_period()
-                mock_restart.assert_called_once()
-
-    def test_does_not_restart_when_same_period(self, blitzortung):
-        """Test that period is not restarted when unchanged."""
-        with patch.object(blitzortung, '_Blitzortung__restart_period') as mock_restart:
-            with patch.object(blitzortung, '_Blitzortung__current_period') as mock_current:
-                same_period = datetime.datetime(2025, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
-                mock_current.return_value = same_period
-                blitzortung.current_period = same_period
-                blitzortung._Blitzortung__check_period()
-                mock_restart.assert_not_called()
-
-
-class TestRestartPeriod:
-    """Test __restart_period method."""
-
-    def test_resets_current_data(self, blitzortung):
-        """Test that current_data is reset."""
-        blitzortung.current_data['test'] = [1, 2, 3]
-        blitzortung._Blitzortung__restart_period()
-        assert_that(blitzortung.current_data).is_instance_of(dict)
-        assert_that(blitzortung.current_data['test']).is_equal_to([])
@@ -0,0 +1,61 @@
+import pytest
+from assertpy import assert_that
+from twisted.internet.defer import CancelledError, Deferred, succeed
+
+from blitzortung.service.demand import ResultDemand
+
+
+class TestResultDemand:
+
+    @pytest.fixture
+    def uut(self):
+        return ResultDemand()
+
+    @pytest.fixture
+    def result(self):
+        result = Deferred()
+        result.addErrback(lambda failure: failure.trap(CancelledError))
+        return result
+
+    def test_request_result_is_delivered(self, uut, result):
+        request_result = uut.request_result(result)
+
+        result.callback('grid')
+
+        assert_that(request_result.result).is_equal_to('grid')
+        assert_that(uut.holders).is_empty()
+
+    def test_cancelled_request_result_only_releases_its_hold(self, uut, result):
+        uut.hold(result)
+        request_results = [uut.request_result(result) for _ in range(2)]
+
+        request_results[0].cancel()
+        result.callback('grid')
+
+        assert_that(request_results[0].result.check(CancelledError)).is_true()
+        request_results[0].addErrback(lambda failure: None)
+        assert_that(request_results[1].result).is_equal_to('grid')
+        assert_that(uut.cancelled_count).is_equal_to(0)
+
+    def test_result_is_cancelled_with_last_request_result(self, uut, result):
+        request_result = uut.request_result(result)
+        request_result.addErrback(lambda failure: failure.trap(CancelledError))
+
+        request_result.cancel()
+
+        assert_that(result.called).is_true()
+        assert_that(uut.cancelled_count).is_equal_to(1)
+
+    def test_failure_is_delivered(self, uut):
+        result = Deferred()
+        request_result = uut.request_result(result)
+
+        result.errback(ValueError('query failed'))
+
+        assert_that(request_result.result.check(ValueError)).is_true()
+        request_result.addErrback(lambda failure: None)
+        result.addErrback(lambda failure: None)
+
+    def test_available_result(self, uut):
+        assert_that(uut.request_result(succeed('grid')).result).is_equal_to('grid')
+        assert_that(uut.request_result('grid')).is_equal_to('grid')
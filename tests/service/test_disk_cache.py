@@ -0,0 +1,231 @@
+import time
+
+import pytest
+import pytest_twisted
+from assertpy import assert_that
+from mock import Mock
+from twisted.internet import defer
+from txjsonrpc_ng.web.data import CacheableResult
+
+from blitzortung.service.disk_cache import DiskStore, PersistentObjectCache, generate_store_key
+from blitzortung.service.general import create_time_interval
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "test.store")
+
+
+@pytest.fixture
+def store(store_path):
+    disk_store = DiskStore(store_path)
+    yield disk_store
+    disk_store.close()
+
+
+class TestDiskStore:
+
+    def test_get_missing_key(self, store):
+        assert_that(store.get("foo", time.time())).is_none()
+
+    def test_put_and_get(self, store):
+        store.put("foo", {'r': [[1, 2, 3, -4]], 't': "20250101T12:00:00"}, time.time() + 10)
+
+        assert_that(store.get("foo", time.time())).is_equal_to({'r': [[1, 2, 3, -4]], 't': "20250101T12:00:00"})
+
+    def test_get_expired(self, store):
+        store.put("foo", [1, 2, 3], time.time() - 1)
+
+        assert_that(store.get("foo", time.time())).is_none()
+
+    def test_newer_record_supersedes_older(self, store):
+        store.put("foo", [1], time.time() + 10)
+        store.put("foo", [2], time.time() + 10)
+
+        assert_that(store.get("foo", time.time())).is_equal_to([2])
+        assert_that(store.get_size()).is_equal_to(1)
+        assert_that(store.dead_bytes).is_equal_to(3)
+
+    def test_index_is_restored_on_reopen(self, store, store_path):
+        store.put("foo", [1], time.time() + 10)
+        store.put("bar", [2], time.time() + 10)
+        store.put("foo", [3], time.time() + 10)
+        store.close()
+
+        reopened_store = DiskStore(store_path)
+
+        assert_that(reopened_store.get("foo", time.time())).is_equal_to([3])
+        assert_that(reopened_store.get("bar", time.time())).is_equal_to([2])
+        assert_that(reopened_store.dead_bytes).is_equal_to(3)
+        reopened_store.close()
+
+    def test_truncated_record_is_dropped_on_reopen(self, store, store_path):
+        store.put("foo", [1], time.time() + 10)
+        size = store.get_file_size()
+        store.put("bar", [2, 3, 4], time.time() + 10)
+        store.close()
+        with open(store_path, 'r+b') as store_file:
+            store_file.truncate(size + 20)
+
+        reopened_store = DiskStore(store_path)
+
+        assert_that(reopened_store.get("foo", time.time())).is_equal_to([1])
+        assert_that(reopened_store.get("bar", time.time())).is_none()
+        assert_that(reopened_store.get_file_size()).is_equal_to(size)
+        reopened_store.close()
+
+    def test_compact_removes_superseded_and_expired_records(self, store):
+        store.put("foo", [1], time.time() + 10)
+        store.put("foo", [2], time.time() + 10)
+        store.put("bar", [3], time.time() - 1)
+
+        store.compact()
+
+        assert_that(store.get("foo", time.time())).is_equal_to([2])
+        assert_that(store.get_size()).is_equal_to(1)
+        assert_that(store.dead_bytes).is_equal_to(0)
+
+        store.put("baz", [4], time.time() + 10)
+        assert_that(store.get("baz", time.time())).is_equal_to([4])
+        assert_that(store.get("foo", time.time())).is_equal_to([2])
+
+    def test_expired_records_are_accounted_as_dead(self, store):
+        store.put("foo", [1], time.time() - 1)
+        store.next_expiry_check = 0
+
+        store.put("bar", [2], time.time() + 10)
+
+        assert_that(store.get_size()).is_equal_to(1)
+        assert_that(store.dead_bytes).is_equal_to(3)
+
+    def test_expired_records_trigger_compaction(self, store):
+        store.MIN_COMPACTION_SIZE = 0
+        for index in range(3):
+            store.put(f"key{index}", list(range(100)), time.time() - 1)
+        store.next_expiry_check = 0
+
+        store.put("foo", [1], time.time() + 10)
+
+        assert_that(store.get_size()).is_equal_to(1)
+        assert_that(store.dead_bytes).is_equal_to(0)
+        assert_that(store.get("foo", time.time())).is_equal_to([1])
+
+    def test_contains(self, store):
+        store.put("foo", [1], time.time() + 10)
+        store.put("bar", [2], time.time() - 1)
+
+        assert_that(store.contains("foo", time.time())).is_true()
+        assert_that(store.contains("bar", time.time())).is_false()
+        assert_that(store.contains("baz", time.time())).is_false()
+
+    @pytest_twisted.inlineCallbacks
+    def test_deferred_operations_run_on_store_thread(self, store):
+        store.start()
+
+        yield store.defer(store.put, "foo", [1], time.time() + 10)
+        value = yield store.defer(store.get, "foo", time.time())
+
+        assert_that(value).is_equal_to([1])
+        store.close()
+        assert_that(store.pool).is_none()
+
+
+def test_generate_store_key():
+    def get_strikes_grid():
+        pass
+
+    assert_that(generate_store_key(get_strikes_grid, (), {'region': 1, 'minute_length': 60})) \
+        .is_equal_to('["get_strikes_grid", [], [["minute_length", 60], ["region", 1]]]')
+
+
+def test_generate_store_key_with_end_time():
+    def get_strikes_grid():
+        pass
+
+    assert_that(generate_store_key(get_strikes_grid, (), {'minute_length': 60}, 1735732800)) \
+        .is_equal_to('["get_strikes_grid", [], [["minute_length", 60]], 1735732800]')
+
+
+def test_generate_store_key_for_complex_arguments():
+    def get_histogram():
+        pass
+
+    assert_that(generate_store_key(get_histogram, (), {'connection_pool': object()})).is_none()
+
+
+class TestPersistentObjectCache:
+
+    @pytest.fixture
+    def uut(self, store):
+        return PersistentObjectCache(store, 600, ttl_seconds=60)
+
+    @pytest.fixture
+    def creator_mock(self):
+        creator = Mock(side_effect=lambda **kwargs: defer.succeed(CacheableResult({'r': [[1, 2, 3, -4]]})))
+        creator.__name__ = "get_strikes_grid"
+        return creator
+
+    def test_stores_result(self, uut, store, creator_mock):
+        uut.get(creator_mock, region=1)
+
+        assert_that(store.get('["get_strikes_grid", [], [["region", 1]]]', time.time())) \
+            .is_equal_to({'r': [[1, 2, 3, -4]]})
+
+    def test_uses_stored_result_after_memory_is_cleared(self, uut, creator_mock):
+        uut.get(creator_mock, region=1)
+        uut.clear()
+
+        result = uut.get(creator_mock, region=1)
+
+        assert_that(creator_mock.call_count).is_equal_to(1)
+        assert_that(uut.store_hit_count).is_equal_to(1)
+        assert_that(result.result.value).is_equal_to({'r': [[1, 2, 3, -4]]})
+
+    def test_does_not_store_empty_result(self, uut, store):
+        creator = Mock(side_effect=lambda **kwargs: defer.succeed(None))
+        creator.__name__ = "get_strikes_grid"
+
+        uut.get(creator, region=1)
+
+        assert_that(store.get_size()).is_equal_to(0)
+
+    def test_bypasses_store_for_complex_arguments(self, uut, store, creator_mock):
+        uut.get(creator_mock, connection_pool=object())
+
+        assert_that(store.get_size()).is_equal_to(0)
+
+    def test_does_not_align_without_alignment(self, uut):
+        assert_that(uut.get_end_time({'minute_length': 60, 'minute_offset': -60})).is_none()
+
+
+class TestAlignedPersistentObjectCache:
+
+    @pytest.fixture
+    def uut(self, store):
+        return PersistentObjectCache(store, 600, alignment=60, ttl_seconds=60)
+
+    def test_end_time_is_end_of_aligned_interval(self, uut):
+        end_time = uut.get_end_time({'minute_length': 60, 'minute_offset': -60, 'region': 1})
+
+        assert_that(end_time).is_equal_to(int(create_time_interval(60, -60, 60).end.timestamp()))
+        assert_that(end_time % 60).is_equal_to(0)
+
+    def test_stores_result_by_end_time(self, uut, store):
+        creator = Mock(side_effect=lambda **kwargs: defer.succeed(CacheableResult({'r': []})))
+        creator.__name__ = "get_strikes_grid"
+        kwargs = {'minute_length': 60, 'minute_offset': -60}
+
+        uut.get(creator, **kwargs)
+
+        store_key = generate_store_key(creator, (), kwargs, uut.get_end_time(kwargs))
+        assert_that(store.get(store_key, time.time())).is_equal_to({'r': []})
+        assert_that(store.get(generate_store_key(creator, (), kwargs), time.time())).is_none()
+
+    def test_failed_store_is_logged(self, uut, store):
+        creator = Mock(side_effect=lambda **kwargs: defer.succeed(CacheableResult({'r': {1, 2}})))
+        creator.__name__ = "get_strikes_grid"
+
+        result = uut.get(creator, region=1)
+
+        assert_that(result.result.value).is_equal_to({'r': {1, 2}})
+        assert_that(store.get_size()).is_equal_to(0)
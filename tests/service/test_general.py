@@ -26,6 +26,7 @@ from assertpy import assert_that  # pylint: disable=import-error
 import pytest  # pylint: disable=import-error
 
 import blitzortung.service.general
+from blitzortung.service.tracing import Trace
 from blitzortung.db import query
 
 
@@ -76,6 +77,38 @@ class TestCreateTimeInterval:
         assert_that(interval.start.tzinfo).is_equal_to(datetime.timezone.utc)
         assert_that(interval.end.tzinfo).is_equal_to(datetime.timezone.utc)
 
+    def test_interval_is_aligned(self):
+        """Test that the interval end is rounded down to the alignment."""
+        before = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        interval = blitzortung.service.general.create_time_interval(60, -30, 20)
+        after = datetime.datetime.now(datetime.timezone.utc)
+        assert_that(int(interval.end.timestamp()) % 20).is_equal_to(0)
+        assert_that(interval.end - interval.start).is_equal_to(datetime.timedelta(minutes=60))
+        assert_that(interval.end).is_greater_than(before + datetime.timedelta(minutes=-30, seconds=-20))
+        assert_that(interval.end).is_less_than_or_equal_to(after + datetime.timedelta(minutes=-30))
+
+    def test_aligned_interval_does_not_end_in_the_future(self):
+        interval = blitzortung.service.general.create_time_interval(60, 0, 20)
+        assert_that(interval.end).is_less_than_or_equal_to(datetime.datetime.now(datetime.timezone.utc))
+
+
+class TestCanonicalParameters:
+    """Test suite for the cache key canonicalization."""
+
+    @pytest.mark.parametrize("grid_base_length,expected", [
+        (5000, 5000), (10000, 10000), (10000.5, 10000), (12000, 12000), (30000, 30000), (1000000, 1000000),
+    ])
+    def test_grid_base_length_is_kept(self, grid_base_length, expected):
+        assert_that(blitzortung.service.general.canonical_grid_base_length(grid_base_length, 5000)) \
+            .is_equal_to(expected)
+
+    def test_grid_base_length_respects_minimum(self):
+        assert_that(blitzortung.service.general.canonical_grid_base_length(1000, 10000)).is_equal_to(10000)
+
+    @pytest.mark.parametrize("count_threshold,expected", [(-5, 0), (0, 0), (0.5, 0), (2, 2), (2.7, 2)])
+    def test_count_threshold_is_collapsed(self, count_threshold, expected):
+        assert_that(blitzortung.service.general.canonical_count_threshold(count_threshold)).is_equal_to(expected)
+
 
 class TestTimingState:
     """Test suite for TimingState class."""
@@ -98,10 +131,6 @@ class TestTimingState:
         """Test that initialization sets the statsd client."""
         assert_that(timing_state.statsd_client).is_equal_to(mock_statsd)
 
-    def test_initialization_sets_empty_info_text(self, timing_state):
-        """Test that initialization sets empty info text list."""
-        assert_that(timing_state.info_text).is_equal_to([])
-
     def test_initialization_sets_reference_time(self):
         """Test that initialization sets a reference time."""
         before = time.time()
@@ -173,22 +202,12 @@ class TestTimingState:
         timing_state.log_incr("test.counter")
         mock_statsd.incr.assert_called_once_with("test.counter")
 
-    def test_add_info_text_appends_to_list(self, timing_state):
-        """Test that add_info_text appends to info text list."""
-        timing_state.add_info_text("First message")
-        assert_that(timing_state.info_text).is_equal_to(["First message"])
-
-    def test_add_info_text_multiple_calls(self, timing_state):
-        """Test that multiple add_info_text calls append sequentially."""
-        timing_state.add_info_text("First message")
-        timing_state.add_info_text("Second message")
-        timing_state.add_info_text("Third message")
-        assert_that(timing_state.info_text).is_equal_to(
-            ["First message", "Second message", "Third message"]
-        )
-
-    def test_add_info_text_preserves_existing_items(self, timing_state):
-        """Test that add_info_text preserves existing items."""
-        timing_state.info_text = ["Existing"]
-        timing_state.add_info_text("New")
-        assert_that(timing_state.info_text).is_equal_to(["Existing", "New"])
+    def test_trace_is_created_for_the_name(self, timing_state):
+        """Test that a trace with the timer name is created if none is given."""
+        assert_that(timing_state.trace.name).is_equal_to("test_timer")
+
+    def test_uses_given_trace(self, mock_statsd):
+        """Test that a given trace is used."""
+        trace = Trace("request")
+        ts = blitzortung.service.general.TimingState("test", mock_statsd, trace)
+        assert_that(ts.trace).is_same_as(trace)
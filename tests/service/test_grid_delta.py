@@ -0,0 +1,101 @@
+import pytest
+from assertpy import assert_that
+
+from blitzortung.service.grid_delta import GridVersion, GridVersions, create_delta, parse_grid_time
+from blitzortung.service.response import encode_result
+
+
+def grid_response(t, cells):
+    return {'r': tuple(cells), 'xd': 0.1, 'yd': 0.1, 'x0': 10.0, 'y1': 50.0, 'xc': 40, 'yc': 30,
+            't': t, 'dt': 3600, 'h': [0, 1]}
+
+
+class TestParseGridTime:
+
+    def test_parse(self):
+        assert_that(parse_grid_time('20250101T12:00:20')).is_equal_to(1735732820)
+
+
+class TestCreateDelta:
+
+    def test_changed_new_and_removed_cells(self):
+        previous = GridVersion(grid_response('20250101T12:00:00', [
+            (1, 1, 3, -100), (2, 2, 1, -50), (3, 3, 5, -10)]))
+        current = GridVersion(grid_response('20250101T12:00:20', [
+            (1, 1, 3, -120), (2, 2, 2, -5), (4, 4, 1, -1)]))
+
+        delta = create_delta(previous, current)
+
+        assert_that(delta['r']).is_equal_to(((2, 2, 2, -5), (4, 4, 1, -1)))
+        assert_that(delta['rm']).is_equal_to(((3, 3),))
+        assert_that(delta['b']).is_equal_to('20250101T12:00:00')
+        assert_that(delta['t']).is_equal_to('20250101T12:00:20')
+        assert_that(delta['h']).is_equal_to([0, 1])
+
+    def test_same_version_is_empty(self):
+        version = GridVersion(grid_response('20250101T12:00:00', [(1, 1, 3, -100)]))
+
+        delta = create_delta(version, version)
+
+        assert_that(delta['r']).is_empty()
+        assert_that(delta['rm']).is_empty()
+
+
+class TestGridVersions:
+
+    @pytest.fixture
+    def uut(self):
+        return GridVersions(versions_per_grid=2, max_grids=2)
+
+    @pytest.fixture
+    def previous(self):
+        return encode_result(grid_response('20250101T12:00:00', [(1, 1, 3, -100), (3, 3, 5, -10)]))
+
+    @pytest.fixture
+    def current(self):
+        return encode_result(grid_response('20250101T12:00:20', [(1, 1, 3, -120), (4, 4, 1, -1)]))
+
+    def test_add_returns_result(self, uut, previous):
+        assert_that(uut.add(previous, 0)).is_same_as(previous)
+
+    def test_get_delta(self, uut, previous, current):
+        uut.add(previous, 0)
+        uut.add(current, 0)
+
+        delta = uut.get_delta(current, '20250101T12:00:00', 0)
+
+        assert_that(delta.value['r']).is_equal_to(((4, 4, 1, -1),))
+        assert_that(delta.value['rm']).is_equal_to(((3, 3),))
+        assert_that(uut.get_delta(current, '20250101T12:00:00', 0)).is_same_as(delta)
+
+    def test_unknown_base_returns_complete_result(self, uut, previous, current):
+        uut.add(previous, 0)
+        uut.add(current, 0)
+
+        assert_that(uut.get_delta(current, '20250101T11:59:40', 0)).is_same_as(current)
+
+    def test_count_threshold_is_part_of_grid_key(self, uut, previous, current):
+        uut.add(previous, 0)
+        uut.add(current, 2)
+
+        assert_that(uut.get_delta(current, '20250101T12:00:00', 2)).is_same_as(current)
+
+    def test_versions_per_grid_are_limited(self, uut, previous, current):
+        uut.add(previous, 0)
+        uut.add(current, 0)
+        uut.add(encode_result(grid_response('20250101T12:00:40', [])), 0)
+
+        assert_that(uut.get_delta(current, '20250101T12:00:00', 0)).is_same_as(current)
+
+    def test_grids_are_limited(self, uut, previous):
+        for x0 in (1.0, 2.0, 3.0):
+            response = grid_response('20250101T12:00:00', [])
+            response['x0'] = x0
+            uut.add(encode_result(response), 0)
+
+        assert_that(uut.grids).is_length(2)
+
+    def test_ignores_non_grid_results(self, uut):
+        assert_that(uut.add({}, 0)).is_equal_to({})
+        assert_that(uut.get_delta(None, '20250101T12:00:00', 0)).is_none()
+        assert_that(uut.grids).is_empty()
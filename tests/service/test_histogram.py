@@ -1,5 +1,3 @@
-import time
-
 import pytest
 import pytest_twisted
 from mock import Mock, call
@@ -40,9 +38,8 @@ class TestHistogramQuery:
         assert connection.runQuery.call_args == call(str(query), query.get_parameters.return_value)
 
     def test_build_result(self, uut):
-        reference_time = time.time() - 0.5
         query_result = [[-2, 3], [-1, 2], [0, 1]]
 
-        result = uut.build_result(query_result, 30, 5, reference_time)
+        result = uut.build_result(query_result, 30, 5)
 
         assert result == [0, 0, 0, 3, 2, 1]
@@ -0,0 +1,125 @@
+import datetime
+import json
+import random
+
+import pytest
+from assertpy import assert_that
+from twisted.internet import task
+from twisted.internet.task import Clock
+from txjsonrpc_ng import jsonrpclib
+
+from blitzortung.service.json_encoder import GridJsonEncoder, JsonEncoder, OrjsonEncoder, create_json_encoder, orjson
+from blitzortung.service.response import encode_grid_result, iterencode_grid
+
+requires_orjson = pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+
+
+def grid_response(row_count, seed=1):
+    generator = random.Random(seed)
+    rows = tuple((generator.randrange(2834), -generator.randrange(1907), generator.randrange(1, 300),
+                  -generator.randrange(7200)) for _ in range(row_count))
+    return {'r': rows, 'xd': 0.127011, 'yd': 0.094352, 'x0': -180.0, 'y1': 90.0238, 'xc': 2834, 'yc': 1907,
+            't': '20250101T12:00:00', 'dt': 2, 'h': [0, 3, 12, 45, 80, 120, 99, 66, 40, 21, 8, 2]}
+
+
+def stdlib_encode(value):
+    return json.dumps(value, cls=jsonrpclib.JSONRPCEncoder).encode()
+
+
+class TestGridJsonEncoder:
+
+    @pytest.fixture
+    def uut(self):
+        return GridJsonEncoder()
+
+    def test_equals_stdlib_encoding(self, uut):
+        value = grid_response(100)
+
+        assert_that(uut.encode(value)).is_equal_to(stdlib_encode(value))
+
+    def test_empty_grid(self, uut):
+        value = {'r': (), 'h': [], 't': '20250101T12:00:00'}
+
+        assert_that(uut.encode(value)).is_equal_to(stdlib_encode(value))
+
+    def test_other_shapes_use_stdlib(self, uut):
+        value = {'r': ((1, 2),), 'rm': ((3, 4),), 'h': None, 'time': datetime.datetime(2025, 1, 1, 12)}
+
+        assert_that(uut.encode(value)).is_equal_to(stdlib_encode(value))
+        assert_that(uut.encode([1, (2, 3)])).is_equal_to(b'[1, [2, 3]]')
+
+    @pytest.mark.parametrize("rows,histogram", [
+        (((1, 2, 3.7, -4),), [1, 2]),
+        (((1, 2, True, -4),), [1, 2]),
+        (((1, 2, 3, -4),), [1.5, 2]),
+        (((1, 2, 3, -4),), [False, 2]),
+    ])
+    def test_non_integer_values_use_stdlib(self, uut, rows, histogram):
+        value = {'r': rows, 't': '20250101T12:00:00', 'h': histogram}
+
+        assert_that(uut.encode(value)).is_equal_to(stdlib_encode(value))
+
+    def test_encode_rows(self, uut):
+        assert_that(uut.encode_rows(((1, -2, 3, -4), (5, 6, 7, 8)))).is_equal_to(b'[[1, -2, 3, -4], [5, 6, 7, 8]]')
+        assert_that(uut.encode_rows(((1, 2),))).is_equal_to(b'[[1, 2]]')
+        assert_that(uut.encode_rows(((1, 2.5, True, 4),))).is_equal_to(b'[[1, 2.5, true, 4]]')
+
+    def test_iterencode_grid(self, uut):
+        value = grid_response(5000)
+
+        assert_that(b''.join(iterencode_grid(value, uut))).is_equal_to(stdlib_encode(value))
+
+
+@requires_orjson
+class TestOrjsonEncoder:
+
+    def test_encodes_grid(self):
+        value = grid_response(100)
+
+        assert_that(json.loads(OrjsonEncoder().encode(value))).is_equal_to(json.loads(stdlib_encode(value)))
+
+    def test_encodes_datetime_like_jsonrpc_encoder(self):
+        value = {'t': datetime.datetime(2025, 1, 1, 12, tzinfo=datetime.timezone.utc)}
+
+        assert_that(OrjsonEncoder().encode(value)).is_equal_to(b'{"t":"20250101T12:00:00"}')
+
+    def test_encoded_grid_result_is_valid_json(self):
+        value = grid_response(15000)
+
+        clock = Clock()
+        cooperator = task.Cooperator(scheduler=lambda work: clock.callLater(0.01, work))
+
+        deferred_result = encode_grid_result(value, cooperator, OrjsonEncoder())
+        while not deferred_result.called:
+            clock.advance(0.01)
+
+        assert_that(json.loads(deferred_result.result.body)).is_equal_to(json.loads(stdlib_encode(value)))
+
+
+class TestCreateJsonEncoder:
+
+    def test_default(self):
+        assert_that(create_json_encoder()).is_instance_of(GridJsonEncoder)
+
+    def test_by_name(self):
+        assert_that(create_json_encoder('json')).is_instance_of(JsonEncoder)
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            create_json_encoder('fast')
+
+
+GLOBAL_GRID = grid_response(50000)
+
+
+def test_bench_json_encoder(benchmark):
+    benchmark.pedantic(JsonEncoder().encode, args=(GLOBAL_GRID,), rounds=10, iterations=1)
+
+
+def test_bench_grid_json_encoder(benchmark):
+    benchmark.pedantic(GridJsonEncoder().encode, args=(GLOBAL_GRID,), rounds=10, iterations=1)
+
+
+@requires_orjson
+def test_bench_orjson_encoder(benchmark):
+    benchmark.pedantic(OrjsonEncoder().encode, args=(GLOBAL_GRID,), rounds=10, iterations=1)
@@ -93,3 +93,66 @@ class TestStatsDMetrics:
             mock_statsd.incr.assert_any_call(f'strikes_grid.bg_count.{region}')
 
         mock_statsd.gauge.assert_called_once_with('strikes_grid.cache_hits', cache_ratio)
+
+
+    def test_for_cache_statistics(self, metrics, mock_statsd):
+        """Test export of cache statistics as gauges."""
+        statistics = {'hits': 3, 'misses': 1, 'ratio': 0.75, 'evictions': 0, 'expirations': 2,
+                      'fill_ms_avg': 12.5, 'fill_ms_max': 20.0, 'size': 4, 'bytes': 4096, 'top_keys': []}
+
+        metrics.for_cache_statistics({'strikes_grid': statistics})
+
+        assert mock_statsd.gauge.call_count == 9
+        mock_statsd.gauge.assert_any_call('cache.strikes_grid.hits', 3)
+        mock_statsd.gauge.assert_any_call('cache.strikes_grid.ratio', 0.75)
+        mock_statsd.gauge.assert_any_call('cache.strikes_grid.bytes', 4096)
+
+    def test_for_cache_statistics_of_worker(self, mock_statsd):
+        """Test that gauges of worker processes are reported separately."""
+        statistics = {gauge: 1 for gauge in ('hits', 'misses', 'ratio', 'evictions', 'expirations', 'fill_ms_avg',
+                                             'fill_ms_max', 'size', 'bytes')}
+
+        StatsDMetrics(mock_statsd, worker=2).for_cache_statistics({'histogram': statistics})
+
+        mock_statsd.gauge.assert_any_call('worker.2.cache.histogram.hits', 1)
+
+    def test_for_trace_statistics(self, mock_statsd):
+        """Test export of latency percentiles per trace stage."""
+        statistics = {'strikes_grid': {'db_execution': {'count': 4, 'p50': 20, 'p95': 50, 'p99': 100, 'max': 81.5}}}
+
+        StatsDMetrics(mock_statsd, worker=1).for_trace_statistics(statistics)
+
+        assert mock_statsd.gauge.call_count == 5
+        mock_statsd.gauge.assert_any_call('worker.1.trace.strikes_grid.db_execution.p99', 100)
+        mock_statsd.gauge.assert_any_call('worker.1.trace.strikes_grid.db_execution.count', 4)
+
+    def test_for_query_statistics(self, metrics, mock_statsd):
+        """Test export of queue depth and wait time percentiles per query class."""
+        statistics = {'history': {'queued': 3, 'running': 1, 'limit': 1, 'cancelled': 2,
+                                  'wait': {'count': 4, 'p50': 20, 'p95': 50, 'p99': 100, 'max': 81.5}}}
+
+        metrics.for_query_statistics(statistics)
+
+        assert mock_statsd.gauge.call_count == 8
+        mock_statsd.gauge.assert_any_call('db.history.queued', 3)
+        mock_statsd.gauge.assert_any_call('db.history.cancelled', 2)
+        mock_statsd.gauge.assert_any_call('db.history.wait.p95', 50)
+
+    def test_for_supervisor(self, metrics, mock_statsd):
+        """Test supervisor gauges."""
+        metrics.for_supervisor(4, 1)
+
+        mock_statsd.gauge.assert_any_call('supervisor.workers', 4)
+        mock_statsd.gauge.assert_any_call('supervisor.restarts', 1)
+
+    def test_for_rejection(self, metrics, mock_statsd):
+        """Test counting of rejected requests."""
+        metrics.for_rejection('banned')
+
+        mock_statsd.incr.assert_called_once_with('admission.banned')
+
+    def test_for_not_modified(self, metrics, mock_statsd):
+        """Test counting of not modified responses."""
+        metrics.for_not_modified()
+
+        mock_statsd.incr.assert_called_once_with('response.not_modified')
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+import pytest_twisted
+from assertpy import assert_that
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+
+from blitzortung.service.offload import ResultOffload
+
+
+def build(rows, offset=0):
+    return [row + offset for row in rows], threading.current_thread()
+
+
+class TestResultOffload:
+
+    @pytest.fixture
+    def uut(self):
+        result_offload = ResultOffload()
+        yield result_offload
+        result_offload.stop()
+
+    def test_builds_directly_before_start(self, uut):
+        result, thread = uut.build(list(range(20000)), build, offset=1)
+
+        assert_that(result[0]).is_equal_to(1)
+        assert_that(thread).is_same_as(threading.current_thread())
+        assert_that(uut.offloaded_count).is_equal_to(0)
+
+    def test_builds_small_results_directly(self, uut):
+        uut.start(threshold=10, reactor=reactor)
+
+        result, thread = uut.build([1, 2], build)
+
+        assert_that(result).is_equal_to([1, 2])
+        assert_that(thread).is_same_as(threading.current_thread())
+
+    @pytest_twisted.inlineCallbacks
+    def test_builds_large_results_on_pool(self, uut):
+        uut.start(threshold=2, reactor=reactor)
+
+        deferred = uut.build([1, 2], build, offset=1)
+        assert_that(deferred).is_instance_of(Deferred)
+        result, thread = yield deferred
+
+        assert_that(result).is_equal_to([2, 3])
+        assert_that(thread).is_not_same_as(threading.current_thread())
+        assert_that(uut.offloaded_count).is_equal_to(1)
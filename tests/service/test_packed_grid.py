@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from assertpy import assert_that
+
+from blitzortung.service.packed_grid import pack_grid, unpack_grid, zigzag, unzigzag, write_varint, read_varint, \
+    is_grid_response
+
+
+@pytest.fixture
+def grid_response():
+    return {'r': ((10, 3, 5, -30), (2, 1, 1, 0), (300, 400, 1000, -599), (-1, -2, 2, -1)),
+            'xd': 0.127078, 'yd': 0.0902, 'x0': -25.0, 'y1': 72.0902, 'xc': 409, 'yc': 167,
+            't': "20250101T12:00:00", 'dt': 3600, 'h': [0, 1, 2]}
+
+
+@pytest.mark.parametrize("value", [0, 1, -1, 63, -64, 64, 300, -300, 2 ** 40])
+def test_zigzag_round_trip(value):
+    assert_that(unzigzag(zigzag(value))).is_equal_to(value)
+
+
+def test_zigzag_maps_small_values_to_small_codes():
+    assert_that([zigzag(value) for value in (0, -1, 1, -2, 2)]).is_equal_to([0, 1, 2, 3, 4])
+
+
+@pytest.mark.parametrize("value,encoded", [(0, b'\x00'), (127, b'\x7f'), (128, b'\x80\x01'), (300, b'\xac\x02')])
+def test_varint(value, encoded):
+    output = bytearray()
+    write_varint(output, value)
+
+    assert_that(bytes(output)).is_equal_to(encoded)
+    assert_that(read_varint(encoded, 0)).is_equal_to((value, len(encoded)))
+
+
+def test_pack_round_trip(grid_response):
+    unpacked = unpack_grid(pack_grid(grid_response))
+
+    assert_that(set(unpacked['r'])).is_equal_to(set(grid_response['r']))
+    assert_that({key: value for key, value in unpacked.items() if key != 'r'}) \
+        .is_equal_to({key: value for key, value in grid_response.items() if key != 'r'})
+
+
+def test_cells_are_sorted_by_row(grid_response):
+    cells = unpack_grid(pack_grid(grid_response))['r']
+
+    assert_that([cell[:2] for cell in cells]).is_equal_to([(-1, -2), (2, 1), (10, 3), (300, 400)])
+
+
+def test_packed_grid_is_smaller_than_json():
+    response = {'r': tuple((x % 400, x // 400, x % 7 + 1, -(x % 3600)) for x in range(0, 20000, 3)), 't': "x"}
+
+    assert_that(len(pack_grid(response))).is_less_than(len(json.dumps(response)) // 3)
+
+
+def test_unpack_rejects_other_data():
+    with pytest.raises(ValueError):
+        unpack_grid(b'{"r": []}')
+
+
+def test_is_grid_response(grid_response):
+    assert_that(is_grid_response(grid_response)).is_true()
+    assert_that(is_grid_response({'count': 1})).is_false()
+    assert_that(is_grid_response([1])).is_false()
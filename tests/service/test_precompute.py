@@ -0,0 +1,134 @@
+import datetime
+import time
+
+import pytest
+from assertpy import assert_that
+from mock import Mock
+from twisted.internet import task
+
+from blitzortung.service.base import Blitzortung
+from blitzortung.service.cache import ServiceCache
+from blitzortung.service.precompute import GridPrecomputer
+from blitzortung.service.strike_buffer import StrikeBuffer
+
+
+def strike_row(id_value, seconds_ago, x, y, end_time):
+    return {'id': id_value, 'timestamp': end_time - datetime.timedelta(seconds=seconds_ago), 'nanoseconds': 0,
+            'x': x, 'y': y, 'altitude': 0, 'amplitude': 12.5, 'error2d': 400, 'stationcount': 7}
+
+
+class TestGridPrecomputer:
+
+    @pytest.fixture
+    def connection_pool(self):
+        return Mock(name='connection_pool')
+
+    @pytest.fixture
+    def strike_buffer(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        strike_buffer = StrikeBuffer()
+        strike_buffer.add([strike_row(1, 600, 11.0, 49.0, now), strike_row(2, 4000, 11.5, 49.5, now),
+                           strike_row(3, 300, -60.0, -10.0, now)], now)
+        return strike_buffer
+
+    @pytest.fixture
+    def service(self, connection_pool, strike_buffer):
+        return Blitzortung(connection_pool, cache=ServiceCache(), metrics=Mock(), strike_buffer=strike_buffer)
+
+    @pytest.fixture
+    def uut(self, service):
+        return GridPrecomputer(service, minute_lengths=(10, 120), base_lengths=(5000, 10000))
+
+    def test_publishes_region_and_global_grids(self, uut, service, connection_pool):
+        uut.precompute()
+
+        assert_that(uut.precompute_count).is_equal_to(2 * (7 * 2 + 1))
+        assert_that(service.cache.strikes(0).get_size()).is_equal_to(2 * 7 * 2)
+        assert_that(service.cache.global_strikes(0).get_size()).is_equal_to(2)
+        connection_pool.run_scheduled_query.assert_not_called()
+        connection_pool.runQuery.assert_not_called()
+
+    def test_requests_are_served_from_published_grids(self, uut, service):
+        uut.precompute()
+        cache = service.cache.strikes(0)
+
+        response = cache.get(service.get_strikes_grid, minute_length=120, grid_baselength=10000, minute_offset=0,
+                             region=1, count_threshold=0).result
+
+        assert_that(cache.statistics.hits).is_equal_to(1)
+        assert_that(response.value['r']).is_length(2)
+
+    def test_cache_keys_of_published_grids(self, uut, service):
+        uut.precompute()
+
+        published_keys = set(service.cache.strikes(0).cache) | set(service.cache.global_strikes(0).cache)
+        assert_that(uut.cache_keys()).is_equal_to(published_keys)
+
+    def test_grids_of_a_window_are_counted_together(self, uut, strike_buffer):
+        uut.precount(120)
+
+        assert_that(strike_buffer.grid_counts).is_length(7 * 2 + 1)
+
+    def test_windows_are_counted_by_result_offload(self, service, strike_buffer):
+        result_offload = Mock(name='result_offload')
+        result_offload.build.side_effect = lambda rows, builder, *args: builder(rows, *args)
+        uut = GridPrecomputer(service, minute_lengths=(120,), base_lengths=(10000,), result_offload=result_offload)
+
+        uut.precompute()
+
+        assert_that(result_offload.build.call_count).is_equal_to(1)
+        assert_that(strike_buffer.grid_counts).is_length(7 + 1)
+
+    def test_published_grids_expire_with_cache(self, uut, service):
+        uut.precompute()
+        cache = service.cache.strikes(0)
+
+        expiry_check_time = int(time.time()) + cache.get_time_to_live()
+
+        assert_that([entry for entry in cache.cache.values() if entry.is_valid(expiry_check_time)]).is_empty()
+
+    def test_windows_not_covered_by_strike_buffer_are_not_precounted(self, uut, strike_buffer):
+        uut.precount(240)
+
+        assert_that(strike_buffer.grid_counts).is_empty()
+
+    def test_skips_run_while_previous_is_running(self, uut):
+        uut.running = True
+
+        uut.precompute()
+
+        assert_that(uut.precompute_count).is_equal_to(0)
+
+    def test_start_and_stop(self, uut):
+        clock = task.Clock()
+
+        uut.start(clock=clock)
+        clock.advance(uut.START_DELAY)
+        uut.stop()
+
+        assert_that(uut.precompute_count).is_greater_than(0)
+        assert_that(uut.loop.running).is_false()
+
+    def test_runs_are_aligned_to_interval(self, uut):
+        clock = task.Clock()
+        clock.advance(7)
+        uut.precompute = Mock()
+
+        uut.start(clock=clock)
+        clock.advance(uut.interval - 7 + uut.START_DELAY - 1)
+        uut.precompute.assert_not_called()
+        clock.advance(1)
+        uut.precompute.assert_called_once_with()
+        clock.advance(uut.interval)
+        assert_that(uut.precompute.call_count).is_equal_to(2)
+        uut.stop()
+
+    def test_stop_before_first_run(self, uut):
+        clock = task.Clock()
+        uut.precompute = Mock()
+
+        uut.start(clock=clock)
+        uut.stop()
+        clock.advance(uut.interval + uut.START_DELAY)
+
+        uut.precompute.assert_not_called()
@@ -0,0 +1,267 @@
+import datetime
+import json
+
+import pytest
+from assertpy import assert_that
+from mock import Mock
+from twisted.internet import task
+from twisted.internet.defer import succeed
+from twisted.web import server
+from twisted.web.test.requesthelper import DummyRequest
+
+from blitzortung.service.push import FakeGridFeed, GridFeed, KEEP_ALIVE, PushPublisher, PushResource, \
+    SubscriptionGroup, format_event
+from blitzortung.service.response import encode_result
+
+
+def grid_response(t, cells):
+    return {'r': tuple(cells), 'xd': 0.1, 'yd': 0.1, 'x0': 10.0, 'y1': 50.0, 'xc': 40, 'yc': 30,
+            't': t, 'dt': 3600, 'h': []}
+
+
+def parse_events(written):
+    events = []
+    for chunk in b''.join(written).split(b'\n\n'):
+        if chunk.startswith(b'event: '):
+            event, data = chunk.split(b'\n')
+            events.append((event[len(b'event: '):].decode(), json.loads(data[len(b'data: '):])))
+    return events
+
+
+class FakeFeed:
+    def __init__(self):
+        self.responses = []
+        self.calls = []
+
+    def __call__(self, group):
+        self.calls.append(group)
+        return succeed(self.responses.pop(0))
+
+
+class TestFormatEvent:
+
+    def test_format(self):
+        assert_that(format_event('grid', {'t': 'x'})).is_equal_to(b'event: grid\ndata: {"t":"x"}\n\n')
+
+
+class TestPushPublisher:
+
+    @pytest.fixture
+    def feed(self):
+        return FakeFeed()
+
+    @pytest.fixture
+    def clock(self):
+        return task.Clock()
+
+    @pytest.fixture
+    def uut(self, feed, clock):
+        return PushPublisher(feed, max_subscribers=3, max_groups=2, clock=clock)
+
+    @pytest.fixture
+    def group(self):
+        return SubscriptionGroup('region', 60, 10000, region=1)
+
+    def test_first_update_is_complete_grid(self, uut, feed, group):
+        request = DummyRequest([b''])
+        uut.subscribe(group, request)
+        feed.responses.append(encode_result(grid_response('20250101T12:00:00', [(1, 1, 3, -10)])))
+
+        uut.publish()
+
+        assert_that(parse_events(request.written)).is_equal_to(
+            [('grid', dict(grid_response('20250101T12:00:00', []), r=[[1, 1, 3, -10]]))])
+
+    def test_later_updates_are_deltas(self, uut, feed, group):
+        request = DummyRequest([b''])
+        uut.subscribe(group, request)
+        feed.responses.append(grid_response('20250101T12:00:00', [(1, 1, 3, -10)]))
+        feed.responses.append(grid_response('20250101T12:00:20', [(1, 1, 3, -30), (2, 2, 1, -1)]))
+
+        uut.publish()
+        uut.publish()
+
+        event, delta = parse_events(request.written)[1]
+        assert_that(event).is_equal_to('delta')
+        assert_that(delta['r']).is_equal_to([[2, 2, 1, -1]])
+        assert_that(delta['b']).is_equal_to('20250101T12:00:00')
+
+    def test_unchanged_grid_time_sends_keep_alive(self, uut, feed, group):
+        request = DummyRequest([b''])
+        uut.subscribe(group, request)
+        feed.responses.append(grid_response('20250101T12:00:00', []))
+        feed.responses.append(grid_response('20250101T12:00:00', []))
+
+        uut.publish()
+        uut.publish()
+
+        assert_that(request.written[-1]).is_equal_to(KEEP_ALIVE)
+
+    def test_feed_is_queried_once_per_group(self, uut, feed, group):
+        requests = [DummyRequest([b'']) for _ in range(3)]
+        for request in requests:
+            uut.subscribe(group, request)
+        feed.responses.append(grid_response('20250101T12:00:00', []))
+
+        uut.publish()
+
+        assert_that(feed.calls).is_equal_to([group])
+        assert_that(requests[0].written[-1]).is_same_as(requests[2].written[-1])
+
+    def test_new_subscriber_gets_last_grid(self, uut, feed, group):
+        uut.subscribe(group, DummyRequest([b'']))
+        feed.responses.append(grid_response('20250101T12:00:00', [(1, 1, 3, -10)]))
+        uut.publish()
+
+        request = DummyRequest([b''])
+        uut.subscribe(group, request)
+
+        assert_that(parse_events(request.written)[0][0]).is_equal_to('grid')
+
+    def test_subscriber_limit(self, uut, group):
+        results = [uut.subscribe(group, DummyRequest([b''])) for _ in range(4)]
+
+        assert_that(results).is_equal_to([True, True, True, False])
+
+    def test_group_limit(self, uut, group):
+        results = [uut.subscribe(SubscriptionGroup('region', 60, 10000, region=region), DummyRequest([b'']))
+                   for region in (1, 2, 3)]
+
+        assert_that(results).is_equal_to([True, True, False])
+        assert_that(uut.groups).is_length(2)
+        assert_that(uut.subscribe(SubscriptionGroup('region', 60, 10000, region=1), DummyRequest([b'']))).is_true()
+
+    def test_unsubscribe_removes_empty_group(self, uut, group):
+        request = DummyRequest([b''])
+        uut.subscribe(group, request)
+
+        uut.unsubscribe(group, request)
+        uut.unsubscribe(group, request)
+
+        assert_that(uut.groups).is_empty()
+        assert_that(uut.subscriber_count).is_equal_to(0)
+
+    def test_publishes_periodically(self, uut, feed, clock, group):
+        uut.subscribe(group, DummyRequest([b'']))
+        feed.responses.append(grid_response('20250101T12:00:00', []))
+
+        uut.start(20)
+        clock.advance(20)
+
+        assert_that(feed.calls).is_length(1)
+        uut.stop()
+        assert_that(uut.groups).is_empty()
+
+
+class TestGridFeed:
+
+    def test_region_grid_from_cache(self):
+        service = Mock()
+        cached_result = succeed(encode_result(grid_response('20250101T12:00:00', [])))
+        service.cache.strikes.return_value.get.return_value = cached_result
+
+        result = GridFeed(service)(SubscriptionGroup('region', 60, 10000, region=2)).result
+
+        assert_that(result.value['t']).is_equal_to('20250101T12:00:00')
+        assert_that(cached_result.result).is_same_as(result)
+        service.cache.strikes.return_value.get.assert_called_once_with(
+            service.get_strikes_grid, minute_length=60, grid_baselength=10000, minute_offset=0, region=2,
+            count_threshold=0)
+
+    def test_local_grid_from_cache(self):
+        service = Mock()
+        service.cache.local_strikes.return_value.get.return_value = succeed({})
+
+        GridFeed(service)(SubscriptionGroup('local', 60, 10000, x=1, y=2, data_area=5))
+
+        service.cache.local_strikes.return_value.get.assert_called_once_with(
+            service.get_local_strikes_grid, x=1, y=2, grid_baselength=10000, minute_length=60, minute_offset=0,
+            count_threshold=0, data_area=5)
+
+
+class TestFakeGridFeed:
+
+    def test_grid_time_moves_and_counts_grow(self):
+        times = [datetime.datetime(2025, 1, 1, 12, 0, 0, tzinfo=datetime.UTC),
+                 datetime.datetime(2025, 1, 1, 12, 0, 20, tzinfo=datetime.UTC)]
+        uut = FakeGridFeed(x_count=2, y_count=1, cells_per_update=3, seed=1, clock=lambda tz: times.pop(0))
+        group = SubscriptionGroup('region', 60, 10000, region=1)
+
+        first = uut(group).result
+        second = uut(group).result
+
+        assert_that(first['t']).is_equal_to('20250101T12:00:00')
+        assert_that(second['t']).is_equal_to('20250101T12:00:20')
+        assert_that(sum(cell[2] for cell in second['r'])).is_equal_to(6)
+
+
+class TestPushResource:
+
+    @pytest.fixture
+    def service(self):
+        service = Mock(MIN_GRID_BASE_LENGTH=5000, MAX_REGION=7, forbidden_ips=())
+        service.get_request_client.return_value = '192.168.1.1'
+        service.is_admitted.return_value = True
+        service.is_blocked_client.return_value = False
+        service.parse_user_agent.return_value = ('bo-android-150', 150)
+        service.minute_constraints.enforce.side_effect = lambda minute_length, minute_offset: (minute_length,
+                                                                                              minute_offset)
+        return service
+
+    @pytest.fixture
+    def publisher(self):
+        return PushPublisher(FakeFeed())
+
+    @pytest.fixture
+    def uut(self, publisher, service):
+        return PushResource(publisher, service)
+
+    @staticmethod
+    def request(**args):
+        request = DummyRequest([b''])
+        request.args = {key.encode(): [str(value).encode()] for key, value in args.items()}
+        return request
+
+    def test_subscribes_region(self, uut, publisher):
+        request = self.request(region=2, minute_length=30, grid_base_length=12000)
+
+        assert_that(uut.render_GET(request)).is_equal_to(server.NOT_DONE_YET)
+
+        assert_that(list(publisher.groups)).is_equal_to([SubscriptionGroup('region', 30, 12000, region=2)])
+        assert_that(request.responseHeaders.getRawHeaders(b'content-type')).is_equal_to([b'text/event-stream'])
+
+    def test_unsubscribes_when_finished(self, uut, publisher):
+        request = self.request(type='local', x=1, y=2)
+        uut.render_GET(request)
+
+        request.finish()
+
+        assert_that(publisher.groups).is_empty()
+
+    @pytest.mark.parametrize("args", [{'region': 9}, {'type': 'local'}, {'type': 'unknown'}, {'region': 'x'},
+                                      {'type': 'local', 'x': 1000, 'y': 2}, {'type': 'local', 'x': 1, 'y': -100}])
+    def test_rejects_invalid_group(self, uut, publisher, args):
+        request = self.request(**args)
+
+        uut.render_GET(request)
+
+        assert_that(request.responseCode).is_equal_to(400)
+        assert_that(publisher.groups).is_empty()
+
+    def test_rejects_not_admitted_client(self, uut, service, publisher):
+        service.is_admitted.return_value = False
+        request = self.request()
+
+        uut.render_GET(request)
+
+        assert_that(request.responseCode).is_equal_to(403)
+
+    def test_rejects_blocked_client(self, uut, service, publisher):
+        service.is_blocked_client.return_value = True
+        request = self.request()
+
+        uut.render_GET(request)
+
+        assert_that(request.responseCode).is_equal_to(403)
+        assert_that(publisher.groups).is_empty()
+        service.is_blocked_client.assert_called_once_with(request, '192.168.1.1', 150)
@@ -0,0 +1,157 @@
+import datetime
+
+import pytest
+from assertpy import assert_that
+from twisted.internet.defer import CancelledError, Deferred, fail
+
+from blitzortung.db.query import TimeInterval
+from blitzortung.service.query_scheduler import GLOBAL, HISTOGRAM, HISTORY, LIVE, QueryScheduler, classify, \
+    default_limits, query_settings
+
+NOW = datetime.datetime(2025, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestClassify:
+
+    def test_live(self):
+        assert_that(classify(TimeInterval(NOW - datetime.timedelta(hours=1), NOW + datetime.timedelta(seconds=20)),
+                             NOW)).is_equal_to(LIVE)
+
+    def test_interval_in_the_past(self):
+        assert_that(classify(TimeInterval(NOW - datetime.timedelta(hours=2), NOW - datetime.timedelta(hours=1)),
+                             NOW)).is_equal_to(HISTORY)
+
+    def test_long_interval(self):
+        assert_that(classify(TimeInterval(NOW - datetime.timedelta(hours=24), NOW), NOW)).is_equal_to(HISTORY)
+
+
+class TestQuerySettings:
+
+    def test_defaults(self):
+        assert_that(query_settings()[LIVE]).is_equal_to({'statement_timeout': '10s', 'work_mem': '16MB', 'jit': 'off'})
+
+    def test_timeouts_are_overridden(self):
+        settings = query_settings({HISTORY: '2min'})
+
+        assert_that(settings[HISTORY]['statement_timeout']).is_equal_to('2min')
+        assert_that(settings[LIVE]['statement_timeout']).is_equal_to('10s')
+
+    def test_unknown_query_class(self):
+        with pytest.raises(ValueError):
+            query_settings({'bulk': '1s'})
+
+
+class TestQueryScheduler:
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def uut(self, clock):
+        return QueryScheduler(2, {HISTORY: 1}, clock=clock)
+
+    @pytest.fixture
+    def queries(self):
+        return []
+
+    @pytest.fixture
+    def query(self, queries):
+        def query(name):
+            deferred = Deferred()
+            queries.append((name, deferred))
+            return deferred
+
+        return query
+
+    def test_default_limits(self):
+        assert_that(default_limits(6)).is_equal_to({LIVE: 6, HISTOGRAM: 3, GLOBAL: 3, HISTORY: 3})
+        assert_that(default_limits(1)[HISTORY]).is_equal_to(1)
+
+    def test_limits_are_bounded_by_size(self):
+        assert_that(QueryScheduler(2, {GLOBAL: 5}).limits[GLOBAL]).is_equal_to(2)
+
+    def test_class_limit(self, uut, query, queries):
+        uut.run(HISTORY, query, 'history 1')
+        uut.run(HISTORY, query, 'history 2')
+        uut.run(LIVE, query, 'live')
+
+        assert_that([name for name, _ in queries]).is_equal_to(['history 1', 'live'])
+
+    def test_queued_queries_start_by_priority(self, uut, query, queries):
+        uut.run(LIVE, query, 'live 1')
+        uut.run(LIVE, query, 'live 2')
+        uut.run(HISTORY, query, 'history')
+        uut.run(GLOBAL, query, 'global')
+        uut.run(LIVE, query, 'live 3')
+
+        queries[0][1].callback('result')
+
+        assert_that([name for name, _ in queries]).is_equal_to(['live 1', 'live 2', 'live 3'])
+        assert_that(uut.get_statistics()[GLOBAL]['queued']).is_equal_to(1)
+
+    def test_result_is_passed_to_caller(self, uut, query, queries):
+        result = uut.run(LIVE, query, 'live')
+
+        queries[0][1].callback('rows')
+
+        assert_that(result.result).is_equal_to('rows')
+        assert_that(uut.running_count).is_equal_to(0)
+
+    def test_failure_releases_connection(self, uut):
+        result = uut.run(LIVE, fail, ValueError('query failed'))
+
+        assert_that(uut.running_count).is_equal_to(0)
+        result.addErrback(lambda failure: failure.trap(ValueError))
+
+    def test_unknown_query_class(self, uut, query):
+        with pytest.raises(ValueError):
+            uut.run('bulk', query, 'bulk')
+
+    def test_cancel_queued_query(self, uut, query, queries):
+        uut.run(HISTORY, query, 'history 1')
+        result = uut.run(HISTORY, query, 'history 2')
+
+        result.cancel()
+        queries[0][1].callback(None)
+
+        assert_that(result.result.check(CancelledError)).is_true()
+        result.addErrback(lambda failure: None)
+        assert_that([name for name, _ in queries]).is_equal_to(['history 1'])
+        assert_that(uut.get_statistics()[HISTORY]['cancelled']).is_equal_to(1)
+
+    def test_cancel_running_query(self, uut, query, queries):
+        uut.run(LIVE, query, 'live 1')
+        result = uut.run(LIVE, query, 'live 2')
+        uut.run(LIVE, query, 'live 3')
+
+        result.cancel()
+        result.addErrback(lambda failure: failure.trap(CancelledError))
+
+        assert_that(queries[1][1].called).is_true()
+        assert_that([name for name, _ in queries]).is_equal_to(['live 1', 'live 2', 'live 3'])
+        assert_that(uut.running_queries).is_length(2)
+        assert_that(uut.get_statistics()[LIVE]['cancelled']).is_equal_to(1)
+
+    def test_statistics(self, uut, clock, query, queries):
+        uut.run(LIVE, query, 'live 1')
+        uut.run(LIVE, query, 'live 2')
+        uut.run(LIVE, query, 'live 3')
+        clock.now += 0.015
+        queries[0][1].callback(None)
+
+        statistics = uut.get_statistics(reset=True)
+
+        assert_that(statistics[LIVE]['running']).is_equal_to(2)
+        assert_that(statistics[LIVE]['limit']).is_equal_to(2)
+        assert_that(statistics[LIVE]['wait']['count']).is_equal_to(3)
+        assert_that(statistics[LIVE]['wait']['max']).is_equal_to(15.0)
+        assert_that(uut.get_statistics()[LIVE]['wait']['count']).is_equal_to(0)
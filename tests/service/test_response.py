@@ -0,0 +1,298 @@
+import gzip
+import json
+
+import pytest
+from assertpy import assert_that
+from mock import Mock
+from twisted.internet import task
+from twisted.internet.task import Clock
+from txjsonrpc_ng import jsonrpclib
+
+from blitzortung.service.packed_grid import pack_grid, unpack_grid
+from blitzortung.service.response import EncodedResult, encode_result, render_encoded_result, create_envelope, \
+    PACKED_GRID_CONTENT_TYPE, STREAMING_CHUNK_SIZE, BodyProducer, encode_grid_result, iterencode_grid, \
+    combine_encoded_results
+
+
+@pytest.fixture
+def grid_response():
+    return {'r': tuple((x, x % 17, 3, -x) for x in range(500)), 'xd': 0.127078, 't': "20250101T12:00:00",
+            'h': [0, 1, 2]}
+
+
+def expected_response(value, version, id):
+    if version == jsonrpclib.VERSION_PRE1:
+        value = (value,)
+    return jsonrpclib.dumps(value, id=id, version=version).encode()
+
+
+@pytest.mark.parametrize("version,id", [
+    (jsonrpclib.VERSION_PRE1, None),
+    (jsonrpclib.VERSION_1, 1),
+    (jsonrpclib.VERSION_1, "abc"),
+    (jsonrpclib.VERSION_2, 42),
+])
+def test_create_envelope_matches_jsonrpclib(version, id):
+    prefix, suffix = create_envelope(version, id)
+
+    assert_that(prefix + b'"value"' + suffix).is_equal_to(expected_response("value", version, id))
+
+
+class TestEncodedResult:
+
+    def test_encode_result(self, grid_response):
+        result = encode_result(grid_response)
+
+        assert_that(result.value).is_same_as(grid_response)
+        assert_that(result.is_compressible()).is_true()
+
+    def test_small_result_is_not_compressible(self):
+        assert_that(encode_result({'r': ()}).is_compressible()).is_false()
+
+    @pytest.mark.parametrize("version,id", [
+        (jsonrpclib.VERSION_PRE1, None),
+        (jsonrpclib.VERSION_1, 7),
+        (jsonrpclib.VERSION_2, "request-1"),
+    ])
+    def test_render(self, grid_response, version, id):
+        result = encode_result(grid_response)
+
+        assert_that(result.render(version, id, False)).is_equal_to(expected_response(grid_response, version, id))
+
+    @pytest.mark.parametrize("version,id", [
+        (jsonrpclib.VERSION_PRE1, None),
+        (jsonrpclib.VERSION_1, 7),
+        (jsonrpclib.VERSION_2, "request-1"),
+    ])
+    def test_render_compressed(self, grid_response, version, id):
+        result = encode_result(grid_response)
+
+        rendering = result.render(version, id, True)
+
+        assert_that(gzip.decompress(rendering)).is_equal_to(expected_response(grid_response, version, id))
+
+    def test_render_is_cached(self, grid_response):
+        result = encode_result(grid_response)
+
+        assert_that(result.render(1, 7, True)).is_same_as(result.render(1, 7, True))
+
+    def test_renderings_are_limited(self, grid_response):
+        result = encode_result(grid_response)
+
+        for id in range(10):
+            result.render(1, id, True)
+
+        assert_that(result.renderings).is_length(4)
+        assert_that(result.renderings).contains_key((1, 9, True))
+
+
+class TestCombineEncodedResults:
+
+    def test_combine(self, grid_response):
+        result = combine_encoded_results([encode_result(grid_response), encode_result(grid_response)])
+
+        assert_that(result.value).is_equal_to([grid_response, grid_response])
+        assert_that(result.render(1, 1, False)).is_equal_to(expected_response([grid_response, grid_response], 1, 1))
+        assert_that(gzip.decompress(result.render(1, 1, True))) \
+            .is_equal_to(expected_response([grid_response, grid_response], 1, 1))
+
+    def test_combine_with_uncompressed_results(self, grid_response):
+        result = combine_encoded_results([encode_result(grid_response), {}, encode_result({'r': []})])
+
+        assert_that(gzip.decompress(result.render(1, 1, True))) \
+            .is_equal_to(expected_response([grid_response, {}, {'r': []}], 1, 1))
+
+    def test_combine_small_results(self):
+        result = combine_encoded_results([{}, encode_result({'r': []})])
+
+        assert_that(result.body).is_equal_to(b'[{}, {"r": []}]')
+        assert_that(result.is_compressible()).is_false()
+
+
+class TestRenderEncodedResult:
+
+    @pytest.fixture
+    def request_mock(self):
+        request = Mock()
+        request.getHeader.return_value = "deflate, gzip"
+        return request
+
+    def test_render_compressed(self, request_mock, grid_response):
+        result = encode_result(grid_response)
+
+        render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1)
+
+        response = request_mock.write.call_args[0][0]
+        assert_that(gzip.decompress(response)).is_equal_to(expected_response(grid_response, 1, 1))
+        request_mock.setHeader.assert_any_call("content-encoding", "gzip")
+        request_mock.setHeader.assert_any_call("content-length", str(len(response)))
+
+    def test_render_without_accept_encoding(self, request_mock, grid_response):
+        request_mock.getHeader.return_value = None
+        result = encode_result(grid_response)
+
+        render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1)
+
+        request_mock.write.assert_called_once_with(expected_response(grid_response, 1, 1))
+        assert_that(request_mock.setHeader.call_count).is_equal_to(3)
+
+    def test_render_small_result_uncompressed(self, request_mock):
+        result = EncodedResult({}, body=b'{}')
+
+        render_encoded_result(result, request_mock, None, jsonrpclib.VERSION_PRE1)
+
+        request_mock.write.assert_called_once_with(b'[{}]')
+
+    def test_render_packed_grid(self, request_mock, grid_response):
+        request_mock.getHeader.side_effect = lambda name: {
+            'Accept': 'application/vnd.blitzortung.grid, application/json'}.get(name)
+        result = encode_result(grid_response)
+
+        render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1)
+
+        response = request_mock.write.call_args[0][0]
+        assert_that(unpack_grid(response)).is_equal_to(unpack_grid(pack_grid(grid_response)))
+        request_mock.setHeader.assert_any_call("content-type", PACKED_GRID_CONTENT_TYPE)
+
+    def test_render_packed_grid_compressed(self, request_mock, grid_response):
+        request_mock.getHeader.side_effect = lambda name: {
+            'Accept': 'application/vnd.blitzortung.grid', 'Accept-encoding': 'gzip'}.get(name)
+        result = encode_result(grid_response)
+
+        render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1)
+        render_encoded_result(result, request_mock, 2, jsonrpclib.VERSION_1)
+
+        first_response, second_response = (call[0][0] for call in request_mock.write.call_args_list)
+        assert_that(second_response).is_same_as(first_response)
+        assert_that(gzip.decompress(first_response)).is_equal_to(pack_grid(grid_response))
+        request_mock.setHeader.assert_any_call("content-encoding", "gzip")
+
+    def test_packed_format_requires_grid_result(self, request_mock):
+        request_mock.getHeader.side_effect = lambda name: {'Accept': 'application/vnd.blitzortung.grid'}.get(name)
+        result = encode_result({'count': 1})
+
+        render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1)
+
+        request_mock.write.assert_called_once_with(expected_response({'count': 1}, 1, 1))
+
+
+class TestEtag:
+
+    @pytest.fixture
+    def request_mock(self):
+        request = Mock(method=b'GET')
+        request.getHeader.return_value = None
+        return request
+
+    def test_etag_depends_on_content(self, grid_response):
+        assert_that(encode_result(grid_response).get_etag(False)) \
+            .is_equal_to(encode_result(dict(grid_response)).get_etag(False))
+        assert_that(encode_result(grid_response).get_etag(False)) \
+            .is_not_equal_to(encode_result({**grid_response, 't': "20250101T12:00:20"}).get_etag(False))
+
+    def test_etag_depends_on_format(self, grid_response):
+        result = encode_result(grid_response)
+
+        assert_that(result.get_etag(True)).is_not_equal_to(result.get_etag(False))
+
+    def test_response_has_etag(self, request_mock, grid_response):
+        result = encode_result(grid_response)
+
+        assert_that(render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1).result).is_false()
+
+        request_mock.setHeader.assert_any_call("etag", result.get_etag(False))
+        request_mock.setHeader.assert_any_call("vary", "Accept, Accept-Encoding")
+
+    @pytest.mark.parametrize("if_none_match", ['{etag}', '"other", {etag}', '{strong_etag}', '*'])
+    def test_not_modified(self, request_mock, grid_response, if_none_match):
+        result = encode_result(grid_response)
+        etag = result.get_etag(False)
+        request_mock.getHeader.side_effect = lambda name: if_none_match.format(
+            etag=etag, strong_etag=etag[2:]) if name == 'If-None-Match' else None
+
+        assert_that(render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1).result).is_true()
+
+        request_mock.setResponseCode.assert_called_once_with(304)
+        request_mock.write.assert_not_called()
+
+    def test_post_gets_complete_response(self, request_mock, grid_response):
+        result = encode_result(grid_response)
+        request_mock.method = b'POST'
+        request_mock.getHeader.side_effect = lambda name: result.get_etag(False) if name == 'If-None-Match' else None
+
+        assert_that(render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1).result).is_false()
+
+        request_mock.setResponseCode.assert_not_called()
+        request_mock.write.assert_called_once()
+
+    def test_modified(self, request_mock, grid_response):
+        result = encode_result(grid_response)
+        request_mock.getHeader.side_effect = lambda name: 'W/"other"' if name == 'If-None-Match' else None
+
+        assert_that(render_encoded_result(result, request_mock, 1, jsonrpclib.VERSION_1).result).is_false()
+
+        request_mock.setResponseCode.assert_not_called()
+        request_mock.write.assert_called_once()
+
+
+class TestStreaming:
+
+    @pytest.fixture
+    def large_grid_response(self):
+        return {'r': tuple((x % 400, x // 400, x % 7 + 1, -(x % 3600)) for x in range(25000)), 'xd': 0.1,
+                't': "20250101T12:00:00", 'h': [0, 1, 2]}
+
+    @pytest.mark.parametrize("value", [
+        {'r': ((1, 2, 3, -4),) * 4500, 'xd': 0.5, 'h': [1]},
+        {'r': (), 'xd': 0.5},
+        {'xd': 0.5, 'r': [[1, 2, 3, 4]]},
+    ])
+    def test_iterencode_grid_matches_json(self, value):
+        assert_that(b''.join(iterencode_grid(value))).is_equal_to(json.dumps(value).encode())
+
+    def test_small_grid_is_encoded_directly(self, grid_response):
+        assert_that(encode_grid_result(grid_response)).is_instance_of(EncodedResult)
+
+    def test_large_grid_is_encoded_cooperatively(self, large_grid_response):
+        clock = Clock()
+        cooperator = task.Cooperator(scheduler=lambda work: clock.callLater(0.01, work))
+
+        deferred_result = encode_grid_result(large_grid_response, cooperator)
+        while not deferred_result.called:
+            clock.advance(0.01)
+
+        result = deferred_result.result
+        assert_that(result.body).is_equal_to(encode_result(large_grid_response).body)
+        assert_that(gzip.decompress(result.render(1, 1, True))) \
+            .is_equal_to(expected_response(large_grid_response, 1, 1))
+
+    def test_large_response_is_written_in_chunks(self, large_grid_response):
+        request = Mock()
+        request.getHeader.return_value = None
+        result = encode_result(large_grid_response)
+
+        finished = render_encoded_result(result, request, 1, jsonrpclib.VERSION_1)
+
+        producer = request.registerProducer.call_args[0][0]
+        assert_that(finished.called).is_false()
+        while not finished.called:
+            producer.resumeProducing()
+
+        chunks = [call[0][0] for call in request.write.call_args_list]
+        assert_that(max(len(chunk) for chunk in chunks)).is_less_than_or_equal_to(STREAMING_CHUNK_SIZE)
+        assert_that(b''.join(chunks)).is_equal_to(expected_response(large_grid_response, 1, 1))
+        request.setHeader.assert_any_call("content-length", str(len(b''.join(chunks))))
+        request.unregisterProducer.assert_called_once()
+        request.finish.assert_called_once()
+        assert_that(result.renderings).is_empty()
+
+    def test_stopped_producer_does_not_finish_request(self):
+        request = Mock()
+        producer = BodyProducer(request, [b'x' * 100], chunk_size=10)
+        finished = producer.start()
+
+        producer.resumeProducing()
+        producer.stopProducing()
+
+        assert_that(finished.called).is_true()
+        request.finish.assert_not_called()
@@ -22,8 +22,10 @@ import pytest
 import pytest_twisted
 from assertpy import assert_that
 from mock import Mock, patch
+from twisted.internet.defer import Deferred, succeed
 
 import blitzortung.service.db
+from blitzortung.service.tracing import Trace
 
 
 class TestLoggingDetector:
@@ -62,10 +64,113 @@ class TestLoggingDetector:
                 assert_that(str(mock_print.call_args[0][0])).contains("connection recovered")
 
 
+class TestExecute:
+
+    @pytest.fixture
+    def query(self):
+        query = Mock()
+        query.__str__ = Mock(return_value="SELECT 1")
+        query.get_parameters.return_value = {'a': 1}
+        return query
+
+    def test_execute(self, query):
+        connection = Mock()
+
+        blitzortung.service.db.execute(connection, query)
+
+        connection.runQuery.assert_called_once_with("SELECT 1", {'a': 1})
+
+    def test_execute_traced(self, query):
+        connection = Mock()
+        trace = Trace('test')
+
+        blitzortung.service.db.execute(connection, query, trace)
+
+        assert_that(trace.stage).is_equal_to('db_execution')
+
+    def test_execute_traced_on_pool_separates_wait(self, query):
+        pool = blitzortung.service.db.DictConnectionPool(None, min=1)
+        connection = Mock()
+        connection.runQuery.return_value = succeed([(1,)])
+        pool.connections = {connection}
+        trace = Trace('test')
+
+        result = blitzortung.service.db.execute(pool, query, trace)
+
+        assert_that(result.result).is_equal_to([(1,)])
+        assert_that(trace.durations).contains_key('db_wait')
+        assert_that(trace.stage).is_equal_to('db_execution')
+        connection.runQuery.assert_called_once_with(pool.session_settings['live'] + "SELECT 1", {'a': 1})
+        assert_that(pool.connections).contains(connection)
+
+    def test_execute_on_pool_is_scheduled_by_query_class(self, query):
+        pool = blitzortung.service.db.DictConnectionPool(None, min=2, query_limits={'history': 1})
+        connections = [Mock(), Mock()]
+        for connection in connections:
+            connection.runQuery.return_value = Deferred()
+        pool.connections = set(connections)
+
+        blitzortung.service.db.execute(pool, query, query_class='history')
+        blitzortung.service.db.execute(pool, query, query_class='history')
+
+        assert_that(pool.scheduler.running['history']).is_equal_to(1)
+        assert_that(pool.scheduler.get_statistics()['history']['queued']).is_equal_to(1)
+
+    def test_execute_on_pool_applies_session_settings_of_query_class(self, query):
+        pool = blitzortung.service.db.DictConnectionPool(None, min=1, query_timeouts={'history': '2min'})
+        connection = Mock()
+        connection.runQuery.return_value = succeed([])
+        pool.connections = {connection}
+
+        blitzortung.service.db.execute(pool, query, query_class='history')
+
+        connection.runQuery.assert_called_once_with(
+            "SET LOCAL statement_timeout = '2min'; SET LOCAL work_mem = '64MB'; SET LOCAL jit = 'on'; SELECT 1",
+            {'a': 1})
+
+    @pytest.mark.parametrize("settings", [{'statement_timeout': "1s'; DROP TABLE strikes; --"},
+                                          {'search_path': 'public'}])
+    def test_invalid_session_settings_are_rejected(self, settings):
+        with pytest.raises(ValueError):
+            blitzortung.service.db.session_settings(settings)
+
+    def test_invalid_query_timeout_is_rejected(self):
+        with pytest.raises(ValueError):
+            blitzortung.service.db.DictConnectionPool(None, min=1, query_timeouts={'live': "5s'; SELECT 1; --"})
+
+    def test_cancelled_query_on_pool_is_cancelled_on_connection(self, query):
+        pool = blitzortung.service.db.DictConnectionPool(None, min=1)
+        connection = Mock()
+        running_query = Deferred()
+        connection.runQuery.return_value = running_query
+        pool.connections = {connection}
+
+        result = blitzortung.service.db.execute(pool, query)
+        result.addErrback(lambda failure: None)
+        result.cancel()
+
+        assert_that(running_query.called).is_true()
+        assert_that(pool.scheduler.get_statistics()['live']['cancelled']).is_equal_to(1)
+        assert_that(pool.connections).contains(connection)
+
+    def test_run_query_on_pool_is_live_query(self):
+        pool = blitzortung.service.db.DictConnectionPool(None, min=1)
+        connection = Mock()
+        connection.runQuery.return_value = succeed([])
+        pool.connections = {connection}
+
+        pool.runQuery("SELECT 1")
+
+        assert_that(pool.scheduler.get_statistics()['live']['wait']['count']).is_equal_to(1)
+
+
 @pytest.fixture
 def config(connection_string: str):
     with patch('blitzortung.config.config') as mock_config:
         mock_config.return_value.get_db_connection_string.return_value = connection_string
+        mock_config.return_value.get_webservice_db_pool_size.return_value = 3
+        mock_config.return_value.get_webservice_db_query_limits.return_value = {}
+        mock_config.return_value.get_webservice_db_query_timeouts.return_value = {}
         yield mock_config
 
 
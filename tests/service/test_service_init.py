@@ -24,6 +24,8 @@ import blitzortung.service
 import blitzortung.service.strike
 import blitzortung.service.strike_grid
 import blitzortung.service.histogram
+import blitzortung.service.strike_buffer
+import blitzortung.service.offload
 
 
 class TestServiceFactoryFunctions:
@@ -39,3 +41,13 @@ class TestServiceFactoryFunctions:
 
     def test_histogram_query_factory(self):
         assert_that(blitzortung.service.histogram_query()).is_instance_of(blitzortung.service.histogram.HistogramQuery)
+
+    def test_strike_buffer_feed_factory(self):
+        assert_that(blitzortung.service.strike_buffer_feed()).is_instance_of(
+            blitzortung.service.strike_buffer.StrikeBufferFeed)
+
+    def test_result_offload_factory_is_shared(self):
+        result_offload = blitzortung.service.result_offload()
+
+        assert_that(result_offload).is_instance_of(blitzortung.service.offload.ResultOffload)
+        assert_that(blitzortung.service.strike_grid_query().result_offload).is_same_as(result_offload)
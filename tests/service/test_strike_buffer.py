@@ -0,0 +1,249 @@
+import datetime
+
+import pytest
+from assertpy import assert_that
+from mock import Mock
+from twisted.internet import defer, task
+
+from blitzortung.db.query import TimeInterval
+from blitzortung.geom import Grid
+from blitzortung.service.strike_buffer import StrikeBuffer, StrikeBufferFeed
+
+END_TIME = datetime.datetime(2025, 1, 1, 12, 0, 0, 500000, tzinfo=datetime.timezone.utc)
+
+
+def strike_row(id_value, seconds_ago, x=11.0, y=49.0, end_time=END_TIME):
+    return {'id': id_value, 'timestamp': end_time.replace(microsecond=0) - datetime.timedelta(seconds=seconds_ago),
+            'nanoseconds': 0, 'x': x, 'y': y, 'altitude': 0, 'amplitude': 12.5, 'error2d': 400, 'stationcount': 7}
+
+
+class TestStrikeBuffer:
+
+    @pytest.fixture
+    def uut(self):
+        strike_buffer = StrikeBuffer(minutes=60)
+        strike_buffer.add([strike_row(1, 3000), strike_row(2, 1200), strike_row(3, 1300), strike_row(4, 30)],
+                          END_TIME)
+        return strike_buffer
+
+    def test_not_ready_before_first_update(self):
+        assert_that(StrikeBuffer().is_ready()).is_false()
+
+    def test_get_strikes(self, uut):
+        response = uut.get_strikes(30).value
+
+        assert_that(response['t']).is_equal_to('20250101T12:00:00')
+        assert_that(response['s']).is_equal_to(((1200, 11.0, 49.0, 0, 400, 12.5, 7),
+                                                 (1300, 11.0, 49.0, 0, 400, 12.5, 7),
+                                                 (30, 11.0, 49.0, 0, 400, 12.5, 7)))
+        assert_that(response['next']).is_equal_to(5)
+        assert_that(response['h']).is_equal_to([0, 2, 0, 0, 0, 1])
+
+    def test_late_strikes_are_found(self, uut):
+        assert_that(uut.find_time(uut.timestamps[2])).is_equal_to(1)
+        response = uut.get_strikes(22).value
+
+        assert_that([strike[0] for strike in response['s']]).is_equal_to([1200, 1300, 30])
+
+    def test_strikes_before_window_are_skipped(self, uut):
+        response = uut.get_strikes(21).value
+
+        assert_that([strike[0] for strike in response['s']]).is_equal_to([1200, 30])
+
+    def test_get_strikes_after_id(self, uut):
+        response = uut.get_strikes(60, 3).value
+
+        assert_that([strike[0] for strike in response['s']]).is_equal_to([1300, 30])
+
+    def test_no_new_strikes(self, uut):
+        response = uut.get_strikes(60, 5).value
+
+        assert_that(response['s']).is_empty()
+        assert_that(response).does_not_contain_key('next')
+
+    def test_responses_are_shared_for_same_window_start(self, uut):
+        response = uut.get_strikes(60, 3)
+
+        assert_that(uut.get_strikes(60, 2)).is_not_same_as(response)
+        assert_that(uut.get_strikes(60, 3)).is_same_as(response)
+
+    def test_update_clears_responses_and_expires_old_strikes(self, uut):
+        response = uut.get_strikes(60)
+
+        added = uut.add([strike_row(4, 0), strike_row(5, 10)], END_TIME + datetime.timedelta(minutes=20))
+
+        assert_that(added).is_equal_to(1)
+        assert_that(uut.get_strikes(60)).is_not_same_as(response)
+        assert_that(list(uut.ids)).is_equal_to([2, 3, 4, 5])
+        assert_that(uut.get_last_id()).is_equal_to(5)
+
+    def test_minute_length_is_limited_to_buffer_length(self, uut):
+        assert_that(uut.get_strikes(1440).value['h']).is_length(12)
+
+
+class TestStrikeBufferGrid:
+
+    @pytest.fixture
+    def uut(self):
+        strike_buffer = StrikeBuffer(minutes=60)
+        strike_buffer.add([strike_row(1, 3000), strike_row(2, 1200, 11.1, 49.1), strike_row(3, 1300, 11.2, 49.2),
+                           strike_row(4, 30, 10.1, 48.1), strike_row(5, 20, 13.0, 49.0), strike_row(6, 10, 11.3, 49.3)],
+                          END_TIME)
+        return strike_buffer
+
+    @pytest.fixture
+    def grid(self):
+        return Grid(10.0, 12.0, 48.0, 50.0, 0.5, 0.5)
+
+    @pytest.fixture
+    def time_interval(self):
+        end_time = END_TIME.replace(microsecond=0)
+        return TimeInterval(end_time - datetime.timedelta(minutes=30), end_time)
+
+    def test_covers(self, uut, time_interval):
+        assert_that(uut.covers(time_interval, END_TIME)).is_true()
+        assert_that(uut.covers(TimeInterval(END_TIME - datetime.timedelta(minutes=90), END_TIME), END_TIME)).is_false()
+        assert_that(uut.covers(time_interval, END_TIME + datetime.timedelta(minutes=5))).is_false()
+        assert_that(StrikeBuffer().covers(time_interval, END_TIME)).is_false()
+
+    def test_does_not_cover_interval_ending_after_update(self, uut, time_interval):
+        later_interval = TimeInterval(time_interval.start + datetime.timedelta(seconds=20),
+                                      time_interval.end + datetime.timedelta(seconds=20))
+
+        assert_that(uut.covers(later_interval, END_TIME + datetime.timedelta(seconds=20))).is_false()
+
+    def test_does_not_cover_when_outdated(self, uut, time_interval):
+        assert_that(uut.covers(time_interval, time_interval.end + datetime.timedelta(seconds=uut.MAX_AGE))).is_true()
+        assert_that(uut.covers(time_interval, time_interval.end + datetime.timedelta(seconds=uut.MAX_AGE + 1))) \
+            .is_false()
+
+    def test_get_grid_rows(self, uut, grid, time_interval):
+        rows = uut.get_grid_rows(grid, time_interval).result
+
+        assert_that(rows).is_equal_to([
+            {'rx': 2, 'ry': 2, 'interval': None, 'strike_count': 3,
+             'timestamp': END_TIME.replace(microsecond=0) - datetime.timedelta(seconds=10)},
+            {'rx': 0, 'ry': 0, 'interval': None, 'strike_count': 1,
+             'timestamp': END_TIME.replace(microsecond=0) - datetime.timedelta(seconds=30)},
+        ])
+
+    def test_get_grid_rows_with_count_threshold_and_histogram(self, uut, grid, time_interval):
+        rows = uut.get_grid_rows(grid, time_interval, count_threshold=1, histogram_binsize=5).result
+
+        assert_that([(row['rx'], row['ry'], row['interval'], row['strike_count']) for row in rows]).is_equal_to([
+            (2, 2, None, 3),
+            (None, None, -4, 2),
+            (None, None, 0, 2),
+        ])
+
+    def test_get_global_grid_rows(self, uut, time_interval):
+        rows = uut.get_grid_rows(Grid(-180.0, 180.0, -90.0, 90.0, 1.0, 1.0), time_interval, global_grid=True).result
+
+        assert_that([(row['rx'], row['ry'], row['strike_count']) for row in rows]).is_equal_to([
+            (11, 49, 3), (10, 48, 1), (12, 48, 1)])
+
+    def test_precounted_grid_rows(self, uut, grid, time_interval):
+        global_grid = Grid(-180.0, 180.0, -90.0, 90.0, 1.0, 1.0)
+        rows = uut.get_grid_rows(grid, time_interval, count_threshold=1, histogram_binsize=5).result
+        global_rows = uut.get_grid_rows(global_grid, time_interval, histogram_binsize=5, global_grid=True).result
+
+        uut.precount(time_interval, [grid], [global_grid], 5)
+
+        assert_that(uut.grid_counts).is_length(2)
+        assert_that(uut.get_grid_rows(grid, time_interval, count_threshold=1, histogram_binsize=5).result) \
+            .is_equal_to(rows)
+        assert_that(uut.get_grid_rows(global_grid, time_interval, histogram_binsize=5, global_grid=True).result) \
+            .is_equal_to(global_rows)
+
+    def test_get_grid_rows_with_result_offload(self, uut, grid, time_interval):
+        result_offload = Mock(name='result_offload')
+        result_offload.build.side_effect = lambda rows, builder, *args: builder(rows, *args)
+
+        rows = uut.get_grid_rows(grid, time_interval, result_offload=result_offload).result
+
+        assert_that(rows).is_equal_to(uut.get_grid_rows(grid, time_interval).result)
+        timestamps = result_offload.build.call_args.args[0]
+        assert_that(list(timestamps)).is_equal_to(list(uut.timestamps[1:]))
+        assert_that(timestamps).is_not_same_as(uut.timestamps)
+
+    def test_precounted_grid_rows_are_not_offloaded(self, uut, grid, time_interval):
+        result_offload = Mock(name='result_offload')
+        uut.precount(time_interval, [grid])
+
+        uut.get_grid_rows(grid, time_interval, result_offload=result_offload)
+
+        result_offload.build.assert_not_called()
+
+    def test_precounts_finished_after_update_are_dropped(self, uut, grid, time_interval):
+        counts = defer.Deferred()
+        result_offload = Mock(name='result_offload')
+        result_offload.build.return_value = counts
+
+        uut.precount(time_interval, [grid], result_offload=result_offload)
+        uut.add([], END_TIME)
+        counts.callback({'key': ({}, {})})
+
+        assert_that(uut.grid_counts).is_empty()
+
+    def test_precounts_are_cleared_by_update(self, uut, grid, time_interval):
+        uut.precount(time_interval, [grid])
+
+        uut.add([], END_TIME)
+
+        assert_that(uut.grid_counts).is_empty()
+
+
+class TestStrikeBufferFeed:
+
+    @pytest.fixture
+    def query_builder(self):
+        return Mock(name='query_builder')
+
+    @pytest.fixture
+    def uut(self, query_builder):
+        return StrikeBufferFeed(query_builder)
+
+    @pytest.fixture
+    def connection_pool(self):
+        connection_pool = Mock(name='connection_pool')
+        connection_pool.runQuery.side_effect = lambda *args: defer.succeed(
+            [strike_row(7, 10, end_time=datetime.datetime.now(datetime.timezone.utc))])
+        return connection_pool
+
+    def test_first_update_loads_buffer_length(self, uut, query_builder, connection_pool):
+        strike_buffer = StrikeBuffer(minutes=60)
+
+        uut.update(strike_buffer, connection_pool)
+
+        kwargs = query_builder.select_query.call_args.kwargs
+        assert_that(kwargs['id_interval']).is_none()
+        assert_that(kwargs['time_interval'].end).is_none()
+        assert_that(strike_buffer.is_ready()).is_true()
+        assert_that(strike_buffer.get_last_id()).is_equal_to(7)
+
+    def test_update_continues_after_last_id(self, uut, query_builder, connection_pool):
+        strike_buffer = StrikeBuffer(minutes=60)
+        uut.update(strike_buffer, connection_pool)
+
+        uut.update(strike_buffer, connection_pool)
+
+        assert_that(query_builder.select_query.call_args.kwargs['id_interval'].start).is_equal_to(8)
+
+    def test_skips_update_while_query_is_running(self, uut, connection_pool):
+        connection_pool.runQuery.side_effect = lambda *args: defer.Deferred()
+        strike_buffer = StrikeBuffer()
+
+        uut.update(strike_buffer, connection_pool)
+        uut.update(strike_buffer, connection_pool)
+
+        assert_that(connection_pool.runQuery.call_count).is_equal_to(1)
+
+    def test_start_and_stop(self, uut, connection_pool):
+        clock = task.Clock()
+
+        uut.start(StrikeBuffer(), connection_pool, 10, clock=clock)
+        clock.advance(10)
+        uut.stop()
+
+        assert_that(connection_pool.runQuery.call_count).is_equal_to(2)
+        assert_that(uut.loop.running).is_false()
@@ -7,7 +7,10 @@ from assertpy import assert_that
 from mock import Mock, call
 from twisted.internet import defer
 
-from blitzortung.service.strike_grid import StrikeGridQuery, GridParameters, StrikeGridState, GlobalStrikeGridQuery
+from blitzortung.db.query import TimeInterval
+from blitzortung.service.strike_grid import StrikeGridQuery, GridParameters, StrikeGridState, GlobalStrikeGridQuery, \
+    SharedHistogram
+from blitzortung.service.tracing import Trace
 
 
 @pytest.fixture
@@ -25,6 +28,49 @@ def statsd_client():
     return Mock(name='statsd_client')
 
 
+class TestSharedHistogram:
+
+    @pytest.fixture
+    def grid_result(self):
+        return defer.Deferred()
+
+    @pytest.fixture
+    def uut(self, grid_result):
+        return SharedHistogram(grid_result)
+
+    def test_histogram_is_delivered_to_waiting_grids(self, uut, grid_result):
+        histogram_results = [uut.get(), uut.get()]
+
+        grid_result.callback((((1, 2, 3, -4),), [0, 5]))
+
+        assert_that([histogram_result.result for histogram_result in histogram_results]).is_equal_to([[0, 5], [0, 5]])
+        assert_that(grid_result.result).is_equal_to((((1, 2, 3, -4),), [0, 5]))
+
+    def test_histogram_is_available_after_delivery(self, uut, grid_result):
+        grid_result.callback(((), [0, 5]))
+
+        assert_that(uut.get().result).is_equal_to([0, 5])
+
+    def test_failure_is_delivered(self, uut, grid_result):
+        histogram_result = uut.get()
+        errors = []
+        histogram_result.addErrback(errors.append)
+
+        grid_result.errback(ValueError("query failed"))
+
+        assert_that(errors[0].check(ValueError)).is_true()
+        grid_result.addErrback(lambda _failure: None)
+
+    def test_cancelled_histogram_does_not_affect_grid_result(self, uut, grid_result):
+        histogram_result = uut.get()
+        histogram_result.addErrback(lambda _failure: None)
+        histogram_result.cancel()
+
+        grid_result.callback(((), [0, 5]))
+
+        assert_that(grid_result.result).is_equal_to(((), [0, 5]))
+
+
 class TestStrikeGridQuery:
 
     @pytest.fixture
@@ -62,7 +108,8 @@ class TestStrikeGridQuery:
         assert result == ((7, 102, 3, -66),)
 
         query_builder.grid_query.assert_called_once_with("strikes", grid_parameters.grid, time_interval=time_interval,
-                                                         count_threshold=grid_parameters.count_threshold)
+                                                         count_threshold=grid_parameters.count_threshold,
+                                                         histogram_binsize=None)
 
         query = query_builder.grid_query.return_value
         assert connection.runQuery.call_args == call(str(query), query.get_parameters.return_value)
@@ -87,6 +134,85 @@ class TestStrikeGridQuery:
 
         assert result == ((rx, grid_parameters.grid.y_bin_count - ry, 3, -seconds_offset),)
 
+    @pytest_twisted.inlineCallbacks
+    def test_create_with_histogram(self, uut, grid_parameters_factory, time_interval, query_builder, connection,
+                                   statsd_client):
+        grid_parameters = grid_parameters_factory(10000)
+        connection.runQuery.return_value = defer.succeed([
+            {"rx": 7, "ry": 9, "interval": None, "strike_count": 3,
+             "timestamp": time_interval.end - datetime.timedelta(seconds=65)},
+            {"rx": None, "ry": None, "interval": -1, "strike_count": 2, "timestamp": time_interval.end},
+            {"rx": None, "ry": None, "interval": 0, "strike_count": 1, "timestamp": time_interval.end},
+        ])
+        time_interval = TimeInterval(time_interval.end - datetime.timedelta(minutes=30), time_interval.end)
+
+        deferred_result, state = uut.create(grid_parameters, time_interval, connection, statsd_client,
+                                            with_histogram=True)
+        response = yield uut.combine_result(deferred_result, None, state)
+
+        assert response['r'] == ((7, grid_parameters.grid.y_bin_count - 9, 3, -65),)
+        assert response['h'] == [0, 0, 0, 0, 2, 1]
+        assert query_builder.grid_query.call_args.kwargs['histogram_binsize'] == 5
+
+    def test_create_traces_stages(self, uut, grid_parameters_factory, time_interval, connection, statsd_client):
+        connection.runQuery.return_value = defer.succeed([])
+        trace = Trace('strikes_grid')
+
+        deferred_result, state = uut.create(grid_parameters_factory(10000), time_interval, connection, statsd_client,
+                                            trace=trace)
+        uut.combine_result(deferred_result, defer.succeed([]), state)
+        trace.end()
+
+        assert_that(state.trace).is_same_as(trace)
+        assert_that(trace.durations).contains_only('db_execution', 'build_result')
+
+    @pytest_twisted.inlineCallbacks
+    def test_create_from_strike_buffer(self, uut, grid_parameters_factory, time_interval, query_builder, connection,
+                                       statsd_client):
+        grid_parameters = grid_parameters_factory(10000)
+        strike_buffer = Mock(name='strike_buffer')
+        strike_buffer.covers.return_value = True
+        strike_buffer.get_grid_rows.return_value = defer.succeed([{
+            "rx": 7, "ry": 9, "interval": None, "strike_count": 3,
+            "timestamp": time_interval.end - datetime.timedelta(seconds=65)
+        }])
+        trace = Trace('strikes_grid')
+
+        deferred_result, state = uut.create(grid_parameters, time_interval, connection, statsd_client, trace=trace,
+                                            strike_buffer=strike_buffer)
+        result = yield deferred_result
+        trace.end()
+
+        assert result == ((7, 102, 3, -65),)
+        strike_buffer.get_grid_rows.assert_called_once_with(grid_parameters.grid, time_interval, 0, None,
+                                                            result_offload=uut.result_offload)
+        query_builder.grid_query.assert_not_called()
+        connection.runQuery.assert_not_called()
+        assert_that(trace.durations).contains_only('strike_buffer', 'build_result')
+
+    def test_create_builds_result_with_offload(self, query_builder, grid_parameters_factory, time_interval, connection,
+                                               statsd_client):
+        connection.runQuery.return_value = defer.succeed([])
+        result_offload = Mock(name='result_offload')
+        uut = StrikeGridQuery(query_builder, result_offload)
+
+        deferred_result, state = uut.create(grid_parameters_factory(10000), time_interval, connection, statsd_client)
+
+        assert_that(deferred_result.result).is_same_as(result_offload.build.return_value)
+        result_offload.build.assert_called_once_with([], uut.build_result, state=state, with_histogram=False)
+
+    def test_create_without_covering_strike_buffer(self, uut, grid_parameters_factory, time_interval, connection,
+                                                   statsd_client):
+        connection.runQuery.return_value = defer.succeed([])
+        strike_buffer = Mock(name='strike_buffer')
+        strike_buffer.covers.return_value = False
+
+        uut.create(grid_parameters_factory(10000), time_interval, connection, statsd_client,
+                   strike_buffer=strike_buffer)
+
+        strike_buffer.get_grid_rows.assert_not_called()
+        connection.runQuery.assert_called_once()
+
     def test_build_grid_response(self, uut, statsd_client, grid_parameters_factory, time_interval, ):
         grid_parameters = grid_parameters_factory(10000)
         state = StrikeGridState(statsd_client, grid_parameters, time_interval)
@@ -150,11 +276,32 @@ class TestGlobalStrikeGridQuery:
         assert result == ((7, -10, 3, -66),)
 
         query_builder.global_grid_query.assert_called_once_with("strikes", grid_parameters.grid, time_interval=time_interval,
-                                                         count_threshold=grid_parameters.count_threshold)
+                                                         count_threshold=grid_parameters.count_threshold,
+                                                         histogram_binsize=None)
 
         query = query_builder.global_grid_query.return_value
         assert connection.runQuery.call_args == call(str(query), query.get_parameters.return_value)
 
+    @pytest_twisted.inlineCallbacks
+    def test_create_from_strike_buffer(self, uut, grid_parameters_factory, time_interval, query_builder, connection,
+                                       statsd_client):
+        grid_parameters = grid_parameters_factory(10000)
+        strike_buffer = Mock(name='strike_buffer')
+        strike_buffer.covers.return_value = True
+        strike_buffer.get_grid_rows.return_value = defer.succeed([{
+            "rx": 7, "ry": 9, "interval": None, "strike_count": 3,
+            "timestamp": time_interval.end - datetime.timedelta(seconds=65)
+        }])
+
+        deferred_result, state = uut.create(grid_parameters, time_interval, connection, statsd_client,
+                                            strike_buffer=strike_buffer)
+        result = yield deferred_result
+
+        assert result == ((7, -10, 3, -65),)
+        strike_buffer.get_grid_rows.assert_called_once_with(grid_parameters.grid, time_interval, 0, None,
+                                                            global_grid=True, result_offload=uut.result_offload)
+        connection.runQuery.assert_not_called()
+
     def test_build_result(self, uut, statsd_client, grid_parameters_factory, time_interval, ):
         grid_parameters = grid_parameters_factory(10000)
         state = StrikeGridState(statsd_client, grid_parameters, time_interval)
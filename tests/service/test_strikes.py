@@ -49,7 +49,7 @@ class TestStrikeGridQuery:
         assert connection.runQuery.call_args == call(str(query), query.get_parameters.return_value)
         assert result == connection.runQuery.return_value
 
-        assert result.addCallback.call_args.args == (uut.build_result,)
+        assert result.addCallback.call_args.args == (uut.result_offload.build, uut.build_result)
         assert result.addCallback.call_args.kwargs["state"] == state
 
     def test_build_result(self, uut, state, time_interval, strike_mapper):
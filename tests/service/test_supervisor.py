@@ -0,0 +1,166 @@
+import socket
+
+import pytest
+from assertpy import assert_that
+from mock import Mock
+from twisted.internet.task import Clock
+from twisted.python.failure import Failure
+
+from blitzortung.service.supervisor import WorkerSupervisor, AdoptedPortService, create_listening_socket, \
+    get_worker_index, get_listening_fd, LISTEN_FD_VARIABLE, WORKER_VARIABLE
+
+
+class FakeReactor(Clock):
+
+    def __init__(self):
+        super().__init__()
+        self.processes = []
+
+    def spawnProcess(self, process_protocol, executable, args, env=None, childFDs=None):
+        transport = Mock()
+        process_protocol.makeConnection(transport)
+        self.processes.append((process_protocol, env, childFDs))
+        return transport
+
+
+def end(worker):
+    worker.processEnded(Failure(Exception("terminated")))
+
+
+class TestWorkerSupervisor:
+
+    @pytest.fixture
+    def reactor(self):
+        return FakeReactor()
+
+    @pytest.fixture
+    def metrics(self):
+        return Mock()
+
+    @pytest.fixture
+    def uut(self, reactor, metrics):
+        supervisor = WorkerSupervisor(3, 7, ["python", "worker"], reactor=reactor, metrics=metrics)
+        supervisor.start()
+        return supervisor
+
+    def test_start_spawns_workers(self, uut, reactor):
+        assert_that(uut.workers).is_length(3)
+        _, env, child_fds = reactor.processes[2]
+        assert_that(env[WORKER_VARIABLE]).is_equal_to("2")
+        assert_that(env[LISTEN_FD_VARIABLE]).is_equal_to("7")
+        assert_that(child_fds).is_equal_to({0: 0, 1: 1, 2: 2, 7: 7})
+
+    def test_restarts_crashed_worker_with_backoff(self, uut, reactor):
+        end(uut.workers[1])
+        assert_that(uut.workers).does_not_contain_key(1)
+
+        reactor.advance(uut.RESTART_DELAY * 2)
+
+        assert_that(uut.workers).contains_key(1)
+        assert_that(uut.failures[1]).is_equal_to(1)
+
+        end(uut.workers[1])
+        reactor.advance(uut.RESTART_DELAY * 2)
+        assert_that(uut.workers).does_not_contain_key(1)
+        reactor.advance(uut.RESTART_DELAY * 2)
+        assert_that(uut.workers).contains_key(1)
+        assert_that(uut.restart_count).is_equal_to(2)
+
+    def test_rolling_restart(self, uut, reactor):
+        old_workers = dict(uut.workers)
+
+        result = uut.restart()
+
+        old_workers[0].transport.signalProcess.assert_called_once_with('TERM')
+        old_workers[1].transport.signalProcess.assert_not_called()
+
+        for index in range(3):
+            end(old_workers[index])
+            reactor.advance(uut.STARTUP_GRACE_PERIOD)
+
+        assert_that(result.called).is_true()
+        assert_that(len(reactor.processes)).is_equal_to(6)
+        assert_that(uut.retiring).is_empty()
+        assert_that(uut.restarting).is_false()
+        assert_that(set(uut.workers.values()).isdisjoint(old_workers.values())).is_true()
+
+    def test_replacement_starts_after_old_worker_ended(self, uut, reactor):
+        old_worker = uut.workers[0]
+
+        uut.restart()
+
+        assert_that(reactor.processes).is_length(3)
+        end(old_worker)
+        assert_that(reactor.processes).is_length(4)
+        replacement, env, _ = reactor.processes[3]
+        assert_that(env[WORKER_VARIABLE]).is_equal_to("0")
+        assert_that(uut.workers[0]).is_same_as(replacement)
+
+        reactor.advance(uut.STARTUP_GRACE_PERIOD - 1)
+        uut.workers[1].transport.signalProcess.assert_not_called()
+        reactor.advance(1)
+        uut.workers[1].transport.signalProcess.assert_called_once_with('TERM')
+
+    def test_no_replacement_when_stopped_during_restart(self, uut, reactor):
+        old_worker = uut.workers[0]
+        result = uut.restart()
+
+        uut.stop()
+        end(old_worker)
+
+        assert_that(reactor.processes).is_length(3)
+        assert_that(uut.workers).does_not_contain_key(0)
+        assert_that(result.called).is_true()
+
+    def test_stop_terminates_workers(self, uut, reactor):
+        workers = list(uut.workers.values())
+
+        result = uut.stop()
+
+        for worker in workers:
+            worker.transport.signalProcess.assert_called_once_with('TERM')
+            end(worker)
+        assert_that(result.called).is_true()
+        reactor.advance(uut.MAX_RESTART_DELAY)
+        assert_that(uut.workers).is_empty()
+        assert_that(reactor.processes).is_length(3)
+
+    def test_report_metrics(self, uut, metrics):
+        uut.report_metrics()
+
+        metrics.for_supervisor.assert_called_once_with(3, 0)
+
+
+class TestAdoptedPortService:
+
+    def test_adopts_and_releases_port(self):
+        reactor = Mock()
+        factory = Mock()
+        uut = AdoptedPortService(9, factory, reactor)
+
+        uut.startService()
+        reactor.adoptStreamPort.assert_called_once_with(9, socket.AF_INET, factory)
+
+        uut.stopService()
+        reactor.adoptStreamPort.return_value.stopListening.assert_called_once()
+
+
+def test_create_listening_socket():
+    listening_socket = create_listening_socket(0)
+    try:
+        client = socket.create_connection(listening_socket.getsockname())
+        client.close()
+    finally:
+        listening_socket.close()
+
+
+def test_worker_environment(monkeypatch):
+    monkeypatch.delenv(WORKER_VARIABLE, raising=False)
+    monkeypatch.delenv(LISTEN_FD_VARIABLE, raising=False)
+    assert_that(get_worker_index()).is_none()
+    assert_that(get_listening_fd()).is_none()
+
+    monkeypatch.setenv(WORKER_VARIABLE, "2")
+    monkeypatch.setenv(LISTEN_FD_VARIABLE, "5")
+    assert_that(get_worker_index()).is_equal_to(2)
+    assert_that(get_listening_fd()).is_equal_to(5)
@@ -0,0 +1,118 @@
+import pytest
+from assertpy import assert_that
+from mock import Mock
+
+from blitzortung.service.tracing import LatencyHistogram, Trace, Tracer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLatencyHistogram:
+
+    @pytest.fixture
+    def uut(self):
+        return LatencyHistogram()
+
+    def test_percentiles_are_bucket_bounds(self, uut):
+        for milliseconds in [0.5] * 90 + [15] * 9 + [180]:
+            uut.add(milliseconds / 1000)
+
+        assert_that(uut.get_statistics()).is_equal_to({'p50': 1, 'p95': 20, 'p99': 20, 'count': 100, 'max': 180.0})
+
+    def test_last_bucket_reports_maximum(self, uut):
+        uut.add(45.0)
+
+        assert_that(uut.percentile(0.99)).is_equal_to(45000.0)
+
+    def test_empty(self, uut):
+        assert_that(uut.percentile(0.5)).is_equal_to(0.0)
+
+
+class TestTrace:
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    def test_stages_follow_each_other(self, clock):
+        uut = Trace('request', clock)
+
+        uut.begin('validation')
+        clock.now += 0.25
+        uut.begin('cache_lookup')
+        clock.now += 0.5
+        uut.end()
+
+        assert_that(uut.durations).is_equal_to({'validation': 0.25, 'cache_lookup': 0.5})
+        assert_that(uut.get_total()).is_equal_to(0.75)
+
+    def test_repeated_stages_add_up(self, clock):
+        uut = Trace('request', clock)
+
+        uut.begin('build_result')
+        clock.now += 0.25
+        uut.begin('histogram')
+        uut.begin('build_result')
+        clock.now += 0.5
+        uut.end()
+
+        assert_that(uut.durations['build_result']).is_equal_to(0.75)
+
+    def test_enter_passes_result_through(self, clock):
+        uut = Trace('request', clock)
+
+        assert_that(uut.enter('result', 'serialization')).is_equal_to('result')
+        assert_that(uut.stage).is_equal_to('serialization')
+
+
+class TestTracer:
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def trace_log(self):
+        return Mock()
+
+    def test_finish_aggregates_stages(self, clock):
+        uut = Tracer(clock=clock)
+        trace = uut.start('strikes_grid')
+        trace.begin('db_execution')
+        clock.now += 0.015
+
+        assert_that(uut.finish('result', trace)).is_equal_to('result')
+
+        statistics = uut.get_statistics()
+        assert_that(statistics['strikes_grid']).contains_only('db_execution', 'total')
+        assert_that(statistics['strikes_grid']['db_execution']['p50']).is_equal_to(20)
+
+    def test_sampled_traces_are_logged(self, clock, trace_log):
+        uut = Tracer(trace_log, sample_rate=0.5, clock=clock, sample=lambda: 0.25)
+        trace = uut.start('strikes_grid', region=1)
+        trace.begin('db_wait')
+        clock.now += 0.002
+
+        uut.finish(None, trace)
+
+        trace_log.append.assert_called_once_with('trace', 'strikes_grid', 2000, {'db_wait': 2000}, {'region': 1})
+
+    def test_traces_are_not_logged_when_not_sampled(self, clock, trace_log):
+        uut = Tracer(trace_log, sample_rate=0.5, clock=clock, sample=lambda: 0.75)
+
+        uut.finish(None, uut.start('strikes_grid'))
+
+        trace_log.append.assert_not_called()
+
+    def test_get_statistics_with_reset(self, clock):
+        uut = Tracer(clock=clock)
+        uut.finish(None, uut.start('strikes_grid'))
+
+        assert_that(uut.get_statistics(reset=True)).contains_key('strikes_grid')
+        assert_that(uut.get_statistics()).is_empty()
@@ -0,0 +1,131 @@
+import time
+
+import pytest
+from assertpy import assert_that
+from mock import Mock
+from twisted.internet import defer
+
+from blitzortung.cache import ObjectCache
+from blitzortung.service.warming import CacheWarmer
+
+
+@pytest.fixture
+def cache():
+    return ObjectCache(ttl_seconds=20)
+
+
+@pytest.fixture
+def creator():
+    return Mock(side_effect=lambda **kwargs: defer.succeed(kwargs), __name__="get_strikes_grid")
+
+
+class TestCacheWarmer:
+
+    @pytest.fixture
+    def uut(self, cache):
+        return CacheWarmer([cache], top_key_count=2, max_concurrency=1, lead_seconds=4, min_score=2.0)
+
+    def test_records_accesses(self, uut, cache, creator):
+        cache.get(creator, region=1)
+        cache.get(creator, region=1)
+
+        assert_that(uut.scores).is_equal_to({cache.generate_cache_key(creator, (), {'region': 1}): 2.0})
+
+    def test_scores_decay(self, uut, cache, creator):
+        cache.get(creator, region=1)
+        cache.get(creator, region=1)
+
+        uut.decay(uut.last_decay + uut.DECAY_HALF_LIFE)
+
+        assert_that(list(uut.scores.values())).is_equal_to([1.0])
+
+    def test_unused_keys_are_dropped(self, uut, cache, creator):
+        cache.get(creator, region=1)
+
+        uut.decay(uut.last_decay + 10 * uut.DECAY_HALF_LIFE)
+
+        assert_that(uut.scores).is_empty()
+        assert_that(uut.cache_of_key).is_empty()
+
+    def test_refreshes_popular_entry_before_expiry(self, uut, cache, creator):
+        for _ in range(3):
+            cache.get(creator, region=1)
+        cache_key = cache.generate_cache_key(creator, (), {'region': 1})
+        expiry_time = cache.cache[cache_key].get_expiry_time()
+
+        uut.tick(expiry_time - 2)
+
+        assert_that(creator.call_count).is_equal_to(2)
+        assert_that(uut.refresh_count).is_equal_to(1)
+        assert_that(uut.in_flight).is_empty()
+        assert_that(cache.cache[cache_key].get_expiry_time()).is_greater_than_or_equal_to(int(time.time()) + 20)
+
+    def test_does_not_refresh_entry_far_from_expiry(self, uut, cache, creator):
+        cache.get(creator, region=1)
+        cache.get(creator, region=1)
+
+        uut.tick(time.time())
+
+        assert_that(creator.call_count).is_equal_to(1)
+
+    def test_does_not_refresh_entry_within_alignment_period(self, cache, creator):
+        uut = CacheWarmer([cache], lead_seconds=4, min_score=2.0, alignment=20)
+        cache_key = cache.generate_cache_key(creator, (), {'region': 1})
+        creation_time = int(time.time()) // 20 * 20 + 1
+        cache.put(cache_key, defer.succeed({}), creation_time + 20)
+        for _ in range(3):
+            uut.record_access(cache, cache_key)
+
+        uut.tick(creation_time + 18)
+        assert_that(uut.refresh_count).is_equal_to(0)
+
+        uut.tick(creation_time + 19)
+        assert_that(uut.refresh_count).is_equal_to(1)
+
+    def test_ignores_keys_kept_up_to_date_elsewhere(self, cache, creator):
+        cache_key = cache.generate_cache_key(creator, (), {'region': 1})
+        uut = CacheWarmer([cache], ignored_keys={cache_key})
+
+        cache.get(creator, region=1)
+        cache.get(creator, region=2)
+
+        assert_that(uut.scores).is_equal_to({cache.generate_cache_key(creator, (), {'region': 2}): 1.0})
+
+    def test_does_not_refresh_unpopular_entry(self, uut, cache, creator):
+        cache.get(creator, region=1)
+        cache_key = cache.generate_cache_key(creator, (), {'region': 1})
+
+        uut.tick(cache.cache[cache_key].get_expiry_time() - 2)
+
+        assert_that(creator.call_count).is_equal_to(1)
+
+    def test_keeps_entry_until_refresh_is_complete(self, uut, cache):
+        pending = defer.Deferred()
+        results = [defer.succeed("old"), pending]
+        creator = Mock(side_effect=lambda **kwargs: results.pop(0), __name__="get_strikes_grid")
+        for _ in range(3):
+            cache.get(creator, region=1)
+        cache_key = cache.generate_cache_key(creator, (), {'region': 1})
+
+        uut.tick(cache.cache[cache_key].get_expiry_time() - 2)
+
+        assert_that(uut.in_flight).contains(cache_key)
+        assert_that(cache.cache[cache_key].peek_payload().result).is_equal_to("old")
+
+        pending.callback("new")
+
+        assert_that(uut.in_flight).is_empty()
+        assert_that(cache.cache[cache_key].peek_payload().result).is_equal_to("new")
+
+    def test_limits_concurrent_refreshes(self, uut, cache):
+        creator = Mock(side_effect=lambda **kwargs: defer.Deferred(), __name__="get_strikes_grid")
+        for region in (1, 2):
+            cache.put(cache.generate_cache_key(creator, (), {'region': region}), defer.succeed(region),
+                      int(time.time()) + 1)
+            for _ in range(3):
+                cache.get(creator, region=region)
+
+        uut.tick(time.time())
+
+        assert_that(creator.call_count).is_equal_to(1)
+        assert_that(uut.in_flight).is_length(1)
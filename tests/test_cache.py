@@ -23,9 +23,13 @@ import time
 from assertpy import assert_that
 from mock import Mock
 import pytest
+from twisted.internet import defer
+from txjsonrpc_ng.web.data import CacheableResult
 
-from blitzortung.cache import CacheEntry, ObjectCache
+from blitzortung.cache import CacheEntry, CacheStatistics, ObjectCache
+from blitzortung.service.demand import ResultDemand
 from blitzortung.service.cache import ServiceCache
+from blitzortung.service.disk_cache import DiskStore, PersistentObjectCache
 
 
 class TestCacheEntry:
@@ -78,6 +82,45 @@ class TestCacheEntry:
         assert_that(result).contains("2")  # hit count
 
 
+class TestCacheStatistics:
+    """Test suite for CacheStatistics class."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Set up test fixtures."""
+        self.statistics = CacheStatistics(window_seconds=60)
+        self.statistics.window_start = 1000.0
+
+    def test_summary_is_empty_before_first_window(self):
+        """Test that no summary is available for the current window."""
+        self.statistics.hits += 1
+
+        assert_that(self.statistics.get_summary(1030.0)['hits']).is_equal_to(0)
+
+    def test_summary_of_completed_window(self):
+        """Test summary of the last completed window."""
+        self.statistics.hits += 3
+        self.statistics.misses += 1
+        self.statistics.evictions += 2
+        self.statistics.add_fill_time(0.1)
+        self.statistics.add_fill_time(0.3)
+
+        summary = self.statistics.get_summary(1070.0)
+
+        assert_that(summary).is_equal_to({
+            'window': 60, 'hits': 3, 'misses': 1, 'ratio': 0.75, 'evictions': 2, 'expirations': 0,
+            'fill_ms_avg': 200.0, 'fill_ms_max': 300.0}, ignore='fill_ms_avg')
+        assert_that(summary['fill_ms_avg']).is_close_to(200.0, 0.001)
+        assert_that(self.statistics.hits).is_equal_to(0)
+        assert_that(self.statistics.window_start).is_equal_to(1060.0)
+
+    def test_summary_is_empty_after_idle_windows(self):
+        """Test that counters of an outdated window are not reported."""
+        self.statistics.hits += 3
+
+        assert_that(self.statistics.get_summary(1130.0)['hits']).is_equal_to(0)
+
+
 class CachedObject:
     """Helper class for cache testing."""
 
@@ -203,6 +246,41 @@ class TestObjectCache:
             self.cache.get(CachedObject, ("bar", argument2), foo=argument1)
         ).is_not_same_as(cached_object)
 
+    def test_statistics_counts_hits_and_misses(self):
+        """Test windowed hit and miss counters."""
+        self.cache.get(CachedObject)
+        self.cache.get(CachedObject)
+        self.cache.get(CachedObject, "foo")
+
+        assert_that(self.cache.statistics.hits).is_equal_to(1)
+        assert_that(self.cache.statistics.misses).is_equal_to(2)
+        assert_that(self.cache.statistics.fill_count).is_equal_to(2)
+
+    def test_statistics_measures_deferred_fill_time(self):
+        """Test that fill time of deferred payloads is recorded when they fire."""
+        deferred = defer.Deferred()
+
+        self.cache.get(Mock(return_value=deferred))
+        assert_that(self.cache.statistics.fill_count).is_equal_to(0)
+
+        deferred.callback("result")
+        assert_that(self.cache.statistics.fill_count).is_equal_to(1)
+
+    def test_get_top_keys(self):
+        """Test listing of the most used keys."""
+        self.cache.get(CachedObject, "foo")
+        self.cache.get(CachedObject, "bar")
+        self.cache.get(CachedObject, "bar")
+
+        assert_that(self.cache.get_top_keys(1)).is_equal_to(
+            [(self.cache.generate_cache_key(CachedObject, ("bar",), {}), 2)])
+
+    def test_format_cache_key(self):
+        """Test readable representation of cache keys."""
+        cache_key = self.cache.generate_cache_key(CachedObject, ("foo",), {"region": 1})
+
+        assert_that(self.cache.format_cache_key(cache_key)).is_equal_to("CachedObject('foo', region=1)")
+
     def test_get_ratio(self):
         """Test cache hit ratio calculation."""
         assert_that(self.cache.get_ratio()).is_equal_to(0.0)
@@ -233,6 +311,14 @@ class TestObjectCacheWithSize:
         foo_2 = self.cache.get(CachedObject, name="foo")
         assert_that(foo_1).is_not_same_as(foo_2)
 
+    def test_limited_size_counts_evictions(self):
+        """Test that entries removed by the size limit are counted."""
+        self.cache.get(CachedObject, name="foo")
+        self.cache.get(CachedObject, name="bar")
+        self.cache.get(CachedObject, name="baz")
+
+        assert_that(self.cache.statistics.evictions).is_equal_to(1)
+
     def test_track_recent_usage(self):
         """Test that recent usage is tracked."""
         foo_1 = self.cache.get(CachedObject, name="foo")
@@ -261,6 +347,57 @@ class TestObjectCacheWithSize:
         assert_that(self.cache.get_size()).is_equal_to(1)
 
 
+class TestObjectCacheWithDemand:
+    """Test suite for ObjectCache holding pending payloads."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Set up test fixtures."""
+        self.cache = ObjectCache(ttl_seconds=1, size=1)
+        self.cache.demand = ResultDemand()
+        self.results = []
+
+    def create(self, name):
+        result = defer.Deferred()
+        result.addErrback(lambda failure: failure.trap(defer.CancelledError))
+        self.results.append(result)
+        return result
+
+    def test_evicted_pending_payload_is_cancelled(self):
+        """Test that a pending payload nobody waits for is cancelled on eviction."""
+        self.cache.get(self.create, "foo")
+        self.cache.get(self.create, "bar")
+
+        assert_that(self.results[0].called).is_true()
+        assert_that(self.results[1].called).is_false()
+        assert_that(self.cache.demand.cancelled_count).is_equal_to(1)
+
+    def test_evicted_payload_is_kept_for_waiting_request(self):
+        """Test that a pending payload is not cancelled while a request waits for it."""
+        self.cache.demand.request_result(self.cache.get(self.create, "foo"))
+        self.cache.get(self.create, "bar")
+
+        assert_that(self.results[0].called).is_false()
+
+    def test_failed_payload_is_removed(self):
+        """Test that a failed payload is not served from the cache."""
+        first = self.cache.get(self.create, "foo")
+
+        self.results[0].errback(ValueError('query failed'))
+        first.addErrback(lambda failure: None)
+
+        assert_that(self.cache.get_size()).is_equal_to(0)
+        assert_that(self.cache.get(self.create, "foo")).is_not_same_as(first)
+
+    def test_clear_releases_payloads(self):
+        """Test that clearing the cache releases the pending payloads."""
+        self.cache.get(self.create, "foo")
+
+        self.cache.clear()
+
+        assert_that(self.results[0].called).is_true()
+
+
 def test_bench_object_cache_get(benchmark):
     """Benchmark cache.get() performance."""
     cache = ObjectCache()
@@ -345,13 +482,6 @@ class TestServiceCache:
         assert_that(cache).is_not_none()
         assert_that(cache.get_time_to_live()).is_equal_to(60)
 
-    def test_histogram_cache(self):
-        """Test histogram cache exists and has correct TTL."""
-        service_cache = ServiceCache()
-        cache = service_cache.histogram
-        assert_that(cache).is_not_none()
-        assert_that(cache.get_time_to_live()).is_equal_to(60)
-
     def test_different_caches_for_different_methods(self):
         """Test that different cache methods return different caches."""
         service_cache = ServiceCache()
@@ -360,3 +490,65 @@ class TestServiceCache:
         assert_that(service_cache.strikes(0)).is_not_same_as(service_cache.global_strikes(0))
         assert_that(service_cache.strikes(0)).is_not_same_as(service_cache.local_strikes(0))
         assert_that(service_cache.global_strikes(0)).is_not_same_as(service_cache.local_strikes(0))
+
+    def test_strikes_uses_history_cache_for_offset(self):
+        """Test selection of current and history caches."""
+        service_cache = ServiceCache()
+
+        assert_that(service_cache.strikes(-60)).is_not_same_as(service_cache.strikes(0))
+        assert_that(service_cache.caches()['strikes_history_grid']).is_same_as(service_cache.strikes(-60))
+
+    def test_history_caches_use_disk_store(self, tmp_path):
+        """Test that history caches are persistent when a disk store is given."""
+        disk_store = DiskStore(str(tmp_path / "history.store"))
+        service_cache = ServiceCache(disk_store)
+
+        assert_that(service_cache.strikes(-60)).is_instance_of(PersistentObjectCache)
+        assert_that(service_cache.global_strikes(-60)).is_instance_of(PersistentObjectCache)
+        assert_that(service_cache.local_strikes(-60)).is_instance_of(PersistentObjectCache)
+        assert_that(isinstance(service_cache.strikes(0), PersistentObjectCache)).is_false()
+        disk_store.close()
+
+    def test_save_and_load_snapshot(self, tmp_path):
+        """Test restoring completed results from a snapshot."""
+        snapshot_path = str(tmp_path / "snapshot.json")
+
+        def get_strikes_grid(**kwargs):
+            return defer.succeed(CacheableResult({'r': [[1, 2, 3, -4]]}))
+
+        service_cache = ServiceCache()
+        service_cache.strikes(0).get(get_strikes_grid, minute_length=60, region=1)
+        service_cache.strikes(0).get(Mock(return_value=defer.Deferred(), __name__="get_strikes_grid"), region=2)
+
+        assert_that(service_cache.save_snapshot(snapshot_path)).is_equal_to(1)
+
+        restored_cache = ServiceCache()
+        creator = Mock(__name__="get_strikes_grid")
+        assert_that(restored_cache.load_snapshot(snapshot_path, {"get_strikes_grid": creator})).is_equal_to(1)
+
+        result = restored_cache.strikes(0).get(creator, minute_length=60, region=1)
+        creator.assert_not_called()
+        assert_that(result.result.value).is_equal_to({'r': [[1, 2, 3, -4]]})
+
+    def test_get_statistics(self):
+        """Test statistics of all caches."""
+        service_cache = ServiceCache()
+        creator = Mock(return_value=defer.succeed(CacheableResult({'r': ((1, 2, 3, -4),)})),
+                       __name__="get_strikes_grid")
+        service_cache.strikes(0).get(creator, region=1)
+        service_cache.strikes(0).get(creator, region=1)
+
+        statistics = service_cache.get_statistics()
+
+        assert_that(statistics).contains_key('strikes_grid', 'global_strikes_history_grid', 'local_strikes_grid')
+        strikes_statistics = statistics['strikes_grid']
+        assert_that(strikes_statistics['size']).is_equal_to(1)
+        assert_that(strikes_statistics['ttl']).is_equal_to(20)
+        assert_that(strikes_statistics['bytes']).is_greater_than(0)
+        assert_that(strikes_statistics['top_keys']).is_equal_to([["get_strikes_grid(region=1)", 2]])
+
+    def test_load_missing_snapshot(self, tmp_path):
+        """Test loading a snapshot which does not exist."""
+        service_cache = ServiceCache()
+
+        assert_that(service_cache.load_snapshot(str(tmp_path / "missing.json"), {})).is_equal_to(0)
@@ -20,6 +20,7 @@
 import os
 import sys
 
+import pytest
 from assertpy import assert_that
 from mock import Mock, call, patch
 
@@ -66,6 +67,104 @@ class TestConfig:
         assert_that(self.config.get_webservice_port()).is_equal_to(1234)
         assert_that(self.config_parser.mock_calls).contains(call.get('webservice', 'port'))
 
+    def test_get_webservice_cache_directory(self):
+        self.config_parser.get.return_value = '/var/cache/blitzortung'
+        assert_that(self.config.get_webservice_cache_directory()).is_equal_to('/var/cache/blitzortung')
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'cache_directory', fallback=None))
+
+    def test_get_webservice_warming_top_keys(self):
+        self.config_parser.get.return_value = '10'
+        assert_that(self.config.get_webservice_warming_top_keys()).is_equal_to(10)
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'warming_top_keys', fallback='0'))
+
+    @pytest.mark.parametrize("value,expected", [('true', True), (' Yes', True), ('1', True), ('false', False),
+                                                ('0', False), ('', False)])
+    def test_get_webservice_push_enabled(self, value, expected):
+        self.config_parser.get.return_value = value
+        assert_that(self.config.get_webservice_push_enabled()).is_equal_to(expected)
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'push', fallback='false'))
+
+    def test_get_webservice_strike_buffer_enabled(self):
+        self.config_parser.get.return_value = 'on'
+        assert_that(self.config.get_webservice_strike_buffer_enabled()).is_true()
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'strike_buffer', fallback='false'))
+
+    def test_get_webservice_warming_concurrency(self):
+        self.config_parser.get.return_value = '3'
+        assert_that(self.config.get_webservice_warming_concurrency()).is_equal_to(3)
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'warming_concurrency', fallback='2'))
+
+    def test_get_webservice_workers(self):
+        self.config_parser.get.return_value = '4'
+        assert_that(self.config.get_webservice_workers()).is_equal_to(4)
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'workers', fallback='1'))
+
+    def test_get_webservice_rate_limit(self):
+        self.config_parser.get.return_value = '2.5'
+        assert_that(self.config.get_webservice_rate_limit()).is_equal_to(2.5)
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'rate_limit', fallback='0'))
+
+    def test_get_webservice_rate_burst(self):
+        self.config_parser.get.return_value = '10'
+        assert_that(self.config.get_webservice_rate_burst()).is_equal_to(10.0)
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'rate_burst', fallback='30'))
+
+    def test_get_webservice_blocklist(self):
+        self.config_parser.get.return_value = '10.0.0.0/8, 2001:db8::/32,'
+        assert_that(self.config.get_webservice_blocklist()).is_equal_to(['10.0.0.0/8', '2001:db8::/32'])
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'blocklist', fallback=''))
+
+    def test_get_webservice_precompute_interval(self):
+        self.config_parser.get.return_value = '30'
+        assert_that(self.config.get_webservice_precompute_interval()).is_equal_to(30)
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'precompute_interval', fallback='0'))
+
+    def test_get_webservice_precompute_minute_lengths(self):
+        self.config_parser.get.return_value = '60, 120,'
+        assert_that(self.config.get_webservice_precompute_minute_lengths()).is_equal_to((60, 120))
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'precompute_minute_lengths', fallback='60, 120, 180'))
+
+    def test_get_webservice_precompute_base_lengths(self):
+        self.config_parser.get.return_value = '10000,50000'
+        assert_that(self.config.get_webservice_precompute_base_lengths()).is_equal_to((10000, 50000))
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'precompute_base_lengths', fallback='10000, 25000, 50000'))
+
+    def test_get_webservice_db_pool_size(self):
+        self.config_parser.get.return_value = '8'
+        assert_that(self.config.get_webservice_db_pool_size()).is_equal_to(8)
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'db_pool_size', fallback='3'))
+
+    def test_get_webservice_db_query_limits(self):
+        self.config_parser.get.return_value = 'history: 1, global:2,'
+        assert_that(self.config.get_webservice_db_query_limits()).is_equal_to({'history': 1, 'global': 2})
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'db_query_limits', fallback=''))
+
+    def test_get_webservice_db_query_timeouts(self):
+        self.config_parser.get.return_value = 'live: 5s, history:2min'
+        assert_that(self.config.get_webservice_db_query_timeouts()).is_equal_to({'live': '5s', 'history': '2min'})
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'db_query_timeouts', fallback=''))
+
+    def test_get_webservice_json_encoder(self):
+        self.config_parser.get.return_value = 'orjson'
+        assert_that(self.config.get_webservice_json_encoder()).is_equal_to('orjson')
+        assert_that(self.config_parser.mock_calls).contains(
+            call.get('webservice', 'json_encoder', fallback='grid'))
+
     def test_string_representation(self):
         self.config_parser.get.side_effect = lambda *x: {
             ('auth', 'username'): '<username>',